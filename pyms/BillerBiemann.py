@@ -29,9 +29,11 @@ from numbers import Number
 
 # 3rd party
 import numpy
+import scipy.sparse
+from scipy.ndimage import maximum_filter1d
 
 # this package
-from pyms.IntensityMatrix import IntensityMatrix
+from pyms.IntensityMatrix import IntensityMatrix, SparseIntensityMatrix
 from pyms.IonChromatogram import IonChromatogram
 from pyms.Peak.Class import Peak
 from pyms.Peak.List.Function import is_peak_list
@@ -39,6 +41,9 @@ from pyms.Spectrum import MassSpectrum
 from pyms.Utils.Utils import is_sequence_of
 
 
+# The number of intensities of a SparseIntensityMatrix to read at a time
+_SPARSE_CHUNK_INTENSITIES = 2 ** 22
+
 #######################
 # structure
 # 1) find local maxima per ion, store intensity and scan index
@@ -47,16 +52,30 @@ from pyms.Utils.Utils import is_sequence_of
 #######################
 
 
-def BillerBiemann(im, points=3, scans=1):
+def BillerBiemann(im, points=3, scans=1, chunk_size=None):
     """
     Deconvolution based on the algorithm of Biller and Biemann (1974)
 
+    If ``chunk_size`` is given the intensity matrix is processed that many
+    scans at a time, reading directly from the intensity array of ``im``
+    without copying it. This allows large intensity matrices, such as those
+    backed by a :class:`numpy.memmap`, to be deconvoluted without holding
+    the whole matrix of maxima in memory. The peaks are the same as when
+    the whole matrix is processed at once.
+
+    A :class:`~pyms.IntensityMatrix.SparseIntensityMatrix` is always processed
+    in chunks, which are read as dense arrays one at a time. By default each
+    chunk holds about four million intensities.
+
     :param im: An :class:`~pyms.IntensityMatrix.IntensityMatrix` object
     :type im: ~pyms.IntensityMatrix.IntensityMatrix
     :param points: Number of scans over which to consider a maxima to be a peak. Default ``3``
     :type points: int, optional
     :param scans: Number of scans to combine peaks from to compensate for spectra skewing. Default ``1``
     :type scans: int, optional
+    :param chunk_size: The number of scans to process at a time, or :py:obj:`None`
+        to process the whole matrix at once. Default :py:obj:`None`
+    :type chunk_size: int or None, optional
 
     :return: List of detected peaks
     :rtype: List[:class:`pyms.Peak.Class.Peak`]
@@ -73,18 +92,33 @@ def BillerBiemann(im, points=3, scans=1):
     if not isinstance(scans, int):
         raise TypeError("'scans' must be an integer")
 
+    if chunk_size is not None:
+        if not isinstance(chunk_size, int) or isinstance(chunk_size, bool):
+            raise TypeError("'chunk_size' must be an integer or None")
+        if chunk_size < 1:
+            raise ValueError("'chunk_size' must be at least 1")
+
     rt_list = im.time_list
-    mass_list = im.mass_list
+    mass_list = numpy.asarray(im.mass_list)
     peak_list = []
-    maxima_im = get_maxima_matrix(im, points, scans)
-    numrows = len(maxima_im)
 
-    for row in range(numrows):
-        if sum(maxima_im[row]) > 0:
-            rt = rt_list[row]
+    if chunk_size is None and isinstance(im, SparseIntensityMatrix):
+        chunk_size = max(1, _SPARSE_CHUNK_INTENSITIES // max(1, im.size[1]))
+
+    if chunk_size is None:
+        maxima_chunks = [(0, get_maxima_matrix(im, points, scans))]
+    else:
+        maxima_chunks = _iter_maxima_chunks(im._intensities, points, scans, chunk_size)
+
+    for first_row, maxima_im in maxima_chunks:
+        # The rows of the matrix which contain peaks
+        peak_rows = numpy.flatnonzero(maxima_im.sum(axis=1) > 0)
+
+        for row in peak_rows.tolist():
+            rt = rt_list[first_row + row]
             ms = MassSpectrum(mass_list, maxima_im[row])
             peak = Peak(rt, ms)
-            peak.bounds = [0, row, 0]  # store IM index for convenience
+            peak.bounds = [0, first_row + row, 0]  # store IM index for convenience
             peak_list.append(peak)
 
     return peak_list
@@ -94,52 +128,297 @@ def get_maxima_indices(ion_intensities, points=3):
     """
     Find local maxima.
 
-    :param ion_intensities: A list of intensities for a single ion
+    A point is a local maximum if it is greater than all other points in a
+    window of ``points`` scans centred on it. For a plateau after a rise,
+    the centre of the plateau is used.
+
+    If ``ion_intensities`` is a 2-D array each column is treated as the
+    intensities of a single ion, as in
+    :attr:`IntensityMatrix.intensity_array <pyms.IntensityMatrix.IntensityMatrix.intensity_array>`,
+    and the maxima of all ions are found at once.
+
+    :param ion_intensities: A list of intensities for a single ion,
+        or a 2-D array of the intensities of several ions
     :type ion_intensities: ~collections.abc.Sequence or numpy.ndarray
     :param points: Number of scans over which to consider a maxima to be a peak. Default ``3``
     :type points: int, optional
 
-    :return: A list of scan indices
-    :rtype: list
+    :return: A list of scan indices, or for a 2-D array a tuple of arrays
+        giving the scan and column indices of the maxima, as returned by :func:`numpy.nonzero`
+    :rtype: list or tuple(numpy.ndarray, numpy.ndarray)
 
     :author: Andrew Isaac, Dominic Davis-Foster (type assertions)
     """
 
-    if not is_sequence_of(ion_intensities, Number):
+    if isinstance(ion_intensities, numpy.ndarray) and ion_intensities.ndim == 2:
+        if not numpy.issubdtype(ion_intensities.dtype, numpy.number):
+            raise TypeError("'ion_intensities' must be an array of Numbers")
+    elif not is_sequence_of(ion_intensities, Number):
         raise TypeError("'ion_intensities' must be a List of Numbers")
 
     if not isinstance(points, int):
         raise TypeError("'points' must be an integer")
 
+    maxima = _get_maxima_mask(numpy.asarray(ion_intensities), points)
+
+    if maxima.ndim == 2:
+        return numpy.nonzero(maxima)
+    else:
+        return numpy.flatnonzero(maxima).tolist()
+
+
+def _get_maxima_mask(intensities, points):
+    """
+    Find the local maxima along the first axis of an array.
+
+    :param intensities: A 1-D or 2-D array of intensities, with scans along the first axis
+    :type intensities: numpy.ndarray
+    :param points: Number of scans over which to consider a maxima to be a peak.
+    :type points: int
+
+    :return: A boolean array, :py:obj:`True` at the local maxima
+    :rtype: numpy.ndarray
+    """
+
+    if points < 2:
+        raise ValueError("'points' must be at least 2")
+
     # find peak inflection points
     # use a 'points' point window
-    # for a plateau after a rise, need to check if it is the left edge of
-    # a peak
-    peak_point = []
-    edge = -1
-    points = int(points)
-    half = int(points / 2)
-    points = 2 * half + 1  # ensure odd number of points
-
-    for index in range(len(ion_intensities) - points + 1):
-        left = ion_intensities[index:index + half]
-        mid = ion_intensities[index + half]
-        right = ion_intensities[index + half + 1:index + points]
-        # max in middle
-        if mid > max(left) and mid > max(right):
-            peak_point.append(index + half)
-            edge = -1  # ignore previous rising edge
-        # flat from rise (left of peak?)
-        if mid > max(left) and mid == max(right):
-            edge = index + half  # ignore previous rising edge, update latest
-        # fall from flat
-        if mid == max(left) and mid > max(right):
-            if edge > -1:
-                centre = int((edge + index + half) / 2)  # mid point
-                peak_point.append(centre)
-            edge = -1
-
-    return peak_point
+    half = points // 2
+    n_scans = len(intensities)
+
+    maxima = numpy.zeros(intensities.shape, dtype=bool)
+
+    if n_scans < 2 * half + 1:
+        return maxima
+
+    intensities = intensities.reshape(n_scans, -1)
+    edges = numpy.full(intensities.shape[1], -1)
+    rows, cols = _find_maxima(intensities, half, half, edges)
+    maxima.reshape(n_scans, -1)[rows, cols] = True
+
+    return maxima
+
+
+def _find_maxima(block, half, first_row, edges):
+    """
+    Find the local maxima in a block of scans.
+
+    The first and last ``half`` scans of the block are only used as the edges
+    of the window. ``edges`` gives, for each ion, the index of the rising edge
+    of a plateau whose end has not been found yet, or ``-1``. It is updated in
+    place, so a plateau may span several consecutive blocks.
+
+    :param block: A 2-D array of intensities, with scans along the first axis
+    :type block: numpy.ndarray
+    :param half: The number of scans either side of a maxima in the window
+    :type half: int
+    :param first_row: The index of the scan ``block[half]`` in the full array
+    :type first_row: int
+    :param edges: The rising edges of unfinished plateaus
+    :type edges: numpy.ndarray
+
+    :return: The scan and ion indices of the maxima, with the scan
+        indices relative to the full array
+    :rtype: tuple[numpy.ndarray, numpy.ndarray]
+    """
+
+    n_scans = len(block)
+
+    # The maximum of the 'half' points starting at each scan
+    window_max = maximum_filter1d(block, half, axis=0, origin=-(half // 2))
+
+    mid = block[half:n_scans - half]
+    left = window_max[:n_scans - 2 * half]
+    right = window_max[half + 1:n_scans - half + 1]
+
+    # max in middle
+    peaks = (mid > left) & (mid > right)
+    # flat from rise (left of peak?)
+    rising_edge = (mid > left) & (mid == right)
+    # fall from flat
+    falling_edge = (mid == left) & (mid > right)
+
+    # For a plateau after a rise, need to check if it is the left edge of
+    # a peak. A falling edge is the right edge of the plateau if the last
+    # peak or edge before it was a rising edge.
+    index = numpy.arange(len(mid))[:, numpy.newaxis]
+    last_event = numpy.where(peaks | rising_edge | falling_edge, index, -1)
+    last_event = numpy.maximum.accumulate(last_event, axis=0)
+
+    # The rising edge which is unfinished after each scan, or -1
+    edge_after = numpy.where(
+            numpy.take_along_axis(rising_edge, last_event.clip(0), axis=0),
+            last_event + first_row,
+            -1,
+            )
+    edge_after = numpy.where(last_event > -1, edge_after, edges)
+
+    edge_before = numpy.empty_like(edge_after)
+    edge_before[0] = edges
+    edge_before[1:] = edge_after[:-1]
+    edges[:] = edge_after[-1]
+
+    plateau_end = falling_edge & (edge_before > -1)
+    end_rows, end_cols = numpy.nonzero(plateau_end)
+    centres = (edge_before[plateau_end] + end_rows + first_row) // 2  # mid point
+
+    peak_rows, peak_cols = numpy.nonzero(peaks)
+
+    return (
+            numpy.concatenate([peak_rows + first_row, centres]),
+            numpy.concatenate([peak_cols, end_cols]),
+            )
+
+
+def _iter_maxima_chunks(intensity_array, points, scans, chunk_size):
+    """
+    Find the combined local maxima of each ion, reading ``chunk_size`` scans
+    of the intensity array at a time.
+
+    The result is the same as for :func:`~pyms.BillerBiemann.get_maxima_matrix`,
+    but only a few chunks of the matrix of maxima are held in memory at once.
+    Scans are kept until no later maxima or combination of spectra can change
+    them, so peaks at the edges of chunks are found as for the whole matrix.
+
+    :param intensity_array: The intensity array, which may be a :class:`numpy.memmap`
+        or a :class:`scipy.sparse.csr_matrix`
+    :type intensity_array: numpy.ndarray or scipy.sparse.csr_matrix
+    :param points: Number of scans over which to consider a maxima to be a peak.
+    :type points: int
+    :param scans: Number of scans to combine peaks from to compensate for spectra skewing.
+    :type scans: int
+    :param chunk_size: The number of scans to read at a time
+    :type chunk_size: int
+
+    :return: An iterator over the index of the first scan of each block of
+        the matrix of maxima, and the block itself. Each block is a view of a
+        buffer which is reused once the next block is requested.
+    :rtype: ~collections.abc.Iterator[tuple[int, numpy.ndarray]]
+    """
+
+    if points < 2:
+        raise ValueError("'points' must be at least 2")
+
+    half = points // 2
+    numrows, numcols = intensity_array.shape
+    half_scans = int(scans / 2)
+
+    # The rising edges of unfinished plateaus
+    edges = numpy.full(numcols, -1)
+
+    # The maxima of scans 'buffer_start' to 'chunk_end', the TIC of each of
+    # these scans, and whether it contains any maxima, are held in ring buffers,
+    # with scan 'ii' at position 'ii % capacity'.
+    capacity = chunk_size + scans + 1
+    buffer = numpy.zeros((capacity, numcols))
+    tics = numpy.zeros(capacity)
+    nonzero = numpy.zeros(capacity, dtype=bool)
+    buffer_start = 0
+
+    # Scans before 'final_end' have all their maxima. The TIC of each of these
+    # scans, and whether it contains any maxima, are kept up to date as they are combined.
+    final_end = 0
+
+    # The next scan to combine spectra for
+    row = 0
+
+    for chunk_start in range(0, numrows, chunk_size):
+        chunk_end = min(chunk_start + chunk_size, numrows)
+
+        if chunk_end - buffer_start > capacity:
+            # Scans are held back by an unfinished plateau, so make room for the chunk
+            new_capacity = max(2 * capacity, chunk_end - buffer_start)
+            held = numpy.arange(buffer_start, chunk_start)
+
+            new_buffer = numpy.zeros((new_capacity, numcols))
+            new_tics = numpy.zeros(new_capacity)
+            new_nonzero = numpy.zeros(new_capacity, dtype=bool)
+            new_buffer[held % new_capacity] = buffer[held % capacity]
+            new_tics[held % new_capacity] = tics[held % capacity]
+            new_nonzero[held % new_capacity] = nonzero[held % capacity]
+
+            buffer, tics, nonzero, capacity = new_buffer, new_tics, new_nonzero, new_capacity
+
+        buffer[numpy.arange(chunk_start, chunk_end) % capacity] = 0
+
+        # 1st, find maxima
+        first = max(chunk_start, half)
+        last = min(chunk_end, numrows - half)
+        if first < last:
+            block = intensity_array[first - half:last + half]
+            if scipy.sparse.issparse(block):
+                block = block.toarray()
+            maxima_rows, maxima_cols = _find_maxima(block, half, first, edges)
+
+            # 2nd, fill intensities
+            # The centre of a plateau may be in an earlier chunk,
+            # so the intensities are read from the whole array
+            intensities = intensity_array[maxima_rows, maxima_cols]
+            buffer[maxima_rows % capacity, maxima_cols] = numpy.asarray(intensities).ravel()
+
+        # The centre of an unfinished plateau may still be added at or after its rising edge
+        new_final_end = chunk_end
+        if chunk_end < numrows and (edges > -1).any():
+            new_final_end = min(new_final_end, edges[edges > -1].min())
+
+        if new_final_end > final_end:
+            final_rows = numpy.arange(final_end, new_final_end) % capacity
+            final_block = buffer[final_rows]
+            tics[final_rows] = final_block.sum(axis=1)
+            nonzero[final_rows] = final_block.any(axis=1)
+            final_end = new_final_end
+
+        # combine spectra within 'scans' scans, where all of those scans have all their maxima
+        if final_end == numrows:
+            last_row = numrows
+        else:
+            last_row = min(numrows, final_end - scans + half_scans + 1)
+
+        while row < last_row:
+            start = row - half_scans
+            lo = max(start, 0)
+            hi = min(start + scans, numrows)
+            row += 1
+
+            window = numpy.arange(lo, hi) % capacity
+            if not nonzero[window].any():
+                continue
+
+            # find largest tic of scans
+            best_ii = int(numpy.argmax(tics[window]))
+            if tics[window[best_ii]] > 0:
+                best = int(window[best_ii])
+            else:
+                # no scan has a positive tic, so use the first scan of the window
+                best = int(window[0])
+
+            # move and add others to best
+            moved = False
+            for other in window.tolist():
+                if other != best and nonzero[other]:
+                    buffer[best] += buffer[other]
+                    buffer[other] = 0
+                    tics[other] = 0
+                    nonzero[other] = False
+                    moved = True
+
+            if moved:
+                tics[best] = buffer[best].sum()
+                nonzero[best] = buffer[best].any()
+
+        # Scans before the window of the next scan to combine will not change
+        done = min(row - half_scans, final_end)
+        if chunk_end == numrows:
+            done = numrows
+
+        # The ring buffer is split where it wraps around
+        while buffer_start < done:
+            position = buffer_start % capacity
+            block_end = min(done, buffer_start + capacity - position)
+            yield buffer_start, buffer[position:position + block_end - buffer_start]
+            buffer_start = block_end
 
 
 def get_maxima_list(ic, points=3):
@@ -250,37 +529,49 @@ def get_maxima_matrix(im, points=3, scans=1):
     maxima_im = numpy.zeros((numrows, numcols))
     raw_im = im.intensity_array
 
-    for col in range(numcols):  # assume all rows have same width
-        # 1st, find maxima
-        maxima = get_maxima_indices(raw_im[:, col], points)
+    # 1st, find maxima for all ions at once
+    maxima = _get_maxima_mask(raw_im, points)
 
-        # 2nd, fill intensities
-        for row in maxima:
-            maxima_im[row, col] = raw_im[row, col]
+    # 2nd, fill intensities
+    maxima_im[maxima] = raw_im[maxima]
 
     # combine spectra within 'scans' scans.
     half = int(scans / 2)
 
+    # The TIC of each row, and whether the row contains any maxima.
+    # These are kept up to date as rows are combined.
+    tics = maxima_im.sum(axis=1)
+    nonzero = maxima_im.any(axis=1)
+
     for row in range(numrows):
-        # tic = 0
-        best = 0
-        loc = 0
+        start = row - half
+        lo = max(start, 0)
+        hi = min(start + scans, numrows)
 
-        # find best in scans
-        for ii in range(scans):
-            if 0 <= row - half + ii < numrows:
-                tic = maxima_im[row - half + ii].sum()
-                # find largest tic of scans
-                if tic > best:
-                    best = tic
-                    loc = ii
+        if not nonzero[lo:hi].any():
+            continue
+
+        # find largest tic of scans
+        best_ii = int(numpy.argmax(tics[lo:hi]))
+        if tics[lo + best_ii] > 0:
+            best_row = lo + best_ii
+        else:
+            # no scan has a positive tic, so use the first scan of the window
+            best_row = lo
 
         # move and add others to best
-        for ii in range(scans):
-            if 0 <= row - half + ii < numrows and ii != loc:
-                for col in range(numcols):
-                    maxima_im[row - half + loc, col] += maxima_im[row - half + ii, col]
-                    maxima_im[row - half + ii, col] = 0
+        moved = False
+        for other_row in range(lo, hi):
+            if other_row != best_row and nonzero[other_row]:
+                maxima_im[best_row] += maxima_im[other_row]
+                maxima_im[other_row] = 0
+                tics[other_row] = 0
+                nonzero[other_row] = False
+                moved = True
+
+        if moved:
+            tics[best_row] = maxima_im[best_row].sum()
+            nonzero[best_row] = maxima_im[best_row].any()
 
     return maxima_im
 
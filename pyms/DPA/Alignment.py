@@ -57,6 +57,12 @@ class Alignment:
 
 	:param expr: The experiment to be converted into an alignment object
 	:type expr: pyms.Experiment.Experiment
+	:param copy_peaks: Whether the alignment should hold copies of the
+		experiment's peaks. If :py:obj:`False` the alignment shares the
+		:class:`~pyms.Peak.Class.Peak` objects with the experiment, which
+		greatly reduces memory usage for large studies. The peaks must then
+		not be modified while the alignment is in use. Default :py:obj:`True`.
+	:type copy_peaks: bool, optional
 
 	:author: Woon Wai Keen
 	:author: Qiao Wang
@@ -64,7 +70,7 @@ class Alignment:
 	:author: Dominic Davis-Foster (type assertions and pathlib support)
 	"""
 
-	def __init__(self, expr):
+	def __init__(self, expr, copy_peaks=True):
 
 		if expr is None:
 			self.peakpos = []
@@ -78,7 +84,10 @@ class Alignment:
 			# for peak in expr.get_peak_list():
 			#    if peak.get_area() == None or peak.get_area() <= 0:
 			#        error("All peaks must have an area for alignment")
-			self.peakpos = [copy.deepcopy(expr.peak_list)]
+			if copy_peaks:
+				self.peakpos = [copy.deepcopy(expr.peak_list)]
+			else:
+				self.peakpos = [list(expr.peak_list)]
 			self.peakalgt = numpy.transpose(self.peakpos)
 			self.expr_code = [expr.expr_code]
 			self.similarity = None
@@ -715,12 +724,15 @@ class Alignment:
 		return area_alignment
 
 
-def exprl2alignment(expr_list):
+def exprl2alignment(expr_list, copy_peaks=True):
 	"""
 	Converts experiments into alignments
 
 	:param expr_list: The list of experiments to be converted into an alignment objects
 	:type expr_list: list of :class:`pyms.Experiment.Experiment`
+	:param copy_peaks: Whether the alignments should hold copies of the
+		experiments' peaks. See :class:`~pyms.DPA.Alignment.Alignment` for details.
+	:type copy_peaks: bool, optional
 
 	:return: A list of alignment objects for the experiments
 	:rtype: list of :class:`pyms.DPA.Alignment.Alignment`
@@ -737,6 +749,6 @@ def exprl2alignment(expr_list):
 		if not isinstance(item, Experiment):
 			raise TypeError("list items must be 'Experiment' instances")
 
-		alignments.append(Alignment(item))
+		alignments.append(Alignment(item, copy_peaks))
 
 	return alignments
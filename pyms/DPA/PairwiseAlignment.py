@@ -24,11 +24,13 @@ Classes for peak alignment by dynamic programming
 ################################################################################
 
 # stdlib
+import concurrent.futures
 import copy
 import math
 import functools
 
 # 3rd party
+import deprecation
 import numpy
 
 try:
@@ -46,6 +48,7 @@ except ModuleNotFoundError:
 Please install one of them and try again.""")
 
 # this package
+from pyms import __version__
 from pyms.DPA.Alignment import Alignment
 from pyms.Utils.Utils import is_sequence_of
 
@@ -60,12 +63,20 @@ class PairwiseAlignment:
 	:type D: float
 	:param gap: Gap parameter for pairwise alignments
 	:type gap: float
+	:param n_workers: The number of worker processes to use to calculate
+		the pairwise alignments. Default ``1``, which calculates them in
+		the current process.
+	:type n_workers: int, optional
+	:param executor: An existing :class:`concurrent.futures.Executor` to
+		calculate the pairwise alignments with. If given, ``n_workers``
+		is ignored.
+	:type executor: concurrent.futures.Executor, optional
 
 	:author: Woon Wai Keen
 	:author: Vladimir Likic
 	"""
 
-	def __init__(self, alignments, D, gap):
+	def __init__(self, alignments, D, gap, n_workers=1, executor=None):
 		"""
 		Models pairwise alignment of alignments
 		"""
@@ -79,37 +90,83 @@ class PairwiseAlignment:
 		if not isinstance(gap, float):
 			raise TypeError("'gap' must be a float")
 
+		if not isinstance(n_workers, int) or isinstance(n_workers, bool):
+			raise TypeError("'n_workers' must be an int")
+
+		if n_workers < 1:
+			raise ValueError("'n_workers' must be at least 1")
+
+		if executor is not None and not isinstance(executor, concurrent.futures.Executor):
+			raise TypeError("'executor' must be a concurrent.futures.Executor")
+
 		self.alignments = alignments
 		self.D = D
 		self.gap = gap
 
-		self._sim_matrix()
+		self._sim_matrix(n_workers, executor)
 		self._dist_matrix()
 		self._guide_tree()
 
-	def _sim_matrix(self):
+	def _sim_matrix(self, n_workers=1, executor=None):
 		"""
 		Calculates the similarity matrix for the set of alignments
 
+		Each alignment is converted once into arrays of mass spectra and
+		retention times, which are passed to the workers in place of the
+		alignments themselves.
+
+		:param n_workers: The number of worker processes to use
+		:type n_workers: int, optional
+		:param executor: An existing executor to use
+		:type executor: concurrent.futures.Executor, optional
+
 		:author: Woon Wai Keen
 		:author: Vladimir Likic
 		"""
 
 		n = len(self.alignments)
 
-		total_n = n * (n - 1) // 2
-
 		print(f" Calculating pairwise alignments for {n:d} alignments (D={self.D:.2f}, gap={self.gap:.2f})")
 
 		self.sim_matrix = numpy.zeros((n, n), dtype='f')
 
-		# Could we parallelize this pairwise alignment loop??
-		for i in range(n - 1):
-			for j in range(i + 1, n):
-				ma = align(self.alignments[i], self.alignments[j], self.D, self.gap)
-				self.sim_matrix[i, j] = self.sim_matrix[j, i] = ma.similarity
-				total_n = total_n - 1
-				print(f" -> {total_n:d} pairs remaining")
+		stacked = [_stack_positions(algt.peakalgt) for algt in self.alignments]
+
+		if executor is None and n_workers > 1:
+			with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as pool:
+				self._fill_sim_matrix(stacked, pool)
+		else:
+			self._fill_sim_matrix(stacked, executor)
+
+	def _fill_sim_matrix(self, stacked, executor=None):
+		"""
+		Aligns each pair of alignments and stores their similarity in
+		the similarity matrix
+
+		:param stacked: The alignments, as returned by :func:`_stack_positions`
+		:type stacked: list of tuple
+		:param executor: The executor to align the pairs with. If
+			:py:obj:`None` they are aligned in the current process.
+		:type executor: concurrent.futures.Executor, optional
+		"""
+
+		n = len(stacked)
+		total_n = n * (n - 1) // 2
+		pairs = [(i, j) for i in range(n - 1) for j in range(i + 1, n)]
+
+		if executor is None:
+			results = (((i, j), _stacked_similarity(stacked[i], stacked[j], self.D, self.gap)) for i, j in pairs)
+		else:
+			futures = {
+					executor.submit(_stacked_similarity, stacked[i], stacked[j], self.D, self.gap): (i, j)
+					for i, j in pairs
+					}
+			results = ((futures[future], future.result()) for future in concurrent.futures.as_completed(futures))
+
+		for (i, j), similarity in results:
+			self.sim_matrix[i, j] = self.sim_matrix[j, i] = similarity
+			total_n = total_n - 1
+			print(f" -> {total_n:d} pairs remaining")
 
 	def _dist_matrix(self):
 		"""
@@ -142,7 +199,7 @@ class PairwiseAlignment:
 		print("Done")
 
 
-def align(a1, a2, D, gap):
+def align(a1, a2, D, gap, banded=False):
 	"""
 	Aligns two alignments
 
@@ -154,6 +211,9 @@ def align(a1, a2, D, gap):
 	:type D: float
 	:param gap: Gap penalty
 	:type gap: float
+	:param banded: Whether to only evaluate the dynamic programming matrix
+		within the retention time cutoff. See :func:`dp` for details.
+	:type banded: bool, optional
 
 	:return: Aligned alignments
 	:rtype: pyms.Peak.List.Class.Alignment
@@ -170,7 +230,7 @@ def align(a1, a2, D, gap):
 	# print("calculated score matrix on rank", rank)
 
 	# run dynamic programming
-	result = dp(M, gap)
+	result = dp(M, gap, banded)
 
 	# make composite alignment from the results
 	ma = merge_alignments(a1, a2, result['trace'])
@@ -199,36 +259,206 @@ def score_matrix(a1, a2, D):
 	:author: Andrew Isaac
 	"""
 
-	# sim_score = 0
+	return _stacked_score_matrix(_stack_positions(a1.peakalgt), _stack_positions(a2.peakalgt), D)
 
-	score_matrix = numpy.zeros((len(a1.peakalgt), len(a2.peakalgt)))
 
-	for i, algt1pos in enumerate(a1.peakalgt):
-		for j, algt2pos in enumerate(a2.peakalgt):
-			sim_score = position_similarity(algt1pos, algt2pos, D)
-			score_matrix[i][j] = sim_score
+def _stacked_score_matrix(stacked1, stacked2, D):
+	"""
+	Calculates the score matrix between two alignments from their
+	stacked mass spectra and retention times
 
-	return score_matrix
+	:param stacked1: The first alignment, as returned by :func:`_stack_positions`
+	:type stacked1: tuple of numpy.ndarray
+	:param stacked2: The second alignment, as returned by :func:`_stack_positions`
+	:type stacked2: tuple of numpy.ndarray
+	:param D: Retention time tolerance
+	:type D: float
+
+	:return: The score matrix
+	:rtype: numpy.ndarray
+	"""
+
+	# The spectra and retention times of every position are stacked into
+	# dense arrays once. The scores for all pairs of positions are then
+	# calculated with matrix products, giving the same result as calling
+	# position_similarity() for each pair.
+
+	spec1, rt1, mask1 = stacked1
+	spec2, rt2, mask2 = stacked2
+
+	n_pos1, n_items1, n_mass1 = spec1.shape
+	n_pos2, n_items2, n_mass2 = spec2.shape
+
+	score_matrix = numpy.zeros((n_pos1, n_pos2))
+
+	if n_pos1 == 0 or n_pos2 == 0:
+		return score_matrix
+
+	if n_mass1 != n_mass2 and mask1.any() and mask2.any():
+		raise ValueError("""Mass Spectra are of different lengths.
+Use `IntensityMatrix.crop_mass()` to set same length for all Mass Spectra""")
+
+	# Only calculate 'in-range' values; set tolerance to 1/1000
+	_TOL = 0.001
+	cutoff = D * math.sqrt(-2.0 * math.log(_TOL))
+
+	spec1_sum = numpy.sum(spec1**2, axis=2)
+	spec2_sum = numpy.sum(spec2**2, axis=2)
+	spec2_flat = spec2.reshape(n_pos2 * n_items2, n_mass2)
+
+	# Loop over the peaks in each position of a1; each iteration scores one
+	# peak from every position in a1 against every peak in a2.
+	# Arrays are of shape (n_pos1, n_pos2, n_items2)
+	for item in range(n_items1):
+		top = numpy.dot(spec1[:, item, :], spec2_flat.T).reshape(n_pos1, n_pos2, n_items2)
+		bot = numpy.sqrt(spec1_sum[:, item, None, None] * spec2_sum[None, :, :])
+		cos = numpy.divide(top, bot, out=numpy.zeros_like(top), where=bot > 0)
+
+		rt_diff = rt1[:, item, None, None] - rt2[None, :, :]
+		rtime = numpy.exp(-(rt_diff / float(D))**2 / 2.0)
 
+		# NB score of 1 is worst
+		pair_score = numpy.where(numpy.abs(rt_diff) > cutoff, 1.0, 1.0 - (cos * rtime))
+		pair_mask = mask1[:, item, None, None] & mask2[None, :, :]
 
-def dp(S, gap_penalty):
+		score_matrix += numpy.where(pair_mask, pair_score, 0.0).sum(axis=2)
+
+	count = numpy.outer(mask1.sum(axis=1), mask2.sum(axis=1))
+
+	# NB score of 1 is worst
+	return numpy.divide(score_matrix, count, out=numpy.ones_like(score_matrix), where=count > 0)
+
+
+def _stack_positions(peakalgt):
+	"""
+	Stacks the mass spectra and retention times of the peaks in each position
+	of an alignment into dense arrays.
+
+	:param peakalgt: The alignment positions, as given by
+		:attr:`Alignment.peakalgt <pyms.DPA.Alignment.Alignment.peakalgt>`
+	:type peakalgt: list
+
+	:return: Array of mass spectra of shape ``(n_positions, n_items, n_masses)``,
+		array of retention times of shape ``(n_positions, n_items)``,
+		and a boolean array of the same shape which is ``False``
+		where the alignment has a gap.
+	:rtype: tuple of numpy.ndarray
+	"""
+
+	n_positions = len(peakalgt)
+
+	if n_positions:
+		n_items = len(peakalgt[0])
+	else:
+		n_items = 0
+
+	rts = numpy.zeros((n_positions, n_items), dtype='d')
+	mask = numpy.zeros((n_positions, n_items), dtype=bool)
+	spectra = None
+
+	for i, position in enumerate(peakalgt):
+		for j, peak in enumerate(position):
+			if peak is not None:
+				mass_spec = peak.mass_spectrum.mass_spec
+
+				if spectra is None:
+					spectra = numpy.zeros((n_positions, n_items, len(mass_spec)), dtype='d')
+				elif len(mass_spec) != spectra.shape[2]:
+					raise ValueError("""Mass Spectra are of different lengths.
+Use `IntensityMatrix.crop_mass()` to set same length for all Mass Spectra""")
+
+				spectra[i, j] = mass_spec
+				rts[i, j] = peak.rt
+				mask[i, j] = True
+
+	if spectra is None:
+		spectra = numpy.zeros((n_positions, n_items, 0), dtype='d')
+
+	return spectra, rts, mask
+
+
+def _stacked_similarity(stacked1, stacked2, D, gap):
+	"""
+	Calculates the similarity score between two alignments from their
+	stacked mass spectra and retention times
+
+	This gives the same value as the ``similarity`` attribute of the
+	alignment returned by :func:`align`, without merging the alignments.
+	It is a module level function so that it can be sent to worker processes.
+
+	:param stacked1: The first alignment, as returned by :func:`_stack_positions`
+	:type stacked1: tuple of numpy.ndarray
+	:param stacked2: The second alignment, as returned by :func:`_stack_positions`
+	:type stacked2: tuple of numpy.ndarray
+	:param D: Retention time tolerance
+	:type D: float
+	:param gap: Gap penalty
+	:type gap: float
+
+	:return: Similarity score (i.e. more similar => higher score)
+	:rtype: float
+	"""
+
+	return _stacked_align(stacked1, stacked2, D, gap)[1]
+
+
+def _stacked_align(stacked1, stacked2, D, gap):
+	"""
+	Aligns two alignments from their stacked mass spectra and retention
+	times, without merging them
+
+	The alignments can then be merged with :func:`merge_alignments`.
+	It is a module level function so that it can be sent to worker processes.
+
+	:param stacked1: The first alignment, as returned by :func:`_stack_positions`
+	:type stacked1: tuple of numpy.ndarray
+	:param stacked2: The second alignment, as returned by :func:`_stack_positions`
+	:type stacked2: tuple of numpy.ndarray
+	:param D: Retention time tolerance
+	:type D: float
+	:param gap: Gap penalty
+	:type gap: float
+
+	:return: The DP traceback and the similarity score
+	:rtype: tuple
+	"""
+
+	M = _stacked_score_matrix(stacked1, stacked2, D)
+	result = dp(M, gap)
+
+	return result['trace'], alignment_similarity(result['trace'], M, gap)
+
+
+def dp(S, gap_penalty, banded=False):
 	"""
 	Solves optimal path in score matrix based on global sequence
 		alignment
 
+	The dynamic programming matrix is filled one anti-diagonal at a time,
+	as every cell on an anti-diagonal depends only on the two preceding
+	anti-diagonals.
+
+	If ``banded`` is :py:obj:`True` only the cells within a band around
+	the pairs of positions with a retention time difference inside the
+	score cutoff (i.e. with a score less than 1) are evaluated. The
+	remaining cells are treated as unreachable. When the gap penalty is
+	less than 0.5, matching positions outside the cutoff is never better
+	than leaving a gap in each alignment, so the banded alignment has the
+	same score as that from the full calculation. Where several
+	alignments have the same score a different one of them may be chosen.
+
 	:param S: Score matrix
-	:type S:
+	:type S: numpy.ndarray
 	:param gap_penalty: Gap penalty
 	:type gap_penalty: float
+	:param banded: Whether to only evaluate cells within the score cutoff band
+	:type banded: bool, optional
 
 	:return: A dictionary of results
 	:rtype: dict
 
 	:author: Tim Erwin
 	"""
-	# comm = MPI.COMM_WORLD
-	# rank = comm.Get_rank()
-	# print " In DP.py, I am rank", rank
 
 	try:
 		row_length = len(S[:, 0])
@@ -238,46 +468,67 @@ def dp(S, gap_penalty):
 
 	col_length = len(S[0, :])
 
+	# The first and last columns of each row of the matrix to evaluate
+	if banded and row_length:
+		first_col, last_col = _band_limits(S)
+	else:
+		first_col = numpy.ones(row_length, dtype=int)
+		last_col = numpy.full(row_length, col_length, dtype=int)
+
 	# D contains the score of the optimal alignment
-	D = numpy.zeros((row_length + 1, col_length + 1), dtype='d')
-	for i in range(1, row_length + 1):
-		D[i, 0] = gap_penalty * i
-	for j in range(1, col_length + 1):
-		D[0, j] = gap_penalty * j
+	D = numpy.full((row_length + 1, col_length + 1), numpy.inf, dtype='d')
+	D[:, 0] = gap_penalty * numpy.arange(row_length + 1)
+	D[0, :] = gap_penalty * numpy.arange(col_length + 1)
 	D[0, 0] = 0.0
-	D[1:(row_length + 1), 1:(col_length + 1)] = S.copy()
 
 	# Directions for trace
 	# 0 - match               (move diagonal)
 	# 1 - peaks1 has no match (move up)
 	# 2 - peaks2 has no match (move left)
 	# 3 - stop
-	trace_matrix = numpy.zeros((row_length + 1, col_length + 1))
+	trace_matrix = numpy.zeros((row_length + 1, col_length + 1), dtype=numpy.int8)
 	trace_matrix[:, 0] = 1
 	trace_matrix[0, :] = 2
 	trace_matrix[0, 0] = 3
 
-	for i in range(1, row_length + 1):
-		for j in range(1, col_length + 1):
-			#
-			# Needleman-Wunsch Algorithm assuming a score function S(x,x)=0
-			#
-			#              | D[i-1,j-1] + S(i,j)
-			# D[i,j] = min | D(i-1,j] + gap
-			#              | D[i,j-1] + gap
-			#
-
-			darray = [D[i - 1, j - 1] + S[i - 1, j - 1], D[i - 1, j] + gap_penalty, D[i, j - 1] + gap_penalty]
-			D[i, j] = min(darray)
-			# Store direction in trace matrix
-			trace_matrix[i, j] = darray.index(D[i, j])
+	# For the anti-diagonal i + j = k, the rows to evaluate are those with
+	# first_col[i] + i <= k <= last_col[i] + i. Both bounds increase with i.
+	rows = numpy.arange(1, row_length + 1)
+	first_diag = first_col + rows
+	last_diag = last_col + rows
+
+	for k in range(2, row_length + col_length + 1):
+		i_min = numpy.searchsorted(last_diag, k, side="left") + 1
+		i_max = numpy.searchsorted(first_diag, k, side="right")
+		if i_min > i_max:
+			continue
+
+		i = numpy.arange(i_min, i_max + 1)
+		j = k - i
+
+		#
+		# Needleman-Wunsch Algorithm assuming a score function S(x,x)=0
+		#
+		#              | D[i-1,j-1] + S(i,j)
+		# D[i,j] = min | D(i-1,j] + gap
+		#              | D[i,j-1] + gap
+		#
+		diag = D[i - 1, j - 1] + S[i - 1, j - 1]
+		up = D[i - 1, j] + gap_penalty
+		left = D[i, j - 1] + gap_penalty
+
+		best = numpy.minimum(numpy.minimum(diag, up), left)
+		D[i, j] = best
+
+		# Store direction in trace matrix, preferring a match, then a move up
+		trace_matrix[i, j] = numpy.where(diag == best, 0, numpy.where(up == best, 1, 2))
 
 	# Trace back from bottom right
 	trace = []
 	matches = []
 	i = row_length
 	j = col_length
-	direction = trace_matrix[i, j]
+	direction = int(trace_matrix[i, j])
 	p = [row_length - 1]
 	q = [col_length - 1]
 
@@ -294,7 +545,7 @@ def dp(S, gap_penalty):
 		p.append(i - 1)
 		q.append(j - 1)
 		trace.append(direction)
-		direction = trace_matrix[i, j]
+		direction = int(trace_matrix[i, j])
 
 	# remove 'stop' entry
 	p.pop()
@@ -308,6 +559,47 @@ def dp(S, gap_penalty):
 	return {'p': p, 'q': q, 'trace': trace, 'matches': matches, 'D': D, 'phi': trace_matrix}
 
 
+def _band_limits(S):
+	"""
+	Determines the band of the dynamic programming matrix to evaluate
+		in banded mode
+
+	The band covers every pair of positions with a score less than 1,
+	and the cells diagonally preceding them. It is widened where
+	necessary so that the first and last columns never decrease from one
+	row to the next and adjacent rows always overlap, guaranteeing a path
+	through the matrix.
+
+	:param S: Score matrix
+	:type S: numpy.ndarray
+
+	:return: The first and last columns (1-based) to evaluate in each row
+	:rtype: tuple of numpy.ndarray
+	"""
+
+	row_length, col_length = S.shape
+
+	# Include the cells from which each pair of positions can be matched
+	in_band = S < 1
+	in_band[:-1, :-1] |= S[1:, 1:] < 1
+	has_band = in_band.any(axis=1)
+
+	first_col = numpy.where(has_band, in_band.argmax(axis=1) + 1, col_length)
+	last_col = numpy.where(has_band, col_length - in_band[:, ::-1].argmax(axis=1), 1)
+
+	# Make both limits non-decreasing
+	first_col = numpy.minimum.accumulate(first_col[::-1])[::-1]
+	last_col = numpy.maximum.accumulate(last_col)
+	first_col[0] = 1
+	last_col[-1] = col_length
+
+	# Each row must overlap with the row above
+	last_col[:-1] = numpy.maximum(last_col[:-1], first_col[1:])
+	first_col = numpy.minimum(first_col, last_col)
+
+	return first_col, last_col
+
+
 def position_similarity(pos1, pos2, D):
 	"""
 	Calculates the similarity between the two alignment positions.
@@ -598,14 +890,25 @@ def score_matrix_mpi(a1, a2, D):
 	return score_matrix
 
 
-def align_with_tree(T, min_peaks=1):
+def align_with_tree(T, min_peaks=1, n_workers=1, executor=None):
 	"""
 	Aligns a list of alignments using the supplied guide tree
 
+	Nodes of the guide tree whose subtrees have already been aligned do not
+	depend on each other, so if ``n_workers`` is greater than 1 or an
+	``executor`` is given these are aligned concurrently. The final
+	alignment is the same as that from aligning the nodes one at a time.
+
 	:param T: The pairwise alignment object
 	:type T: pyms.DPA.PairwiseAlignment.PairwiseAlignment
 	:param min_peaks:
 	:type min_peaks:
+	:param n_workers: The number of worker processes to use. Default ``1``,
+		which aligns the nodes in the current process.
+	:type n_workers: int, optional
+	:param executor: An existing :class:`concurrent.futures.Executor` to
+		align the nodes with. If given, ``n_workers`` is ignored.
+	:type executor: concurrent.futures.Executor, optional
 
 	:return: The final alignment consisting of aligned input alignments
 	:rtype: pyms.DPA.Alignment.Alignment
@@ -614,6 +917,15 @@ def align_with_tree(T, min_peaks=1):
 	:author: Vladimir Likic
 	"""
 
+	if not isinstance(n_workers, int) or isinstance(n_workers, bool):
+		raise TypeError("'n_workers' must be an int")
+
+	if n_workers < 1:
+		raise ValueError("'n_workers' must be at least 1")
+
+	if executor is not None and not isinstance(executor, concurrent.futures.Executor):
+		raise TypeError("'executor' must be a concurrent.futures.Executor")
+
 	print(f" Aligning {len(T.alignments):d} items with guide tree (D={T.D:.2f}, gap={T.gap:.2f})")
 
 	# For everything else, we align according to the guide tree provided by
@@ -623,29 +935,98 @@ def align_with_tree(T, min_peaks=1):
 	#   nodes are numbered {-1, ... , -(n-1)}. Note that the number of nodes
 	#   is one less than the number of items.
 
-	# extend As to length 2n to hold the n items, n-1 nodes, and 1 root
-	As = copy.deepcopy(T.alignments) + [None for _ in range(len(T.alignments))]
+	# extend As to length 2n to hold the n items, n-1 nodes, and 1 root.
+	# The input alignments are not modified by align(), so are not copied.
+	As = list(T.alignments) + [None for _ in range(len(T.alignments))]
 
 	# align the alignments into positions -1, ... ,-(n-1)
-	total = len(T.tree)
-	index = 0
-
-	for node in T.tree[:]:
-		index = index - 1
-		As[index] = align(As[node.left], As[node.right], T.D, T.gap)
-		total = total - 1
-		print(f" -> {total:d} item(s) remaining")
+	if executor is None and n_workers > 1:
+		with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as pool:
+			_align_tree_nodes(As, T, pool)
+	else:
+		_align_tree_nodes(As, T, executor)
 
 	# the final alignment is in the root. Filter min peaks and return
-	final_algt = As[index]
+	final_algt = As[-len(T.tree)]
 
 	# useful for within state alignment only
 	if min_peaks > 1:
+		if not len(T.tree):
+			# the root is one of the input alignments
+			final_algt = copy.copy(final_algt)
 		final_algt.filter_min_peaks(min_peaks)
 
 	return final_algt
 
 
+def _align_tree_nodes(As, T, executor=None):
+	"""
+	Aligns the nodes of the guide tree, storing the alignment for node
+	``-k`` in ``As[-k]``
+
+	If an executor is given, each node is submitted to it as soon as the
+	alignments for both of its children are available. Only the stacked
+	mass spectra and retention times are sent to the workers, which
+	return the DP traceback; the alignments are merged in this process.
+
+	:param As: The alignments for the items, followed by space for the nodes
+	:type As: list
+	:param T: The pairwise alignment object
+	:type T: pyms.DPA.PairwiseAlignment.PairwiseAlignment
+	:param executor: The executor to align the nodes with. If
+		:py:obj:`None` they are aligned in order in the current process.
+	:type executor: concurrent.futures.Executor, optional
+	"""
+
+	total = len(T.tree)
+
+	if executor is None:
+		for index in range(len(T.tree)):
+			node = T.tree[index]
+			As[-(index + 1)] = align(As[node.left], As[node.right], T.D, T.gap)
+			total = total - 1
+			print(f" -> {total:d} item(s) remaining")
+		return
+
+	waiting = list(range(len(T.tree)))
+	futures = {}
+
+	while waiting or futures:
+		# submit each node whose children have both been aligned
+		for index in waiting[:]:
+			node = T.tree[index]
+			if As[node.left] is not None and As[node.right] is not None:
+				future = executor.submit(
+						_stacked_align,
+						_stack_positions(As[node.left].peakalgt),
+						_stack_positions(As[node.right].peakalgt),
+						T.D,
+						T.gap,
+						)
+				futures[future] = index
+				waiting.remove(index)
+
+		done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+
+		for future in done:
+			index = futures.pop(future)
+			node = T.tree[index]
+			trace, similarity = future.result()
+
+			ma = merge_alignments(As[node.left], As[node.right], trace)
+			ma.similarity = similarity
+			As[-(index + 1)] = ma
+
+			total = total - 1
+			print(f" -> {total:d} item(s) remaining")
+
+
+@deprecation.deprecated(
+		deprecated_in="2.2.22.b3",
+		removed_in="2.3.0",
+		current_version=__version__,
+		details="Use :func:`pyms.DPA.PairwiseAlignment.align_with_tree` with ``n_workers`` instead",
+		)
 def align_with_tree_mpi(T, min_peaks=1):
 	"""
 	Aligns a list of alignments using the supplied guide tree
@@ -662,40 +1043,4 @@ def align_with_tree_mpi(T, min_peaks=1):
 	:author: Vladimir Likic
 	"""
 
-	try:
-		rank = MPI.COMM_WORLD.Get_rank()
-	except:
-		rank = 0
-
-	if rank == 0:
-		print(f" Aligning {len(T.alignments):d} items with guide tree (D={T.D:.2f}, gap={T.gap:.2f})")
-
-	# For everything else, we align according to the guide tree provided by
-	# Pycluster. From Pycluster documentation:
-	#   Each item and subnode is represented by an integer. For hierarchical
-	#   clustering of n items, we number the original items {0, ... , n-1},
-	#   nodes are numbered {-1, ... , -(n-1)}. Note that the number of nodes
-	#   is one less than the number of items.
-
-	# extend As to length 2n to hold the n items, n-1 nodes, and 1 root
-	As = copy.deepcopy(T.alignments) + [None for _ in range(len(T.alignments))]
-
-	# align the alignments into positions -1, ... ,-(n-1)
-	total = len(T.tree)
-	index = 0
-
-	for node in T.tree[:]:
-		index = index - 1
-		As[index] = align(As[node.left], As[node.right], T.D, T.gap)
-		total = total - 1
-		if rank == 0:
-			print(f" -> {total:d} item(s) remaining")
-
-	# the final alignment is in the root. Filter min peaks and return
-	final_algt = As[index]
-
-	# useful for within state alignment only
-	if min_peaks > 1:
-		final_algt.filter_min_peaks(min_peaks)
-
-	return final_algt
+	return align_with_tree(T, min_peaks)
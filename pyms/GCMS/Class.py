@@ -26,6 +26,7 @@ Class to model GC-MS data
 # stdlib
 import copy
 import pathlib
+import warnings
 from numbers import Number
 from statistics import mean, median, stdev
 
@@ -38,7 +39,7 @@ from pyms import __version__
 from pyms.Base import pymsBaseClass
 from pyms.IonChromatogram import IonChromatogram
 from pyms.Mixins import GetIndexTimeMixin, MaxMinMassMixin, TimeListMixin
-from pyms.Spectrum import MassSpectrum, Scan
+from pyms.Spectrum import MassSpectrum, Scan, array_as_numeric
 from pyms.Utils.IO import prepare_filepath
 from pyms.Utils.Time import time_str_secs
 from pyms.Utils.Utils import is_path, is_sequence_of
@@ -51,6 +52,13 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 	Generic object for GC-MS data. Contains raw data
 		as a list of scans and times
 
+	Internally the masses and intensities of all scans are held in two flat
+	arrays, together with the index of the first point of each scan, in the
+	same way as ANDI-MS files store them. :class:`~pyms.Spectrum.Scan` objects
+	are only created when :attr:`~pyms.GCMS.Class.GCMS_data.scan_list` is
+	accessed. Use :meth:`~pyms.GCMS.Class.GCMS_data.from_arrays` to create the
+	object directly from arrays.
+
 	:param time_list: List of scan retention times
 	:type time_list: list
 	:param scan_list: List of Scan objects
@@ -73,12 +81,67 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		if not is_sequence_of(scan_list, Scan):
 			raise TypeError("'scan_list' must be a Sequence of Scan objects")
 
+		scan_lengths = [len(scan) for scan in scan_list]
+		self._scan_offsets = numpy.concatenate([[0], numpy.cumsum(scan_lengths, dtype=int)])
+		self._mass_array = _concatenate([scan._mass_list for scan in scan_list if len(scan)])
+		self._intensity_array = _concatenate([scan._intensity_list for scan in scan_list if len(scan)])
+
 		self._time_list = time_list
-		self._scan_list = scan_list
 		self.__set_time()
 		self.__set_min_max_mass()
 		self.__calc_tic()
 
+	@classmethod
+	def from_arrays(cls, time_list, mass_array, intensity_array, scan_index):
+		"""
+		Create a GCMS_data object from flat arrays of the masses and
+		intensities of all scans
+
+		As for :class:`~pyms.Spectrum.Scan`, the masses of each scan are
+		expected to be in ascending order. Scans with the masses in
+		descending order are reversed, in a copy of the arrays unless they
+		are copy-on-write memory maps (:class:`numpy.memmap` with mode ``'c'``).
+
+		:param time_list: List of scan retention times
+		:type time_list: list
+		:param mass_array: The masses of all scans, one scan after another
+		:type mass_array: numpy.ndarray
+		:param intensity_array: The intensities corresponding to ``mass_array``
+		:type intensity_array: numpy.ndarray
+		:param scan_index: The index in ``mass_array`` of the first point of each scan
+		:type scan_index: ~collections.abc.Sequence[int] or numpy.ndarray
+
+		:rtype: pyms.GCMS.Class.GCMS_data
+		"""
+
+		if not is_sequence_of(time_list, Number):
+			raise TypeError("'time_list' must be a Sequence of numbers")
+
+		mass_array = array_as_numeric(mass_array)
+		intensity_array = array_as_numeric(intensity_array)
+
+		if mass_array.ndim != 1 or mass_array.shape != intensity_array.shape:
+			raise ValueError("'mass_array' and 'intensity_array' must be one-dimensional and the same size")
+
+		scan_offsets = numpy.append(numpy.asarray(scan_index, dtype=int), len(mass_array))
+
+		if len(scan_offsets) != len(time_list) + 1 or numpy.any(numpy.diff(scan_offsets) < 0):
+			raise ValueError("'scan_index' must give the start of each scan in increasing order")
+
+		mass_array, intensity_array = _sort_scans(mass_array, intensity_array, scan_offsets)
+
+		self = cls.__new__(cls)
+		self._scan_offsets = scan_offsets
+		self._mass_array = mass_array
+		self._intensity_array = intensity_array
+
+		self._time_list = time_list
+		self.__set_time()
+		self.__set_min_max_mass()
+		self.__calc_tic()
+
+		return self
+
 	def __eq__(self, other):
 		"""
 		Return whether this GCMS_data object is equal to another object
@@ -90,7 +153,9 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		"""
 
 		if isinstance(other, self.__class__):
-			return self.scan_list == other.scan_list \
+			return numpy.array_equal(self._scan_offsets, other._scan_offsets) \
+					and numpy.array_equal(self._mass_array, other._mass_array) \
+					and numpy.array_equal(self._intensity_array, other._intensity_array) \
 					and self.time_list == other.time_list
 
 		return NotImplemented
@@ -105,7 +170,7 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		:author: Vladimir Likic
 		"""
 
-		return len(self._scan_list)
+		return len(self._scan_offsets) - 1
 
 	def __repr__(self):
 		return f"GCMS_data(rt range {self.min_rt} - {self.max_rt}, time_step {self.time_step}, length {len(self)})"
@@ -125,10 +190,15 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		:author: Vladimir Likic
 		"""
 
-		intensities = []
-		for scan in self._scan_list:
-			intensities.append(sum(scan.intensity_list))
-		ia = numpy.array(intensities)
+		# numpy.bincount adds the intensities of each scan in turn,
+		# in the same order as summing the scans one at a time.
+		ia = numpy.bincount(
+				self._point_scan_indices(),
+				weights=self._intensity_array,
+				minlength=len(self),
+				)
+		if numpy.issubdtype(self._intensity_array.dtype, numpy.integer):
+			ia = ia.astype(self._intensity_array.dtype)
 		rt = copy.deepcopy(self._time_list)
 		tic = IonChromatogram(ia, rt)
 
@@ -171,22 +241,21 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		:author: Vladimir Likic
 		"""
 
-		mini = self._scan_list[0].min_mass
-		maxi = self._scan_list[0].max_mass
-		for scan in self._scan_list:
+		if len(self._mass_array):
+			self._min_mass = self._mass_array.min().item()
+			self._max_mass = self._mass_array.max().item()
+		else:
+			self._min_mass = None
+			self._max_mass = None
 
-			tmp_mini = scan.min_mass
-			if tmp_mini is not None:
-				if tmp_mini < mini:
-					mini = tmp_mini
+	def _point_scan_indices(self):
+		"""
+		Returns the index of the scan each point belongs to
 
-			tmp_maxi = scan.max_mass
-			if tmp_maxi is not None:
-				if tmp_maxi > maxi:
-					maxi = tmp_maxi
+		:rtype: numpy.ndarray
+		"""
 
-		self._min_mass = mini
-		self._max_mass = maxi
+		return numpy.repeat(numpy.arange(len(self)), numpy.diff(self._scan_offsets))
 
 	@deprecation.deprecated(deprecated_in="2.1.2", removed_in="2.2.0",
 							current_version=__version__,
@@ -231,17 +300,14 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		# print the summary of simply attributes
 		print(f" Data retention time range: {self._min_rt / 60.0:.3f} min -- {self._max_rt / 60:.3f} min")
 		print(f" Time step: {self._time_step:.3f} s (std={self._time_step_std:.3f} s)")
-		print(f" Number of scans: {len(self._scan_list):d}")
+		print(f" Number of scans: {len(self):d}")
 		print(f" Minimum m/z measured: {self._min_mass:.3f}")
 		print(f" Maximum m/z measured: {self._max_mass:.3f}")
 
 		# calculate median number of m/z values measured per scan
-		n_list = []
-		for ii in range(len(self._scan_list)):
-			scan = self._scan_list[ii]
-			n = len(scan)
-			n_list.append(n)
-			if print_scan_n:
+		n_list = numpy.diff(self._scan_offsets).tolist()
+		if print_scan_n:
+			for n in n_list:
 				print(n)
 		mz_mean = mean(n_list)
 		mz_median = median(n_list)
@@ -253,6 +319,8 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		"""
 		Return a list of the scan objects
 
+		The scans are created from the underlying arrays each time this is accessed.
+
 		:rtype: :class:`list` of :class:`pyms.Spectrum.Scan` objects
 
 		:author: Qiao Wang
@@ -260,7 +328,30 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		:author: Vladimir Likic
 		"""
 
-		return copy.deepcopy(self._scan_list)
+		return [self.get_scan_at_index(ix) for ix in range(len(self))]
+
+	def get_scan_at_index(self, ix):
+		"""
+		Returns the scan with the given index
+
+		:param ix: The index of the scan
+		:type ix: int
+
+		:rtype: pyms.Spectrum.Scan
+		"""
+
+		if not isinstance(ix, int):
+			raise TypeError("'ix' must be an integer")
+
+		if not 0 <= ix < len(self):
+			raise IndexError("index out of range")
+
+		start, end = self._scan_offsets[ix], self._scan_offsets[ix + 1]
+
+		with warnings.catch_warnings():
+			# Any warning about the sort order was given when the data was loaded
+			warnings.simplefilter("ignore")
+			return Scan(_as_double(self._mass_array[start:end]), _as_double(self._intensity_array[start:end]))
 
 	@property
 	def time_list(self):
@@ -350,7 +441,7 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		if begin is None and end is None:
 			raise SyntaxError("At least one of 'begin' and 'end' is required")
 
-		N = len(self._scan_list)
+		N = len(self)
 
 		# process 'begin' and 'end'
 		if begin is None:
@@ -383,18 +474,14 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 
 		print(f"Trimming data to between {first_scan + 1:d} and {last_scan + 1:d} scans")
 
-		scan_list_new = []
-		time_list_new = []
-		for ii in range(len(self._scan_list)):
-			if first_scan <= ii <= last_scan:
-				scan = self._scan_list[ii]
-				time = self._time_list[ii]
-				scan_list_new.append(scan)
-				time_list_new.append(time)
+		start = self._scan_offsets[first_scan]
+		end = self._scan_offsets[last_scan + 1]
 
 		# update info
-		self._scan_list = scan_list_new
-		self._time_list = time_list_new
+		self._mass_array = self._mass_array[start:end]
+		self._intensity_array = self._intensity_array[start:end]
+		self._scan_offsets = self._scan_offsets[first_scan:last_scan + 2] - start
+		self._time_list = self._time_list[first_scan:last_scan + 1]
 		self.__set_time()
 		self.__set_min_max_mass()
 		self.__calc_tic()
@@ -430,16 +517,17 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		fp1 = open(file_name1, "w")
 		fp2 = open(file_name2, "w")
 
-		for scan in self._scan_list:
+		for ix in range(len(self)):
+			start, end = self._scan_offsets[ix], self._scan_offsets[ix + 1]
 
-			for index, intensity in enumerate(scan.intensity_list):
+			for index, intensity in enumerate(self._intensity_array[start:end]):
 				if index == 0:
 					fp1.write(f"{intensity:.4f}")
 				else:
 					fp1.write(f",{intensity:.4f}")
 			fp1.write("\n")
 
-			for index, mass in enumerate(scan.mass_list):
+			for index, mass in enumerate(self._mass_array[start:end]):
 				if index == 0:
 					fp2.write(f"{mass:.4f}")
 				else:
@@ -467,15 +555,109 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 
 		file_name = prepare_filepath(file_name)
 
-		# n = len(self._scan_list)
-
 		print(" -> Writing scans to a file")
 
 		fp = file_name.open("w")
 
-		for scan in self._scan_list:
-			intensities = scan.intensity_list
-			for i in intensities:
-				fp.write(f"{i:8.4f}\n")
+		for i in self._intensity_array:
+			fp.write(f"{i:8.4f}\n")
 
 		fp.close()
+
+
+def _concatenate(arrays):
+	"""
+	Concatenates the masses or intensities of the scans into a single array
+
+	:param arrays: The masses or intensities of each non-empty scan
+	:type arrays: list
+
+	:rtype: numpy.ndarray
+	"""
+
+	if not arrays:
+		return numpy.array([], dtype=float)
+
+	return numpy.concatenate([array_as_numeric(array) for array in arrays])
+
+
+def _as_double(array):
+	"""
+	Converts single precision floating point data, such as that read from
+	ANDI-MS files, to double precision. Other data is returned unchanged.
+
+	:type array: numpy.ndarray
+
+	:rtype: numpy.ndarray
+	"""
+
+	if numpy.issubdtype(array.dtype, numpy.floating) and array.dtype.itemsize < 8:
+		return array.astype(float)
+
+	return array
+
+
+def _sort_scans(mass_array, intensity_array, scan_offsets):
+	"""
+	Reverses any scans whose masses are in descending order, as
+	:class:`~pyms.Spectrum.Scan` does.
+
+	The arrays are copied before the scans are reversed, unless they are
+	copy-on-write memory maps, in which case they are reversed in place.
+
+	:param mass_array: The masses of all scans
+	:type mass_array: numpy.ndarray
+	:param intensity_array: The intensities of all scans
+	:type intensity_array: numpy.ndarray
+	:param scan_offsets: The start of each scan, followed by the total number of points
+	:type scan_offsets: numpy.ndarray
+
+	:return: The mass and intensity arrays
+	:rtype: tuple of numpy.ndarray
+	"""
+
+	if len(mass_array) < 2:
+		return mass_array, intensity_array
+
+	# Consider only the steps between points in the same scan
+	steps = numpy.diff(mass_array)
+	same_scan = numpy.ones(len(steps), dtype=bool)
+	scan_ends = scan_offsets[1:-1]
+	same_scan[scan_ends[(scan_ends > 0) & (scan_ends < len(mass_array))] - 1] = False
+
+	step_scans = numpy.repeat(numpy.arange(len(scan_offsets) - 1), numpy.diff(scan_offsets))[1:]
+	n_scans = len(scan_offsets) - 1
+	n_increasing = numpy.bincount(step_scans[same_scan & (steps > 0)], minlength=n_scans)
+	n_decreasing = numpy.bincount(step_scans[same_scan & (steps < 0)], minlength=n_scans)
+
+	if numpy.any((n_increasing > 0) & (n_decreasing > 0)):
+		warnings.warn("""Unknown sort order for mass list; it doesn't appear to be in either ascending or descending order.
+Please report this at https://github.com/domdfcoding/pymassspec/issues and upload an example data file if possible.
+""")
+
+	descending = numpy.flatnonzero((n_decreasing > 0) & (n_increasing == 0))
+
+	if len(descending):
+		# Copy-on-write mappings only copy the pages that are written to
+		if not _is_copy_on_write(mass_array):
+			mass_array = mass_array.copy()
+		if not _is_copy_on_write(intensity_array):
+			intensity_array = intensity_array.copy()
+		for ix in descending:
+			start, end = scan_offsets[ix], scan_offsets[ix + 1]
+			mass_array[start:end] = mass_array[start:end][::-1]
+			intensity_array[start:end] = intensity_array[start:end][::-1]
+
+	return mass_array, intensity_array
+
+
+def _is_copy_on_write(array):
+	"""
+	Returns whether ``array`` is a copy-on-write :class:`numpy.memmap`.
+
+	:type array: numpy.ndarray
+
+	:rtype: bool
+	"""
+
+	return isinstance(array, numpy.memmap) and array.mode == "c"
@@ -24,10 +24,14 @@ Functions for reading manufacturer specific ANDI-MS data files
 ################################################################################
 
 # stdlib
+import mmap as _mmap
 import pathlib
+import warnings
 
 # 3rd party
+import numpy
 from netCDF4 import Dataset
+from scipy.io import netcdf_file
 
 try:
 	from mpi4py import MPI
@@ -36,7 +40,6 @@ except ModuleNotFoundError:
 
 # this package
 from pyms.GCMS.Class import GCMS_data
-from pyms.Spectrum import Scan
 
 
 # netCDF dimension names
@@ -50,12 +53,27 @@ __TIME_STRING = "scan_acquisition_time"
 __POINT_COUNT = "point_count"
 
 
-def ANDI_reader(file_name):
+def ANDI_reader(file_name, mmap=False):
 	"""
 	A reader for ANDI-MS NetCDF files
 
+	The file is opened read-only, and the masses and intensities are kept
+	as NumPy arrays in the returned :class:`~pyms.GCMS.Class.GCMS_data`
+	object rather than being converted into :class:`~pyms.Spectrum.Scan` objects.
+
 	:param file_name: The path of the ANDI-MS file
 	:type file_name: str or os.PathLike
+	:param mmap: Whether to memory-map the masses and intensities rather
+		than reading them into memory. This reduces memory usage for large
+		files, but the file must not be modified or deleted while the data
+		is in use. Default :py:obj:`False`.
+
+		The masses or intensities are still read into memory if the file
+		gives a ``scale_factor`` or ``add_offset`` for them, as the scaled
+		values must be calculated. Scans with the masses in descending
+		order are reversed in a private copy-on-write mapping, so only the
+		pages holding those scans are copied into memory.
+	:type mmap: bool, optional
 
 	:return: GC-MS data object
 	:rtype: :class:`pyms.GCMS.Class.GCMS_data`
@@ -69,42 +87,112 @@ def ANDI_reader(file_name):
 	if not isinstance(file_name, (str, pathlib.Path)):
 		raise TypeError("'file_name' must be a string or a pathlib.Path object")
 
-	rootgrp = Dataset(file_name, "r+", format='NETCDF3_CLASSIC')
-	# TODO: find out if netCDF4 throws specific errors that we can use here
-
 	print(f" -> Reading netCDF file '{file_name}'")
 
-	scan_list = []
-	mass = rootgrp.variables[__MASS_STRING][:]
-	intensity = rootgrp.variables[__INTENSITY_STRING][:]
+	if mmap:
+		mass, intensity, scan_lengths, time = _read_mmap(file_name)
+	else:
+		rootgrp = Dataset(file_name, "r", format='NETCDF3_CLASSIC')
+		# TODO: find out if netCDF4 throws specific errors that we can use here
 
-	scan_lengths = rootgrp.variables["point_count"]  # The number of data points in each scan
+		# Return plain arrays rather than masked arrays
+		rootgrp.set_auto_mask(False)
 
-	mass_values = mass.tolist()
-	intensity_values = intensity.tolist()
+		mass = rootgrp.variables[__MASS_STRING][:]
+		intensity = rootgrp.variables[__INTENSITY_STRING][:]
+		scan_lengths = rootgrp.variables[__POINT_COUNT][:]  # The number of data points in each scan
+		time = rootgrp.variables[__TIME_STRING][:]
 
-	if len(mass_values) != len(intensity_values):
-		raise ValueError("The lengths of the mass and intensity lists differ!")
+		rootgrp.close()
 
-	offset = 0
-	for idx, length in enumerate(scan_lengths):
-		mass_list = mass_values[offset:offset + length]
-		assert len(mass_values[offset:offset + length]) == length
-		intensity_list = intensity_values[offset:offset + length]
-		assert len(intensity_values[offset:offset + length]) == length
-		scan_list.append(Scan(mass_list, intensity_list))
-		offset += length
+	if len(mass) != len(intensity):
+		raise ValueError("The lengths of the mass and intensity lists differ!")
 
-	assert offset == len(mass_values)
+	scan_lengths = numpy.asarray(scan_lengths, dtype=int)
+	if scan_lengths.sum() != len(mass):
+		raise ValueError("The number of data points does not equal the total of the scan lengths")
 
-	time = rootgrp.variables[__TIME_STRING][:]
-	time_list = time.tolist()
+	time_list = numpy.asarray(time).tolist()
 
 	# sanity check
-	if not len(time_list) == len(scan_list):
+	if not len(time_list) == len(scan_lengths):
 		raise ValueError("number of time points does not equal the number of scans")
 
-	return GCMS_data(time_list, scan_list)
+	# The index of the first point of each scan
+	scan_index = numpy.cumsum(scan_lengths) - scan_lengths
+
+	return GCMS_data.from_arrays(time_list, mass, intensity, scan_index)
+
+
+def _read_mmap(file_name):
+	"""
+	Reads the masses, intensities, scan lengths and scan times from an
+	ANDI-MS file, with the masses and intensities memory-mapped
+
+	:param file_name: The path of the ANDI-MS file
+	:type file_name: str or os.PathLike
+
+	:return: The masses, intensities, scan lengths and scan times
+	:rtype: tuple of numpy.ndarray
+	"""
+
+	rootgrp = netcdf_file(str(file_name), "r", mmap=True)
+
+	variables = []
+	for name in (__MASS_STRING, __INTENSITY_STRING, __POINT_COUNT, __TIME_STRING):
+		variable = rootgrp.variables[name]
+		data = variable.data
+
+		# netCDF4 applies these automatically, but scipy does not.
+		# Scaling creates a new array, so skip it when it would not change the values.
+		scale_factor = getattr(variable, "scale_factor", 1)
+		add_offset = getattr(variable, "add_offset", 0)
+		if scale_factor != 1:
+			data = data * scale_factor
+		if add_offset != 0:
+			data = data + add_offset
+
+		if name in {__MASS_STRING, __INTENSITY_STRING}:
+			data = _copy_on_write(file_name, data)
+
+		variables.append(data)
+
+	with warnings.catch_warnings():
+		# scipy warns that the mapping stays open while the arrays refer to it
+		warnings.simplefilter("ignore", RuntimeWarning)
+		rootgrp.close()
+
+	return tuple(variables)
+
+
+def _copy_on_write(file_name, data):
+	"""
+	Maps the same part of the file as ``data`` again, copy-on-write, so that
+	scans can be reversed in place without copying the whole array into memory.
+
+	:param file_name: The path of the ANDI-MS file
+	:type file_name: str or os.PathLike
+	:param data: A variable read from the file by :class:`scipy.io.netcdf_file`
+
+	:return: The copy-on-write mapping, or ``data`` if it is not a
+		contiguous view of the file
+	:rtype: numpy.ndarray
+	"""
+
+	# Find the array spanning the whole of scipy's read-only mapping
+	buffer = data
+	while isinstance(buffer.base, numpy.ndarray):
+		buffer = buffer.base
+
+	owner = buffer.base
+	if isinstance(owner, memoryview):
+		owner = owner.obj
+
+	if not isinstance(owner, _mmap.mmap) or not data.flags.c_contiguous or not data.size:
+		return data
+
+	offset = data.ctypes.data - buffer.ctypes.data
+	return numpy.memmap(file_name, dtype=data.dtype, mode="c", offset=offset, shape=data.shape)
 
 
 def ANDI_writer(file_name, im):
@@ -29,20 +29,33 @@ Functions for I/O of data in JCAMP-DX format
 
 # stdlib
 import pathlib
+import re
+import warnings
+
+# 3rd party
+import numpy
 
 # this package
 from pyms.GCMS.Class import GCMS_data
-from pyms.Spectrum import Scan
 from pyms.Utils.IO import prepare_filepath
 from pyms.Utils.jcamp import header_info_fields, xydata_tags
 from pyms.Utils.Math import is_float
 from pyms.Utils.Utils import is_path
 
 
+# Lines starting with ## contain labels such as ##PAGE=
+_label_line_re = re.compile(r"^##.*", flags=re.MULTILINE)
+
+
 def JCAMP_reader(file_name):
 	"""
 	Generic reader for JCAMP DX files
 
+	The page boundaries are found in a single pass over the file. The data
+	of each page is converted to a NumPy array at once, and the masses and
+	intensities are stored in the returned :class:`~pyms.GCMS.Class.GCMS_data`
+	object without creating :class:`~pyms.Spectrum.Scan` objects.
+
 	:param file_name: Path of the file to read
 	:type file_name: str or os.PathLike
 
@@ -58,109 +71,134 @@ def JCAMP_reader(file_name):
 	file_name = prepare_filepath(file_name, mkdirs=False)
 
 	print(f" -> Reading JCAMP file '{file_name}'")
-	lines_list = file_name.open('r')
-	data = []
+	data_blocks = []  # The data of the current page
 	page_idx = 0
 	xydata_idx = 0
 	time_list = []
-	scan_list = []
+	mass_arrays = []
+	intensity_arrays = []
+	scan_index = []
+	n_points = 0
 
 	header_info = {}  # Dictionary containing header information
 
-	for line in lines_list:
-
-		if len(line.strip()) != 0:
-			# prefix = line.find('#')
-			# if prefix == 0:
-			if line.startswith("##"):
-				# key word or information
-				fields = line.split('=', 1)
-				fields[0] = fields[0].lstrip("##").upper()
-				fields[1] = fields[1].strip()
-
-				if "PAGE" in fields[0]:
-					if "T=" in fields[1]:
-						# PAGE contains retention time starting with T=
-						# FileConverter Pro style
-						time = float(fields[1].lstrip("T="))  # rt for the scan to be submitted
-						time_list.append(time)
-					page_idx = page_idx + 1
-				elif "RETENTION_TIME" in fields[0]:
-					# OpenChrom style
-					time = float(fields[1])  # rt for the scan to be submitted
-
-					# Check to make sure time is not already in the time list;
-					# Can happen when both ##PAGE and ##RETENTION_TIME are specified
-					if time_list[-1] != time:
-						time_list.append(time)
-
-				elif fields[0] in xydata_tags:
-					xydata_idx = xydata_idx + 1
-
-				elif fields[0] in header_info_fields:
-					if fields[1].isdigit():
-						header_info[fields[0]] = int(fields[1])
-					elif is_float(fields[1]):
-						header_info[fields[0]] = float(fields[1])
-					else:
-						header_info[fields[0]] = fields[1]
-
-			# elif prefix == -1:
+	def add_scan():
+		nonlocal n_points
+
+		mass_array, intensity_array = _parse_xydata(data_blocks)
+		scan_index.append(n_points)
+		mass_arrays.append(mass_array)
+		intensity_arrays.append(intensity_array)
+		n_points += len(mass_array)
+
+	def add_data(block):
+		# Lines that don't start with ##
+		nonlocal data_blocks, page_idx, xydata_idx
+
+		if not block or block.isspace():
+			return
+
+		if page_idx > 1 or xydata_idx > 1:
+			# The first data after the start of a new page; the previous page is complete
+			add_scan()
+			data_blocks = []
+			if page_idx > 1:
+				page_idx = 1
+			if xydata_idx > 1:
+				xydata_idx = 1
+
+		data_blocks.append(block)
+
+	with file_name.open('r') as fp:
+		text = fp.read()
+
+	# The data between the end of one "##" line and the start of the next
+	data_start = 0
+
+	for match in _label_line_re.finditer(text):
+		add_data(text[data_start:match.start()])
+		data_start = match.end()
+
+		# key word or information
+		fields = match.group().split('=', 1)
+		fields[0] = fields[0].lstrip("##").upper()
+		fields[1] = fields[1].strip()
+
+		if "PAGE" in fields[0]:
+			if "T=" in fields[1]:
+				# PAGE contains retention time starting with T=
+				# FileConverter Pro style
+				time = float(fields[1].lstrip("T="))  # rt for the scan to be submitted
+				time_list.append(time)
+			page_idx = page_idx + 1
+		elif "RETENTION_TIME" in fields[0]:
+			# OpenChrom style
+			time = float(fields[1])  # rt for the scan to be submitted
+
+			# Check to make sure time is not already in the time list;
+			# Can happen when both ##PAGE and ##RETENTION_TIME are specified
+			if not time_list or time_list[-1] != time:
+				time_list.append(time)
+
+		elif fields[0] in xydata_tags:
+			xydata_idx = xydata_idx + 1
+
+		elif fields[0] in header_info_fields:
+			if fields[1].isdigit():
+				header_info[fields[0]] = int(fields[1])
+			elif is_float(fields[1]):
+				header_info[fields[0]] = float(fields[1])
 			else:
-				# Line doesn't start with ##
-				# data
-				if page_idx > 1 or xydata_idx > 1:
-					if len(data) % 2 == 1:
-						# TODO: This means the data is not in x, y pairs
-						#  Make a better error message
-						raise ValueError("data not in pair !")
-					mass_list = []
-					intensity_list = []
-					for i in range(len(data) // 2):
-						mass_list.append(data[i * 2])
-						intensity_list.append(data[i * 2 + 1])
-					if len(mass_list) != len(intensity_list):
-						raise ValueError("len(mass_list) is not equal to len(intensity_list)")
-					scan_list.append(Scan(mass_list, intensity_list))
-					data = []
-					data_sub = line.strip().split(',')
-					for item in data_sub:
-						if not len(item.strip()) == 0:
-							data.append(float(item.strip()))
-					if page_idx > 1:
-						page_idx = 1
-					if xydata_idx > 1:
-						xydata_idx = 1
-				else:
-					data_sub = line.strip().split(',')
-					for item in data_sub:
-						if not len(item.strip()) == 0:
-							data.append(float(item.strip()))
+				header_info[fields[0]] = fields[1]
 
-	if len(data) % 2 == 1:
-		# TODO: This means the data is not in x, y pairs
-		#  Make a better error message
-		raise ValueError("data not in pair !")
+	add_data(text[data_start:])
 
 	# get last scan
-	mass = []
-	intensity = []
-	for i in range(len(data) // 2):
-		mass.append(data[i * 2])
-		intensity.append(data[i * 2 + 1])
-
-	if len(mass) != len(intensity):
-		raise ValueError("len(mass) is not equal to len(intensity)")
-	scan_list.append(Scan(mass, intensity))
+	add_scan()
 
 	# sanity check
 	time_len = len(time_list)
-	scan_len = len(scan_list)
+	scan_len = len(scan_index)
 	if time_len != scan_len:
 		print(time_list)
-		print(scan_list)
 		raise ValueError(f"Number of time points ({time_len}) does not equal the number of scans ({scan_len})")
 
-	data = GCMS_data(time_list, scan_list)
+	data = GCMS_data.from_arrays(
+			time_list,
+			numpy.concatenate(mass_arrays),
+			numpy.concatenate(intensity_arrays),
+			scan_index,
+			)
 
 	return data
+
+
+def _parse_xydata(data_blocks):
+	"""
+	Convert the data of a page of a JCAMP-DX file to arrays of masses and intensities.
+
+	The data consists of lines of comma-separated pairs of masses and intensities.
+
+	:param data_blocks: The blocks of data lines in the page
+	:type data_blocks: list[str]
+
+	:return: The masses and intensities
+	:rtype: tuple[numpy.ndarray, numpy.ndarray]
+	"""
+
+	text = ''.join(data_blocks).replace(',', ' ')
+
+	with warnings.catch_warnings():
+		# numpy.fromstring stops at the first value it cannot parse and emits a DeprecationWarning
+		warnings.simplefilter("error", DeprecationWarning)
+		try:
+			data = numpy.fromstring(text, dtype=numpy.float64, sep=' ')
+		except DeprecationWarning:
+			raise ValueError("Could not convert the data to numbers") from None
+
+	if len(data) % 2 == 1:
+		# TODO: This means the data is not in x, y pairs
+		#  Make a better error message
+		raise ValueError("data not in pair !")
+
+	return data[0::2], data[1::2]
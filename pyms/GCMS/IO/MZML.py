@@ -27,6 +27,7 @@ Functions for reading mzML format data files
 import pathlib
 
 # 3rd party
+import numpy
 import pymzml
 
 try:
@@ -35,15 +36,31 @@ except ModuleNotFoundError:
 	pass
 
 # this package
-from pyms.GCMS.Class import GCMS_data
-from pyms.Spectrum import Scan
+from pyms.GCMS.Class import GCMS_data, _concatenate
 from pyms.Base import is_path
 
 
+# the accession of the "scan start time" cvParam
+__TIME_ACCESSION = "MS:1000016"
+
+# factors to convert retention times to seconds
+__TIME_UNITS = {
+		"millisecond": 0.001,
+		"second": 1.0,
+		"minute": 60.0,
+		"hour": 3600.0,
+		}
+
+
 def mzML_reader(file_name):
 	"""
 	A reader for mzML files
 
+	The masses and intensities of each spectrum are read as NumPy arrays
+	and stored in the returned :class:`~pyms.GCMS.Class.GCMS_data` object
+	without creating :class:`~pyms.Spectrum.Scan` objects.
+	Use :func:`~pyms.GCMS.IO.MZML.iter_mzML_scans` to read the spectra one at a time instead.
+
 	:param file_name: The name of the mzML file
 	:type file_name: str or os.PathLike
 
@@ -83,29 +100,103 @@ def mzML_reader(file_name):
 		print(e)
 		print(f" -> Reading mzML file '{file_name}'")
 
-	scan_list = []
 	time_list = []
+	mass_arrays = []
+	intensity_arrays = []
+	scan_index = []
+	n_points = 0
+
+	try:
+		for rt, mass_array, intensity_array in _iter_spectra(mzml_file):
+			time_list.append(rt)
+			scan_index.append(n_points)
+			mass_arrays.append(mass_array)
+			intensity_arrays.append(intensity_array)
+			n_points += len(mass_array)
+	finally:
+		mzml_file.close()
+
+	data = GCMS_data.from_arrays(
+			time_list,
+			_concatenate(mass_arrays),
+			_concatenate(intensity_arrays),
+			scan_index,
+			)
+
+	return data
+
+
+def iter_mzML_scans(file_name):
+	"""
+	Lazily iterate over the scans in an mzML file.
+
+	Each spectrum is read from the file only when it is requested, so the
+	whole file never has to be held in memory.
+	Spectra without a retention time are skipped.
+
+	:param file_name: The name of the mzML file
+	:type file_name: str or os.PathLike
+
+	:return: An iterator over ``(retention_time, mass_array, intensity_array)`` tuples,
+		with the retention time in seconds.
+	:rtype: ~collections.abc.Iterator[tuple[float, numpy.ndarray, numpy.ndarray]]
+	"""
+
+	if not is_path(file_name):
+		raise TypeError("'file_name' must be a string or a PathLike object")
+
+	mzml_file = pymzml.run.Reader(str(file_name))
+
+	try:
+		yield from _iter_spectra(mzml_file)
+	finally:
+		mzml_file.close()
+
+
+def _iter_spectra(mzml_file):
+	"""
+	Yield the retention time, masses and intensities of each spectrum in a :class:`pymzml.run.Reader`.
+
+	:param mzml_file:
+	:type mzml_file: pymzml.run.Reader
+
+	:rtype: ~collections.abc.Iterator[tuple[float, numpy.ndarray, numpy.ndarray]]
+	"""
 
 	for spectrum in mzml_file:
-		mass_list = []
-		intensity_list = []
+		rt = _get_scan_time(spectrum)
 
-		for mz, i in spectrum.peaks:
-			mass_list.append(mz)
-			intensity_list.append(i)
+		# For some reason there are spectra with no time value; ignore these
+		if rt is None:
+			continue
 
-		# scan_list.append(Scan(mass_list, intensity_list))
-		for element in spectrum.xmlTree:
-			# For some reason there are spectra with no time value,
-			# Ignore these????????????
-			if element.get('accession') == "MS:1000016":  # time value
-				# We need time in seconds not minutes
-				time_list.append(60 * float(element.get('value')))
-				scan_list.append(Scan(mass_list, intensity_list))
+		mass_array = numpy.asarray(spectrum.mz, dtype=numpy.float64)
+		intensity_array = numpy.asarray(spectrum.i, dtype=numpy.float64)
 
-	# print("time:", len(time_list))
-	# print("scan:", len(scan_list))
+		# release the parsed XML of spectra that have already been read
+		spectrum.element.clear()
 
-	data = GCMS_data(time_list, scan_list)
+		yield rt, mass_array, intensity_array
 
-	return data
+
+def _get_scan_time(spectrum):
+	"""
+	Returns the retention time of the spectrum in seconds,
+	or :py:obj:`None` if the spectrum does not have a retention time.
+
+	Retention times with no unit, or an unrecognised unit, are assumed to be in minutes.
+
+	:param spectrum:
+	:type spectrum: pymzml.spec.Spectrum
+
+	:rtype: float or None
+	"""
+
+	element = spectrum.element.find(f".//*[@accession='{__TIME_ACCESSION}']")
+
+	if element is None:
+		return None
+
+	factor = __TIME_UNITS.get(str(element.get("unitName", "minute")).lower(), 60.0)
+
+	return factor * float(element.get("value"))
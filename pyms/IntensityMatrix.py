@@ -24,20 +24,32 @@ Class to model Intensity Matrix
 ################################################################################
 
 # stdlib
+import concurrent.futures
 import copy
 import enum
 from numbers import Number
 from warnings import warn
 
+try:
+	from multiprocessing import shared_memory
+except ImportError:  # Python 3.6 and 3.7
+	shared_memory = None
+
 # 3rd party
 import deprecation
 import numpy
+import scipy.sparse
+
+try:
+	import h5py
+except ImportError:
+	h5py = None
 
 # this package
 from pyms import __version__
 from pyms.Base import pymsBaseClass
 from pyms.IonChromatogram import IonChromatogram
-from pyms.Mixins import GetIndexTimeMixin, IntensityArrayMixin, MassListMixin, TimeListMixin
+from pyms.Mixins import GetIndexTimeMixin, IntensityArrayMixin, MassListMixin, TimeListMixin, _get_axis
 from pyms.Spectrum import MassSpectrum
 from pyms.Utils.IO import prepare_filepath, save_data
 from pyms.Utils.Utils import is_path, is_sequence, is_sequence_of
@@ -77,6 +89,10 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 	:authors: Andrew Isaac, Dominic Davis-Foster (type assertions and properties)
 	"""
 
+	# The indices of the columns nulled by null_mass() which are zeroed as they
+	# are read, as the intensity array is a memmap that is not written to.
+	_null_indices = frozenset()
+
 	def __init__(self, time_list, mass_list, intensity_array):
 		"""
 		Initialize the IntensityMatrix data
@@ -89,16 +105,12 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		if not is_sequence_of(mass_list, Number):
 			raise TypeError("'mass_list' must be a Sequence of Numbers")
 
-		if not is_sequence(intensity_array) or not is_sequence_of(intensity_array[0], Number):
-			raise TypeError("'intensity_array' must be a Sequence, of Sequences, of Numbers")
-
-		if not isinstance(intensity_array, numpy.ndarray):
-			intensity_array = numpy.array(intensity_array)
+		intensity_array = self._as_intensity_array(intensity_array)
 
-		if not len(time_list) == len(intensity_array):
+		if not len(time_list) == intensity_array.shape[0]:
 			raise ValueError("'time_list' is not the same length as 'intensity_array'")
 
-		if not len(mass_list) == len(intensity_array[0]):
+		if not len(mass_list) == intensity_array.shape[1]:
 			raise ValueError("'mass_list' is not the same size as 'intensity_array'")
 
 		self._time_list = time_list
@@ -118,7 +130,7 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 			comm = MPI.COMM_WORLD
 			num_ranks = comm.Get_size()
 			rank = comm.Get_rank()
-			M, N = len(intensity_array), len(intensity_array[0])
+			M, N = intensity_array.shape
 			lrr = (rank * M / num_ranks, (rank + 1) * M / num_ranks)
 			lcr = (rank * N / num_ranks, (rank + 1) * N / num_ranks)
 			m, n = (lrr[1] - lrr[0], lcr[1] - lcr[0])
@@ -136,6 +148,62 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		except ModuleNotFoundError:
 			pass
 
+	@staticmethod
+	def _as_intensity_array(intensity_array):
+		"""
+		Checks the intensity array passed to the constructor and returns it in the format it is stored in.
+
+		:param intensity_array: Binned intensity values per scan
+		:type intensity_array: List[~numbers.Number] or numpy.ndarray[~numbers.Number]
+
+		:rtype: numpy.ndarray
+		"""
+
+		if not is_sequence(intensity_array) or not is_sequence_of(intensity_array[0], Number):
+			raise TypeError("'intensity_array' must be a Sequence, of Sequences, of Numbers")
+
+		if not isinstance(intensity_array, numpy.ndarray):
+			intensity_array = numpy.array(intensity_array)
+
+		if intensity_array.ndim != 2:
+			raise ValueError("'intensity_array' must have the same number of intensities in each scan")
+
+		return intensity_array
+
+	@property
+	def intensity_array(self):
+		"""
+		Returns a copy of the intensity array
+
+		:return: Matrix of intensity values
+		:rtype: numpy.ndarray
+		"""
+
+		return numpy.array(self._intensities)
+
+	@property
+	def _intensities(self):
+		"""
+		The intensity array to read from, with the columns nulled
+		by :meth:`~.null_mass` but not yet zeroed reading as zero.
+
+		:rtype: numpy.ndarray or pyms.IntensityMatrix._NulledIntensityArray
+		"""
+
+		if self._null_indices:
+			return _NulledIntensityArray(self._intensity_array, self._null_indices)
+
+		return self._intensity_array
+
+	def _apply_null_indices(self):
+		"""
+		Zeroes the columns nulled by :meth:`~.null_mass` in the intensity array itself.
+		"""
+
+		if self._null_indices:
+			self._intensity_array[:, sorted(self._null_indices)] = 0
+			self._null_indices = frozenset()
+
 	def __len__(self):
 		"""
 		Returns the number of scans in the Intensity Matrix
@@ -221,8 +289,7 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		:authors: Qiao Wang, Andrew Isaac, Luke Hodkinson, Vladimir Likic
 		"""
 
-		n_scan = len(self._intensity_array)
-		n_mz = len(self._intensity_array[0])
+		n_scan, n_mz = self._intensity_array.shape
 
 		return n_scan, n_mz
 
@@ -246,7 +313,7 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 
 		else:
 			# Iterate over global indices.
-			n_scan = len(self._intensity_array)
+			n_scan = self._intensity_array.shape[0]
 			for i in range(0, n_scan):
 				yield i
 
@@ -270,7 +337,7 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 
 		else:
 			# Iterate over global indices.
-			n_mz = len(self._intensity_array[0])
+			n_mz = self._intensity_array.shape[1]
 			for i in range(0, n_mz):
 				yield i
 
@@ -296,30 +363,30 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		if not isinstance(ic, IonChromatogram):
 			raise TypeError("'ic' must be an IonChromatogram object")
 
-		# this returns an numpy.array object
-		ia = ic.intensity_array
+		ia = ic._intensity_array
 
 		# check if the dimension is ok
 		if len(ia) != len(self._intensity_array):
 			raise ValueError("ion chromatogram incompatible with the intensity matrix")
 
-		# Convert 'ia' to a list. By convention, the attribute
-		# _intensity_array of the class IntensityMatrix is a list
-		# of lists. This makes pickling instances of IntensityMatrix
-		# practically possible, since pickling numpy.array objects
-		# produces ten times larger files compared to pickling python
-		# lists.
-		ial = ia.tolist()
-		for i in range(len(ia)):
-			self._intensity_array[i][ix] = ial[i]
+		self._intensity_array[:, ix] = ia
+		self._null_indices = self._null_indices - {ix}
 
-	def get_ic_at_index(self, ix):
+	def get_ic_at_index(self, ix, view=False):
 		"""
 		Returns the ion chromatogram at the specified index
 
+		The returned ion chromatogram shares the time list of the intensity matrix.
+
 		:param ix: Index of an ion chromatogram in the intensity data
 			matrix
 		:type ix: int
+		:param view: If :py:obj:`True`, the intensities of the ion chromatogram are
+			a view of the column of the intensity matrix, so changes to one are
+			seen in the other. Default :py:obj:`False`, which copies the intensities.
+			A column nulled by :meth:`~.null_mass` in a memory-mapped matrix is
+			returned as new zeros either way.
+		:type view: bool, optional
 
 		:return: Ion chromatogram at given index
 		:rtype: pyms.IonChromatogram.IonChromatogram
@@ -330,15 +397,40 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		if not isinstance(ix, int):
 			raise TypeError("'ix' must be an integer")
 
-		ia = []
-		for i in range(len(self._intensity_array)):
-			ia.append(self._intensity_array[i][ix])
+		if not isinstance(view, bool):
+			raise TypeError("'view' must be a Boolean")
 
-		ic_ia = numpy.array(ia)
 		mass = self.get_mass_at_index(ix)
-		rt = copy.deepcopy(self._time_list)
 
-		return IonChromatogram(ic_ia, rt, mass)
+		if ix in self._null_indices:
+			ic_ia = numpy.zeros(self._intensity_array.shape[0], dtype=self._intensity_array.dtype)
+		else:
+			ic_ia = self._intensity_array[:, ix]
+			if not view:
+				ic_ia = ic_ia.copy()
+
+		return IonChromatogram._from_time_attributes(ic_ia, self._ic_time_attributes, mass)
+
+	@property
+	def _ic_time_attributes(self):
+		"""
+		The retention time attributes shared by the ion chromatograms returned by
+		:meth:`~pyms.IntensityMatrix.IntensityMatrix.get_ic_at_index`,
+		which are created again if the time list is replaced.
+
+		:rtype: dict
+		"""
+
+		cached = self.__dict__.get("_ic_time_attributes_cache")
+
+		if cached is None or cached[0] is not self._time_list:
+			ic = IonChromatogram(numpy.zeros(len(self._time_list)), self._time_list)
+			# share the time axis of the intensity matrix
+			ic.__dict__["_time_list_axis"] = (self._time_list, self._time_axis)
+			cached = (self._time_list, ic._time_attributes)
+			self.__dict__["_ic_time_attributes_cache"] = cached
+
+		return cached[1]
 
 	def get_ic_at_mass(self, mass=None):
 		"""
@@ -407,7 +499,7 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		if ix < 0 or ix >= len(self._intensity_array):
 			raise IndexError("index out of range")
 
-		return self._intensity_array[ix].tolist()
+		return self._intensities[ix].tolist()
 
 	def get_mass_at_index(self, ix):
 		"""
@@ -448,19 +540,32 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		if not isinstance(mass, Number):
 			raise TypeError("'mass' must be a number")
 
-		best = self._max_mass
-		ix = 0
-		for ii in range(len(self._mass_list)):
-			tmp = abs(self._mass_list[ii] - mass)
-			if tmp < best:
-				best = tmp
-				ix = ii
-		return ix
+		return _get_axis(self, "_mass_list").nearest_index(mass)
+
+	def get_indices_of_masses(self, masses):
+		"""
+		Returns the index of the nearest binned mass to each of the given masses.
+
+		:param masses: Masses to lookup in list of masses
+		:type masses: ~collections.abc.Sequence[float] or numpy.ndarray
+
+		:return: Index of the mass closest to each given mass
+		:rtype: numpy.ndarray
+		"""
+
+		if not is_sequence(masses):
+			raise TypeError("'masses' must be a Sequence")
+
+		return _get_axis(self, "_mass_list").nearest_indices(masses)
 
 	def crop_mass(self, mass_min, mass_max):
 		"""
 		Crops mass spectrum
 
+		The masses are taken as a view of the intensity array, so an array backed by
+		a file is not read into memory. If the mass list is not sorted, and the
+		masses in the range are not consecutive, the intensities are copied instead.
+
 		:param mass_min: Minimum mass value
 		:type mass_min: ~numbers.Number
 		:param mass_max: Maximum mass value
@@ -478,32 +583,63 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		if mass_max > self._max_mass:
 			raise ValueError(f"'mass_max' is greater than the largest mass: {self._max_mass:.3f}")
 
-		# pre build mass_list and list of indecies
-		mass_list = self._mass_list
-		new_mass_list = []
-		ii_list = []
-		for ii, mass in enumerate(mass_list):
-			if mass_min <= mass <= mass_max:
-				new_mass_list.append(mass)
-				ii_list.append(ii)
+		indices = [ii for ii, mass in enumerate(self._mass_list) if mass_min <= mass <= mass_max]
+
+		if not indices:
+			raise ValueError(f"there are no masses between {mass_min:.3f} and {mass_max:.3f}")
 
 		# update intensity matrix
-		im = self._intensity_array.tolist()
-		for spec_jj in range(len(im)):
-			new_spec = []
-			for ii in ii_list:
-				new_spec.append(im[spec_jj][ii])
-			im[spec_jj] = new_spec
-		self._intensity_array = numpy.array(im)
-
-		self._mass_list = new_mass_list
-		self._min_mass = min(new_mass_list)
-		self._max_mass = max(new_mass_list)
+		# A contiguous range of masses is taken as a view, so an array
+		# backed by a file is not read into memory.
+		self._intensity_array = self._intensity_array[:, _index_slice(indices)]
+		self._null_indices = frozenset(
+				new_ii for new_ii, ii in enumerate(indices) if ii in self._null_indices
+				)
+
+		self._mass_list = [self._mass_list[ii] for ii in indices]
+		self._min_mass = min(self._mass_list)
+		self._max_mass = max(self._mass_list)
+
+	def crop_time(self, time_min, time_max):
+		"""
+		Crops the intensity matrix to the scans between two retention times
+
+		The scans are taken as a view of the intensity array, so an array backed
+		by a file is not read into memory. If the time list is not sorted, and the
+		scans in the range are not consecutive, the intensities are copied instead.
+
+		:param time_min: Minimum retention time, in seconds
+		:type time_min: ~numbers.Number
+		:param time_max: Maximum retention time, in seconds
+		:type time_max: ~numbers.Number
+		"""
+
+		if not isinstance(time_min, Number) or not isinstance(time_max, Number):
+			raise TypeError("'time_min' and 'time_max' must be Numbers")
+		if time_min >= time_max:
+			raise ValueError("'time_min' must be less than 'time_max'")
+
+		indices = [ii for ii, time_ in enumerate(self._time_list) if time_min <= time_ <= time_max]
+
+		if not indices:
+			raise ValueError(f"there are no scans between {time_min:.3f} and {time_max:.3f}")
+
+		self._intensity_array = self._intensity_array[_index_slice(indices)]
+
+		self._time_list = [self._time_list[ii] for ii in indices]
+		self._min_rt = min(self._time_list)
+		self._max_rt = max(self._time_list)
 
 	def null_mass(self, mass):
 		"""
 		Ignore given (closest) mass in spectra
 
+		If the intensity array is a :class:`numpy.memmap` which is read-only or
+		copy-on-write, such as from :func:`~pyms.IntensityMatrix.import_npy`,
+		the intensities are not changed. Instead, the mass is recorded and its
+		intensities read as zero, as zeroing a column would copy every page
+		of the file into memory.
+
 		:param mass: Mass value to remove
 		:type mass: int or float
 
@@ -517,9 +653,10 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 
 		ii = self.get_index_of_mass(mass)
 
-		im = self._intensity_array
-		for spec_jj in range(len(im)):
-			im[spec_jj][ii] = 0
+		if isinstance(self._intensity_array, numpy.memmap) and self._intensity_array.mode in {"r", "c"}:
+			self._null_indices = self._null_indices | {ii}
+		else:
+			self._intensity_array[:, ii] = 0
 
 	def reduce_mass_spectra(self, n_intensities=5):
 		"""
@@ -535,6 +672,9 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		if not isinstance(n_intensities, Number):
 			raise TypeError("'n_intensities' must be a number")
 
+		# every scan is replaced, so the nulled masses can be zeroed too
+		self._apply_null_indices()
+
 		# loop over all mass spectral scans
 		for ii, intensity_list in enumerate(self._intensity_array):
 
@@ -588,9 +728,12 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 			separator = ","
 			extension = ".csv"
 
-		# export 2D matrix of intensities
-		vals = self._intensity_array
-		save_data(f"{root_name}.im.{extension}", vals, sep=separator)
+		# export 2D matrix of intensities, a block of scans at a time
+		with prepare_filepath(f"{root_name}.im.{extension}").open("w") as fp:
+			for _, block in _iter_scan_blocks(self._intensities):
+				for scan in block.tolist():
+					fp.write(separator.join(f"{value:.6f}" for value in scan))
+					fp.write("\n")
 
 		# export 1D vector of m/z's, corresponding to rows of
 		# the intensity matrix
@@ -622,7 +765,6 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 
 		mass_list = self._mass_list
 		time_list = self._time_list
-		vals = self._intensity_array
 
 		fp = file_name.open("w")
 
@@ -643,18 +785,390 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 				raise TypeError("mass list datum not a number")
 		fp.write("\r\n")  # windows CR/LF
 
-		# write lines
-		for ii, time_ in enumerate(time_list):
-			fp.write(f"{ii},{time_:#.6e}")
-			for jj in range(len(vals[ii])):
-				if isinstance(vals[ii][jj], Number):
-					fp.write(f",{vals[ii][jj]:#.6e}")
-				else:
-					raise TypeError("datum not a number")
-			fp.write("\r\n")
+		# write lines, reading a block of scans at a time
+		for start, block in _iter_scan_blocks(self._intensities):
+			for ii, scan in enumerate(block.tolist(), start):
+				fp.write(f"{ii},{time_list[ii]:#.6e}")
+				for value in scan:
+					fp.write(f",{value:#.6e}")
+				fp.write("\r\n")
 
 		fp.close()
 
+	def export_npy(self, file_name):
+		"""
+		Exports the intensity matrix as a NumPy ``.npy`` file, which can be
+		memory-mapped with :func:`~pyms.IntensityMatrix.import_npy`.
+
+		The retention times and masses are saved alongside, in a file with
+		the suffix ``.axes.npz``.
+		The intensities are copied a block of scans at a time, so an
+		intensity matrix backed by a file is not read into memory.
+
+		:param file_name: The name of the output file
+		:type file_name: str or os.PathLike
+		"""
+
+		if not is_path(file_name):
+			raise TypeError("'file_name' must be a string or a PathLike object")
+
+		file_name = prepare_filepath(file_name, mkdirs=True)
+
+		intensity_array = numpy.lib.format.open_memmap(
+				str(file_name),
+				mode="w+",
+				dtype=self._intensity_array.dtype,
+				shape=self._intensity_array.shape,
+				)
+		_copy_scan_blocks(self._intensities, intensity_array)
+		intensity_array.flush()
+		del intensity_array
+
+		numpy.savez(
+				str(_axes_file_name(file_name)),
+				time_list=numpy.asarray(self._time_list),
+				mass_list=numpy.asarray(self._mass_list),
+				)
+
+	def export_hdf5(self, file_name):
+		"""
+		Exports the intensity matrix to an HDF5 file, which can be
+		memory-mapped with :func:`~pyms.IntensityMatrix.import_hdf5`.
+
+		The file contains the datasets ``intensity_array``, ``time_list`` and ``mass_list``.
+		The intensities are stored uncompressed and unchunked,
+		and are copied a block of scans at a time.
+
+		Requires `h5py <https://www.h5py.org/>`_.
+
+		:param file_name: The name of the output file
+		:type file_name: str or os.PathLike
+		"""
+
+		if not is_path(file_name):
+			raise TypeError("'file_name' must be a string or a PathLike object")
+
+		_check_h5py()
+
+		file_name = prepare_filepath(file_name, mkdirs=True)
+
+		with h5py.File(str(file_name), "w") as fp:
+			fp.create_dataset("time_list", data=numpy.asarray(self._time_list))
+			fp.create_dataset("mass_list", data=numpy.asarray(self._mass_list))
+			intensity_array = fp.create_dataset(
+					"intensity_array",
+					shape=self._intensity_array.shape,
+					dtype=self._intensity_array.dtype,
+					)
+			_copy_scan_blocks(self._intensities, intensity_array)
+
+
+class SparseIntensityMatrix(IntensityMatrix):
+	"""
+	Intensity matrix of binned raw data, with the intensities held in a
+	:class:`scipy.sparse.csr_matrix` with one row per scan.
+
+	This suits data binned at a high resolution, where most of the
+	intensities are zero. Ion chromatograms are read from a copy of the
+	intensities in :class:`scipy.sparse.csc_matrix` format, which is made
+	the first time one is needed and kept until the intensities change.
+
+	:param time_list: Retention time values
+	:type time_list: list
+	:param mass_list: Binned mass values
+	:type mass_list: list
+	:param intensity_array: Binned intensity values per scan
+	:type intensity_array: scipy.sparse.spmatrix or numpy.ndarray
+	"""
+
+	@staticmethod
+	def _as_intensity_array(intensity_array):
+		"""
+		Checks the intensity array passed to the constructor and returns it in the format it is stored in.
+
+		:param intensity_array: Binned intensity values per scan
+		:type intensity_array: scipy.sparse.spmatrix or numpy.ndarray
+
+		:rtype: scipy.sparse.csr_matrix
+		"""
+
+		if scipy.sparse.issparse(intensity_array):
+			intensity_array = intensity_array.tocsr()
+		elif isinstance(intensity_array, numpy.ndarray) and intensity_array.ndim == 2:
+			intensity_array = scipy.sparse.csr_matrix(intensity_array)
+		else:
+			raise TypeError("'intensity_array' must be a sparse matrix or a 2-D numpy.ndarray")
+
+		# sorted column indices without duplicates, as expected by reduce_mass_spectra()
+		intensity_array.sum_duplicates()
+
+		return intensity_array
+
+	@property
+	def _intensity_array(self):
+		"""
+		The intensities in :class:`scipy.sparse.csr_matrix` format, which is
+		converted from the :class:`scipy.sparse.csc_matrix` format after
+		:meth:`~.set_ic_at_index` changes the intensities.
+
+		:rtype: scipy.sparse.csr_matrix
+		"""
+
+		if self._rows is None:
+			self._rows = self._cols.tocsr()
+
+		return self._rows
+
+	@_intensity_array.setter
+	def _intensity_array(self, intensity_array):
+		self._rows = intensity_array
+		self._cols = None
+
+	def __eq__(self, other):
+		"""
+		Return whether this SparseIntensityMatrix object is equal to another object
+
+		:param other: The other object to test equality with
+		:type other: object
+
+		:rtype: bool
+		"""
+
+		if isinstance(other, SparseIntensityMatrix):
+			return self.time_list == other.time_list \
+					and self.mass_list == other.mass_list \
+					and self._intensity_array.shape == other._intensity_array.shape \
+					and (self._intensity_array != other._intensity_array).nnz == 0
+
+		return super().__eq__(other)
+
+	@property
+	def intensity_array(self):
+		"""
+		Returns the intensity array as a dense :class:`numpy.ndarray`
+
+		:rtype: numpy.ndarray
+		"""
+
+		return self._intensity_array.toarray()
+
+	@property
+	def intensity_array_list(self):
+		"""
+		Returns the intensity array as a list of lists of floats
+
+		:rtype: list
+		"""
+
+		return self.intensity_array.tolist()
+
+	def tocsr(self):
+		"""
+		Returns a copy of the intensities, with one row per scan
+
+		:rtype: scipy.sparse.csr_matrix
+		"""
+
+		return self._intensity_array.copy()
+
+	def tocsc(self):
+		"""
+		Returns a copy of the intensities, with one column per ion
+
+		:rtype: scipy.sparse.csc_matrix
+		"""
+
+		return self._columns.copy()
+
+	def todense(self):
+		"""
+		Returns the intensity matrix with a dense intensity array
+
+		:rtype: pyms.IntensityMatrix.IntensityMatrix
+		"""
+
+		return IntensityMatrix(copy.copy(self._time_list), copy.copy(self._mass_list), self.intensity_array)
+
+	@property
+	def _columns(self):
+		"""
+		The intensities in :class:`scipy.sparse.csc_matrix` format,
+		which is converted again if the intensity array is replaced.
+
+		:rtype: scipy.sparse.csc_matrix
+		"""
+
+		if self._cols is None:
+			self._cols = self._rows.tocsc()
+
+		return self._cols
+
+	def set_ic_at_index(self, ix, ic):
+		"""
+		Sets the ion chromatogram specified by index to a new value
+
+		:param ix: Index of an ion chromatogram in the intensity data matrix to be set
+		:type ix: int
+		:param ic: Ion chromatogram that will be copied at position 'ix'
+			in the data matrix
+		:type: pyms.IonChromatogram.IonChromatogram
+
+		The length of the ion chromatogram must match the appropriate
+		dimension of the intensity matrix.
+
+		Each call copies the stored intensities, so it takes time in
+		proportion to the number of non-zero intensities in the matrix.
+		"""
+
+		if not isinstance(ix, int):
+			raise TypeError("'ix' must be an an integer")
+
+		if not isinstance(ic, IonChromatogram):
+			raise TypeError("'ic' must be an IonChromatogram object")
+
+		ia = ic._intensity_array
+
+		# check if the dimension is ok
+		if len(ia) != self._intensity_array.shape[0]:
+			raise ValueError("ion chromatogram incompatible with the intensity matrix")
+
+		# check the index is ok
+		self.get_mass_at_index(ix)
+
+		columns = self._columns
+		start, stop = columns.indptr[ix], columns.indptr[ix + 1]
+		rows = numpy.flatnonzero(ia)
+
+		indptr = columns.indptr.copy()
+		indptr[ix + 1:] += len(rows) - (stop - start)
+
+		# Only the column in CSC format is replaced; the rows are converted
+		# from it when they are next needed, so setting each ion chromatogram
+		# in turn converts the intensities once rather than once per call.
+		self._cols = scipy.sparse.csc_matrix(
+				(
+						numpy.concatenate([columns.data[:start], ia[rows], columns.data[stop:]]),
+						numpy.concatenate([columns.indices[:start], rows, columns.indices[stop:]]),
+						indptr,
+						),
+				shape=columns.shape,
+				dtype=columns.dtype,
+				)
+		self._rows = None
+
+	def get_ic_at_index(self, ix, view=False):
+		"""
+		Returns the ion chromatogram at the specified index
+
+		The returned ion chromatogram shares the time list of the intensity matrix.
+
+		:param ix: Index of an ion chromatogram in the intensity data
+			matrix
+		:type ix: int
+		:param view: Must be :py:obj:`False`, as the intensities of a
+			sparse matrix cannot be viewed as an array.
+		:type view: bool, optional
+
+		:return: Ion chromatogram at given index
+		:rtype: pyms.IonChromatogram.IonChromatogram
+		"""
+
+		if not isinstance(ix, int):
+			raise TypeError("'ix' must be an integer")
+
+		if not isinstance(view, bool):
+			raise TypeError("'view' must be a Boolean")
+
+		if view:
+			raise ValueError("The intensities of a SparseIntensityMatrix cannot be viewed")
+
+		mass = self.get_mass_at_index(ix)
+
+		columns = self._columns
+		start, stop = columns.indptr[ix], columns.indptr[ix + 1]
+
+		ic_ia = numpy.zeros(columns.shape[0], dtype=columns.dtype)
+		ic_ia[columns.indices[start:stop]] = columns.data[start:stop]
+
+		return IonChromatogram._from_time_attributes(ic_ia, self._ic_time_attributes, mass)
+
+	def get_scan_at_index(self, ix):
+		"""
+		Returns the spectral intensities for scan index
+
+		:param ix: The index of the scan
+		:type ix: int
+
+		:return: Intensity values of scan spectra
+		:rtype: list
+		"""
+
+		if not isinstance(ix, int):
+			raise TypeError("'ix' must be an an integer")
+
+		if ix < 0 or ix >= self._intensity_array.shape[0]:
+			raise IndexError("index out of range")
+
+		return self._intensity_array[ix].toarray().ravel().tolist()
+
+	def null_mass(self, mass):
+		"""
+		Ignore given (closest) mass in spectra
+
+		:param mass: Mass value to remove
+		:type mass: int or float
+		"""
+
+		if not isinstance(mass, Number):
+			raise TypeError("'mass' must be a Number")
+		if mass < self._min_mass or mass > self._max_mass:
+			raise IndexError(f"'mass' not in mass range: {self._min_mass:.3f} to {self._max_mass:.3f}")
+
+		ii = self.get_index_of_mass(mass)
+
+		ia = self._intensity_array
+		ia.data[ia.indices == ii] = 0
+		ia.eliminate_zeros()
+
+		self._cols = None
+
+	def reduce_mass_spectra(self, n_intensities=5):
+		"""
+		Reduces the mass spectra by retaining the top `n_intensities`,
+		discarding all other intensities.
+
+		As for :meth:`IntensityMatrix.reduce_mass_spectra() <pyms.IntensityMatrix.IntensityMatrix.reduce_mass_spectra>`,
+		where intensities are equal the one with the lowest mass is kept.
+
+		:param n_intensities: The number of top intensities to keep
+		:type n_intensities: int
+		"""
+
+		if not isinstance(n_intensities, Number):
+			raise TypeError("'n_intensities' must be a number")
+
+		ia = self._intensity_array.copy()
+		ia.eliminate_zeros()
+
+		n_scans, n_masses = ia.shape
+		row_lengths = numpy.diff(ia.indptr)
+		rows = numpy.repeat(numpy.arange(n_scans), row_lengths)
+
+		# Sort the intensities of each scan in descending order,
+		# keeping equal intensities in order of mass
+		order = numpy.lexsort((ia.indices, -ia.data, rows))
+		rank = numpy.empty(len(order), dtype=numpy.intp)
+		rank[order] = numpy.arange(len(order)) - ia.indptr[rows[order]]
+
+		# Negative intensities rank below the zeros which are not stored
+		negative = ia.data < 0
+		rank[negative] += (n_masses - row_lengths)[rows[negative]]
+
+		ia.data[rank >= n_intensities] = 0
+		ia.eliminate_zeros()
+
+		self._intensity_array = ia
+
 
 def import_leco_csv(file_name):
 	"""
@@ -751,7 +1265,101 @@ def import_leco_csv(file_name):
 	return IntensityMatrix(time_list, mass_list, data)
 
 
-def build_intensity_matrix(data, bin_interval=1, bin_left=0.5, bin_right=0.5, min_mass=None):
+def import_npy(file_name, mmap_mode="c"):
+	"""
+	Imports an intensity matrix saved with :meth:`IntensityMatrix.export_npy`
+
+	By default the intensity array is a copy-on-write :class:`numpy.memmap`, so
+	scans are only read from the file when they are used, and changes are kept
+	in memory rather than written to the file. :meth:`IntensityMatrix.null_mass`
+	records the mass rather than changing the intensities, but other changes,
+	such as :meth:`IntensityMatrix.set_ic_at_index`, copy the parts of the file they change into memory.
+
+	:param file_name: Path of the file to read
+	:type file_name: str or os.PathLike
+	:param mmap_mode: The mode to memory-map the file with, as for :func:`numpy.load`.
+		If :py:obj:`None` the intensities are read into memory.
+	:type mmap_mode: str or None, optional
+
+	:return: Data as an IntensityMatrix
+	:rtype: pyms.IntensityMatrix.IntensityMatrix
+	"""
+
+	if not is_path(file_name):
+		raise TypeError("'file_name' must be a string or a PathLike object")
+
+	file_name = prepare_filepath(file_name, mkdirs=False)
+
+	intensity_array = numpy.load(str(file_name), mmap_mode=mmap_mode)
+
+	with numpy.load(str(_axes_file_name(file_name))) as axes:
+		time_list = axes["time_list"].tolist()
+		mass_list = axes["mass_list"].tolist()
+
+	return IntensityMatrix(time_list, mass_list, intensity_array)
+
+
+def import_hdf5(file_name, mmap_mode="c"):
+	"""
+	Imports an intensity matrix saved with :meth:`IntensityMatrix.export_hdf5`
+
+	The intensity array is memory-mapped as for :func:`~pyms.IntensityMatrix.import_npy`.
+	This is only possible if the dataset is neither chunked nor compressed;
+	other datasets must be read into memory by passing ``mmap_mode=None``.
+
+	Requires `h5py <https://www.h5py.org/>`_.
+
+	:param file_name: Path of the file to read
+	:type file_name: str or os.PathLike
+	:param mmap_mode: The mode to memory-map the file with, as for :class:`numpy.memmap`.
+		If :py:obj:`None` the intensities are read into memory.
+	:type mmap_mode: str or None, optional
+
+	:return: Data as an IntensityMatrix
+	:rtype: pyms.IntensityMatrix.IntensityMatrix
+	"""
+
+	if not is_path(file_name):
+		raise TypeError("'file_name' must be a string or a PathLike object")
+
+	_check_h5py()
+
+	file_name = prepare_filepath(file_name, mkdirs=False)
+
+	with h5py.File(str(file_name), "r") as fp:
+		time_list = fp["time_list"][()].tolist()
+		mass_list = fp["mass_list"][()].tolist()
+
+		dataset = fp["intensity_array"]
+
+		if mmap_mode is None:
+			intensity_array = dataset[()]
+		else:
+			offset = dataset.id.get_offset()
+
+			if dataset.chunks is not None or offset is None:
+				raise ValueError(
+						"The intensity array cannot be memory-mapped as it is chunked or compressed. "
+						"Use 'mmap_mode=None' to read it into memory."
+						)
+
+			shape, dtype = dataset.shape, dataset.dtype
+
+	if mmap_mode is not None:
+		intensity_array = numpy.memmap(str(file_name), mode=mmap_mode, dtype=dtype, shape=shape, offset=offset)
+
+	return IntensityMatrix(time_list, mass_list, intensity_array)
+
+
+def build_intensity_matrix(
+		data,
+		bin_interval=1,
+		bin_left=0.5,
+		bin_right=0.5,
+		min_mass=None,
+		dtype=numpy.float64,
+		sparse=False,
+		):
 	"""
 	Sets the full intensity matrix with flexible bins
 
@@ -765,6 +1373,14 @@ def build_intensity_matrix(data, bin_interval=1, bin_left=0.5, bin_right=0.5, mi
 	:type bin_right: float
 	:param min_mass: Minimum mass to bin (default minimum mass from data)
 	:type min_mass: bool
+	:param dtype: The floating point type of the intensity array. Default :class:`numpy.float64`.
+		The intensities are summed in double precision whatever the type, so with
+		:class:`numpy.float32` they are the double precision values rounded to
+		single precision, within a relative tolerance of ``6e-8``.
+	:type dtype: numpy.dtype, optional
+	:param sparse: Whether to return a :class:`~pyms.IntensityMatrix.SparseIntensityMatrix`,
+		which only stores the bins with intensities. Default :py:obj:`False`.
+	:type sparse: bool, optional
 
 	:return: Binned IntensityMatrix object
 	:rtype: pyms.IntensityMatrix.IntensityMatrix
@@ -786,14 +1402,19 @@ def build_intensity_matrix(data, bin_interval=1, bin_left=0.5, bin_right=0.5, mi
 	if not isinstance(bin_right, Number):
 		raise TypeError("'bin_right' must be a Number.")
 
+	if not isinstance(sparse, bool):
+		raise TypeError("'sparse' must be a Boolean")
+
+	dtype = _float_dtype(dtype)
+
 	if not min_mass:
 		min_mass = data.min_mass
 	max_mass = data.max_mass
 
-	return __fill_bins(data, min_mass, max_mass, bin_interval, bin_left, bin_right)
+	return __fill_bins(data, min_mass, max_mass, bin_interval, bin_left, bin_right, dtype, sparse)
 
 
-def build_intensity_matrix_i(data, bin_left=0.3, bin_right=0.7):
+def build_intensity_matrix_i(data, bin_left=0.3, bin_right=0.7, dtype=numpy.float64, sparse=False):
 	"""
 	Sets the full intensity matrix with integer bins
 
@@ -803,6 +1424,12 @@ def build_intensity_matrix_i(data, bin_left=0.3, bin_right=0.7):
 	:type bin_left: float
 	:param bin_right: right bin boundary offset. Default ``0.7``
 	:type bin_right: float
+	:param dtype: The floating point type of the intensity array. Default :class:`numpy.float64`.
+		See :func:`~pyms.IntensityMatrix.build_intensity_matrix`.
+	:type dtype: numpy.dtype, optional
+	:param sparse: Whether to return a :class:`~pyms.IntensityMatrix.SparseIntensityMatrix`,
+		which only stores the bins with intensities. Default :py:obj:`False`.
+	:type sparse: bool, optional
 
 	:return: Binned IntensityMatrix object
 	:rtype: pyms.IntensityMatrix.IntensityMatrix
@@ -821,6 +1448,11 @@ def build_intensity_matrix_i(data, bin_left=0.3, bin_right=0.7):
 	if not isinstance(bin_right, Number):
 		raise TypeError("'bin_right' must be a number.")
 
+	if not isinstance(sparse, bool):
+		raise TypeError("'sparse' must be a Boolean")
+
+	dtype = _float_dtype(dtype)
+
 	min_mass = data.min_mass
 	max_mass = data.max_mass
 
@@ -828,10 +1460,10 @@ def build_intensity_matrix_i(data, bin_left=0.3, bin_right=0.7):
 	bin_right = abs(bin_right)
 	min_mass = int(min_mass + 1 - bin_right)
 
-	return __fill_bins(data, min_mass, max_mass, 1, bin_left, bin_right)
+	return __fill_bins(data, min_mass, max_mass, 1, bin_left, bin_right, dtype, sparse)
 
 
-def __fill_bins(data, min_mass, max_mass, bin_interval, bin_left, bin_right):
+def __fill_bins(data, min_mass, max_mass, bin_interval, bin_left, bin_right, dtype=numpy.float64, sparse=False):
 	"""
 	Fills the intensity values for all bins
 
@@ -847,6 +1479,10 @@ def __fill_bins(data, min_mass, max_mass, bin_interval, bin_left, bin_right):
 	:type bin_left: float
 	:param bin_right: right bin boundary offset
 	:type bin_right: float
+	:param dtype: The data type of the intensity array
+	:type dtype: numpy.dtype, optional
+	:param sparse: Whether to return a :class:`~pyms.IntensityMatrix.SparseIntensityMatrix`
+	:type sparse: bool, optional
 
 	:return: Binned IntensityMatrix object
 	:rtype: pyms.IntensityMatrix.IntensityMatrix
@@ -869,22 +1505,58 @@ def __fill_bins(data, min_mass, max_mass, bin_interval, bin_left, bin_right):
 	# initialise masses to bin centres
 	mass_list = [i * bin_interval + min_mass for i in range(num_bins)]
 
-	# Modified binning loops. I've replaced the deepcopy getting routines with
-	# the alias properties. This way we can avoid performing the copies when
-	# it is clear that we do not intend on modifying the contents of the arrays
-	# here.
-	#           - Luke Hodkinson, 18/05/2010
+	# The masses and intensities of all scans are held in flat arrays, and
+	# the bin for every point is calculated in one go. The intensities are
+	# then summed into the bins with numpy.bincount, which adds the points
+	# in the same order as looping over each scan. This is done a block of
+	# scans at a time, so only one block is held in double precision.
+	num_scans = len(data)
+	n_points = len(data._mass_array)
 
-	# fill the bins
-	intensity_matrix = []
-	for scan in data.scan_list:  # use the alias, not the copy (Luke)
-		intensity_list = [0.0] * num_bins
-		masses = scan.mass_list  # use the alias, not the copy (Luke)
-		intensities = scan.intensity_list  # use the alias, not the copy (Luke)
-		for ii, mass in enumerate(masses):
-			mm = int((mass + bl - min_mass) / bin_interval)
-			intensity_list[mm] += intensities[ii]
-		intensity_matrix.append(intensity_list)
+	masses = numpy.asarray(data._mass_array, dtype=float)
+	intensities = numpy.asarray(data._intensity_array, dtype=float)
+
+	bin_indices = ((masses + bl - min_mass) / bin_interval).astype(int)
+
+	# Masses below the first bin, such as when 'min_mass' is larger than the
+	# smallest mass in the data, cannot be binned
+	if n_points and (bin_indices.min() < 0 or bin_indices.max() >= num_bins):
+		raise ValueError(
+				f"'data' contains masses outside the range of the bins: {mass_list[0]:.3f} to {mass_list[-1]:.3f}"
+				)
+
+	scan_indices = data._point_scan_indices()
+	scan_offsets = data._scan_offsets
+
+	if sparse:
+		# Only the bins which contain points are summed and stored.
+		# The points of each bin are still added in the same order.
+		bins, point_bins = numpy.unique(scan_indices * num_bins + bin_indices, return_inverse=True)
+		sums = numpy.bincount(point_bins, weights=intensities, minlength=len(bins))
+
+		nonzero = sums != 0
+		bins = bins[nonzero]
+		rows, cols = numpy.divmod(bins, num_bins)
+
+		intensity_matrix = scipy.sparse.csr_matrix(
+				(sums[nonzero].astype(dtype), cols, numpy.searchsorted(rows, numpy.arange(num_scans + 1))),
+				shape=(num_scans, num_bins),
+				)
+
+		return SparseIntensityMatrix(data.time_list, mass_list, intensity_matrix)
+
+	intensity_matrix = numpy.empty((num_scans, num_bins), dtype=dtype)
+	block_scans = max(1, _COPY_BLOCK_SIZE // num_bins)
+
+	for start in range(0, num_scans, block_scans):
+		stop = min(start + block_scans, num_scans)
+		points = slice(scan_offsets[start], scan_offsets[stop])
+
+		intensity_matrix[start:stop] = numpy.bincount(
+				(scan_indices[points] - start) * num_bins + bin_indices[points],
+				weights=intensities[points],
+				minlength=(stop - start) * num_bins,
+				).reshape(stop - start, num_bins)
 
 	return IntensityMatrix(data.time_list, mass_list, intensity_matrix)
 
@@ -937,3 +1609,370 @@ def __fill_bins_old(data, min_mass, max_mass, bin_interval, bin_left, bin_right)
 		intensity_matrix.append(intensity_list)
 
 	return IntensityMatrix(data.get_time_list(), mass_list, intensity_matrix)
+
+
+def _map_ions(im, func, args=(), n_workers=1, executor=None, inplace=False, dtype=None):
+	"""
+	Apply a function to the intensities of every ion in an IntensityMatrix
+
+	``func`` is called with a 2-D array of the intensities of a block of
+	ions, one ion per column, followed by ``args``, and must return the new
+	intensities of those ions. It may modify the array it is given in place
+	and return it. It must be picklable to be used with worker processes.
+
+	With more than one worker the ions are split into ``n_workers`` blocks
+	of columns. On Python 3.8 and above a copy of the intensity array is
+	placed in :mod:`multiprocessing.shared_memory` and each worker updates
+	its block in place, so only the name of the shared memory is sent to
+	the workers. On older versions the blocks themselves are sent.
+
+	The new intensities have the same floating point type as the
+	intensity array, or are :class:`numpy.float64` if it holds integers,
+	unless ``dtype`` is given.
+
+	:param im: The input IntensityMatrix
+	:type im: pyms.IntensityMatrix.IntensityMatrix
+	:param func: The function to apply
+	:type func: ~typing.Callable
+	:param args: Additional arguments for ``func``
+	:type args: tuple, optional
+	:param n_workers: The number of worker processes to use. Default ``1``,
+		which processes all ions in the current process.
+	:type n_workers: int, optional
+	:param executor: An existing :class:`concurrent.futures.Executor` to
+		process the blocks of ions with.
+	:type executor: concurrent.futures.Executor, optional
+	:param inplace: Whether to modify ``im`` rather than returning a new IntensityMatrix.
+	:type inplace: bool, optional
+	:param dtype: The floating point type of the new intensities.
+	:type dtype: numpy.dtype, optional
+
+	:return: A new IntensityMatrix, or ``im`` if ``inplace`` is :py:obj:`True`
+	:rtype: pyms.IntensityMatrix.IntensityMatrix
+	"""
+
+	if not isinstance(n_workers, int) or isinstance(n_workers, bool):
+		raise TypeError("'n_workers' must be an int")
+
+	if n_workers < 1:
+		raise ValueError("'n_workers' must be at least 1")
+
+	if executor is not None and not isinstance(executor, concurrent.futures.Executor):
+		raise TypeError("'executor' must be a concurrent.futures.Executor")
+
+	if not isinstance(inplace, bool):
+		raise TypeError("'inplace' must be a Boolean")
+
+	if isinstance(im, SparseIntensityMatrix):
+		raise TypeError("'im' must have a dense intensity array. Use 'SparseIntensityMatrix.todense()'")
+
+	original_array = im._intensity_array
+
+	if dtype is None:
+		dtype = _result_dtype(original_array)
+	else:
+		dtype = _float_dtype(dtype)
+
+	if inplace:
+		im_new = im
+	else:
+		# Share the intensity array rather than copying it; it is replaced below
+		im_new = copy.deepcopy(im, {id(original_array): original_array})
+
+	if inplace and original_array.dtype == dtype:
+		intensity_array = original_array
+	else:
+		intensity_array = original_array.astype(dtype)
+
+	# The new intensities are held in memory, so the nulled masses are zeroed in them
+	if im._null_indices:
+		intensity_array[:, sorted(im._null_indices)] = 0
+	im_new._null_indices = frozenset()
+
+	if n_workers == 1 and executor is None:
+		result = func(intensity_array, *args)
+
+		if result is not intensity_array:
+			if inplace and intensity_array is original_array:
+				intensity_array[:] = result
+			else:
+				intensity_array = numpy.asarray(result, dtype=dtype)
+
+	else:
+		n_ions = intensity_array.shape[1]
+		bounds = numpy.linspace(0, n_ions, min(n_workers, n_ions) + 1).astype(int)
+		blocks = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+		if executor is None:
+			with concurrent.futures.ProcessPoolExecutor(n_workers) as executor:
+				_map_ion_blocks(intensity_array, blocks, func, args, executor)
+		else:
+			_map_ion_blocks(intensity_array, blocks, func, args, executor)
+
+	im_new._intensity_array = intensity_array
+
+	return im_new
+
+
+def _map_ion_blocks(intensity_array, blocks, func, args, executor):
+	"""
+	Apply a function to blocks of columns of the intensity array in place, using the given executor.
+
+	:param intensity_array:
+	:type intensity_array: numpy.ndarray
+	:param blocks: The first and last (exclusive) column of each block
+	:type blocks: list[tuple[int, int]]
+	:param func:
+	:type func: ~typing.Callable
+	:param args:
+	:type args: tuple
+	:param executor:
+	:type executor: concurrent.futures.Executor
+	"""
+
+	if shared_memory is None:
+		futures = {
+				executor.submit(func, intensity_array[:, start:stop], *args): (start, stop)
+				for start, stop in blocks
+				}
+		for future in concurrent.futures.as_completed(futures):
+			start, stop = futures[future]
+			intensity_array[:, start:stop] = future.result()
+		return
+
+	shm = shared_memory.SharedMemory(create=True, size=max(intensity_array.nbytes, 1))
+
+	try:
+		shared_array = numpy.ndarray(intensity_array.shape, dtype=intensity_array.dtype, buffer=shm.buf)
+		shared_array[:] = intensity_array
+
+		futures = [
+				executor.submit(
+						_map_shared_ion_block,
+						shm.name,
+						intensity_array.shape,
+						intensity_array.dtype.str,
+						start,
+						stop,
+						func,
+						args,
+						) for start, stop in blocks
+				]
+
+		for future in futures:
+			future.result()
+
+		intensity_array[:] = shared_array
+		del shared_array
+
+	finally:
+		shm.close()
+		shm.unlink()
+
+
+def _map_shared_ion_block(name, shape, dtype, start, stop, func, args):
+	"""
+	Apply a function to a block of columns of an intensity array in shared memory.
+
+	:param name: The name of the shared memory
+	:type name: str
+	:param shape: The shape of the intensity array
+	:type shape: tuple[int, int]
+	:param dtype: The data type of the intensity array
+	:type dtype: str
+	:param start: The first column of the block
+	:type start: int
+	:param stop: The last column of the block (exclusive)
+	:type stop: int
+	:param func:
+	:type func: ~typing.Callable
+	:param args:
+	:type args: tuple
+	"""
+
+	shm = shared_memory.SharedMemory(name=name)
+
+	try:
+		intensity_array = numpy.ndarray(shape, dtype=dtype, buffer=shm.buf)
+		intensity_array[:, start:stop] = func(intensity_array[:, start:stop], *args)
+		del intensity_array
+	finally:
+		shm.close()
+
+
+def _float_dtype(dtype):
+	"""
+	Returns ``dtype`` as a :class:`numpy.dtype`, checking that it is a floating point type.
+
+	:type dtype: numpy.dtype or type or str
+
+	:rtype: numpy.dtype
+	"""
+
+	dtype = numpy.dtype(dtype)
+
+	if not numpy.issubdtype(dtype, numpy.floating):
+		raise ValueError(f"'dtype' must be a floating point type, not {dtype}")
+
+	return dtype
+
+
+def _result_dtype(array):
+	"""
+	Returns the type of the result of filtering an array of intensities.
+	This is the type of the array if it holds floats, so single precision
+	intensities stay in single precision, and :class:`numpy.float64` otherwise
+	so that the result is not truncated to integers.
+
+	:type array: numpy.ndarray
+
+	:rtype: numpy.dtype
+	"""
+
+	if numpy.issubdtype(array.dtype, numpy.floating):
+		return array.dtype
+
+	return numpy.dtype(numpy.float64)
+
+
+def _check_h5py():
+	"""
+	Raises an error if h5py is not installed.
+	"""
+
+	if h5py is None:
+		raise ImportError("h5py is required to read and write HDF5 files. Install it with 'pip install h5py'")
+
+
+def _axes_file_name(file_name):
+	"""
+	Returns the name of the file the retention times and masses of an intensity matrix
+	exported with :meth:`IntensityMatrix.export_npy` are saved in.
+
+	:type file_name: pathlib.Path
+
+	:rtype: pathlib.Path
+	"""
+
+	return file_name.with_suffix(".axes.npz")
+
+
+# The number of intensities copied or binned at a time when exporting or building an intensity matrix
+_COPY_BLOCK_SIZE = 2 ** 22
+
+
+def _iter_scan_blocks(source):
+	"""
+	Iterate over an intensity array a block of scans at a time,
+	so that the whole array does not have to be held in memory.
+
+	:type source: numpy.ndarray or scipy.sparse.csr_matrix or pyms.IntensityMatrix._NulledIntensityArray
+
+	:return: An iterator over the index of the first scan of each block, and the block as a dense array
+	:rtype: ~collections.abc.Iterator[tuple[int, numpy.ndarray]]
+	"""
+
+	n_scans = source.shape[0]
+	block_scans = max(1, _COPY_BLOCK_SIZE // max(1, source.shape[1]))
+
+	for start in range(0, n_scans, block_scans):
+		block = source[start:start + block_scans]
+		if scipy.sparse.issparse(block):
+			block = block.toarray()
+		yield start, block
+
+
+def _copy_scan_blocks(source, destination):
+	"""
+	Copies an intensity array into another array or dataset of the same shape
+	a block of scans at a time, so that neither has to be held in memory.
+
+	:type source: numpy.ndarray or scipy.sparse.csr_matrix or pyms.IntensityMatrix._NulledIntensityArray
+	:type destination: numpy.ndarray or h5py.Dataset
+	"""
+
+	for start, block in _iter_scan_blocks(source):
+		destination[start:start + len(block)] = block
+
+
+def _index_slice(indices):
+	"""
+	Returns a slice selecting the given indices if they are consecutive,
+	so that indexing an array returns a view rather than a copy.
+	Otherwise the indices are returned unchanged.
+
+	:type indices: list[int]
+
+	:rtype: slice or list[int]
+	"""
+
+	if indices and indices[-1] - indices[0] == len(indices) - 1:
+		return slice(indices[0], indices[-1] + 1)
+
+	return indices
+
+
+class _NulledIntensityArray:
+	"""
+	Reads an intensity array with some of its columns as zero, without changing the array.
+
+	Each item read is a copy, so only the scans which are read are loaded
+	from an intensity array backed by a file.
+
+	:param intensity_array:
+	:type intensity_array: numpy.ndarray
+	:param null_indices: The indices of the columns which read as zero
+	:type null_indices: ~collections.abc.Iterable[int]
+	"""
+
+	def __init__(self, intensity_array, null_indices):
+		"""
+		Initialize the _NulledIntensityArray
+		"""
+
+		self._intensity_array = intensity_array
+		self._null_indices = numpy.array(sorted(null_indices), dtype=int)
+
+		self.shape = intensity_array.shape
+		self.dtype = intensity_array.dtype
+		self.ndim = intensity_array.ndim
+
+	def __len__(self):
+		"""
+		Returns the number of scans
+		"""
+
+		return self.shape[0]
+
+	def __getitem__(self, key):
+		"""
+		Returns a copy of the intensities at the given scan, or scan and column, indices.
+
+		:rtype: numpy.ndarray
+		"""
+
+		values = numpy.array(self._intensity_array[key])
+
+		if isinstance(key, tuple):
+			rows, columns = key
+		else:
+			rows, columns = key, slice(None)
+
+		nulled = numpy.isin(numpy.arange(self.shape[1])[columns], self._null_indices)
+
+		if isinstance(rows, slice) or isinstance(columns, slice) or numpy.ndim(rows) == 0:
+			values[..., nulled] = 0
+		else:
+			# The scan and column indices are pairs
+			values[nulled] = 0
+
+		return values
+
+	def __array__(self, dtype=None):
+		"""
+		Returns a copy of the whole intensity array.
+
+		:rtype: numpy.ndarray
+		"""
+
+		return numpy.asarray(self[:], dtype=dtype)
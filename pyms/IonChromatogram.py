@@ -147,6 +147,48 @@ class IonChromatogram(pymsBaseClass, TimeListMixin, IntensityArrayMixin, GetInde
 	def __deepcopy__(self, memodict={}):
 		return self.__copy__()
 
+	@property
+	def _time_attributes(self):
+		"""
+		The attributes of this object other than the intensities and the mass,
+		such as the time list and the time step.
+
+		:rtype: dict
+		"""
+
+		return {
+				name: value
+				for name, value in self.__dict__.items()
+				if name not in {"_intensity_array", "_mass"}
+				}
+
+	@classmethod
+	def _from_time_attributes(cls, ia, time_attributes, mass=None):
+		"""
+		Returns a new IonChromatogram with the given intensities, which shares
+		the time list and other attributes given by
+		:attr:`~pyms.IonChromatogram.IonChromatogram._time_attributes`
+		of another IonChromatogram.
+
+		The intensities are not copied or checked.
+
+		:param ia: Ion chromatogram intensity values
+		:type ia: numpy.ndarray
+		:param time_attributes:
+		:type time_attributes: dict
+		:param mass: Mass of ion chromatogram (Null if TIC)
+		:type mass: int or float
+
+		:rtype: pyms.IonChromatogram.IonChromatogram
+		"""
+
+		ic = cls.__new__(cls)
+		ic.__dict__.update(time_attributes)
+		ic._intensity_array = ia
+		ic._mass = mass
+
+		return ic
+
 	def get_intensity_at_index(self, ix):
 		"""
 		Returns intensity at given index
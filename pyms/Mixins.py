@@ -24,7 +24,6 @@ Mixins for pyms Classes
 ################################################################################
 
 # stdlib
-import math
 from numbers import Number
 from warnings import warn
 
@@ -34,6 +33,8 @@ import numpy
 
 # this package
 from pyms import __version__
+from pyms.Utils.Axis import SortedAxis
+from pyms.Utils.Utils import is_sequence
 
 
 class MaxMinMassMixin:
@@ -195,7 +196,7 @@ class IntensityArrayMixin:
 
 		warn(f"Use 'intensity_array' attribute instead", DeprecationWarning)
 
-		return numpy.copy(self._intensity_array)
+		return self.intensity_array
 
 	@deprecation.deprecated(deprecated_in="2.1.2", removed_in="2.2.0",
 							current_version=__version__,
@@ -277,19 +278,39 @@ class GetIndexTimeMixin:
 		if (time < self._min_rt) or (time > self._max_rt):
 			raise IndexError(f"time {time:.2f} is out of bounds (min: {self._min_rt:.2f}, max: {self._max_rt:.2f})")
 
-		time_list = self._time_list
-		time_diff_min = self._max_rt
-		ix_match = None
+		return self._time_axis.nearest_index(time)
+
+	def get_indices_at_times(self, times):
+		"""
+		Returns the nearest index corresponding to each of the given times
+
+		:param times: Times in seconds
+		:type times: ~collections.abc.Sequence[float] or numpy.ndarray
+
+		:return: Nearest index corresponding to each time
+		:rtype: numpy.ndarray
+		"""
+
+		if not is_sequence(times):
+			raise TypeError("'times' must be a Sequence")
+
+		times = numpy.asarray(times, dtype=numpy.float64)
+
+		if times.size and ((times.min() < self._min_rt) or (times.max() > self._max_rt)):
+			raise IndexError(f"times are out of bounds (min: {self._min_rt:.2f}, max: {self._max_rt:.2f})")
 
-		for ix in range(len(time_list)):
+		return self._time_axis.nearest_indices(times)
 
-			time_diff = math.fabs(time - time_list[ix])
+	@property
+	def _time_axis(self):
+		"""
+		A :class:`~pyms.Utils.Axis.SortedAxis` of the time list,
+		which is created again if the time list is replaced.
 
-			if time_diff < time_diff_min:
-				ix_match = ix
-				time_diff_min = time_diff
+		:rtype: pyms.Utils.Axis.SortedAxis
+		"""
 
-		return ix_match
+		return _get_axis(self, "_time_list")
 
 	def get_time_at_index(self, ix):
 		"""
@@ -312,3 +333,27 @@ class GetIndexTimeMixin:
 			raise IndexError("index out of bounds")
 
 		return self._time_list[ix]
+
+
+def _get_axis(obj, attr_name):
+	"""
+	Returns a :class:`~pyms.Utils.Axis.SortedAxis` of the list stored in the given attribute of an object.
+
+	The axis is stored on the object, and is only created again if the attribute is set to a different list.
+
+	:param obj:
+	:param attr_name:
+	:type attr_name: str
+
+	:rtype: pyms.Utils.Axis.SortedAxis
+	"""
+
+	values = getattr(obj, attr_name)
+	cache_name = f"{attr_name}_axis"
+	cached = obj.__dict__.get(cache_name)
+
+	if cached is None or cached[0] is not values:
+		cached = (values, SortedAxis(values))
+		obj.__dict__[cache_name] = cached
+
+	return cached[1]
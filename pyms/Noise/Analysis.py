@@ -27,15 +27,22 @@ Noise analysis functions
 import math
 import random
 
+# 3rd party
+import numpy
+from numpy.lib.stride_tricks import as_strided
+
 # this package
+from pyms.IntensityMatrix import IntensityMatrix, SparseIntensityMatrix
 from pyms.IonChromatogram import IonChromatogram
-from pyms.Utils.Math import MAD
 from pyms.Utils.Time import window_sele_points
 
 
 _DEFAULT_WINDOW = 256
 _DEFAULT_N_WINDOWS = 1024
 
+# the maximum number of intensities copied out of the windows at once
+_MAX_BLOCK_SIZE = 2 ** 22
+
 
 def window_analyzer(ic, window=_DEFAULT_WINDOW, n_windows=_DEFAULT_N_WINDOWS, rand_seed=None):
 	"""
@@ -52,8 +59,9 @@ def window_analyzer(ic, window=_DEFAULT_WINDOW, n_windows=_DEFAULT_N_WINDOWS, ra
 	:type window: int or str, optional
 	:param n_windows: The number of windows to calculate
 	:type n_windows: int, optional
-	:param rand_seed: Seed for random number generator
-	:type rand_seed: str or int or float, optional
+	:param rand_seed: Seed for random number generator, or a
+		:class:`numpy.random.Generator` to pick the windows with.
+	:type rand_seed: str or int or float or numpy.random.Generator, optional
 
 	:return: The noise estimate
 	:rtype: float
@@ -72,32 +80,133 @@ def window_analyzer(ic, window=_DEFAULT_WINDOW, n_windows=_DEFAULT_N_WINDOWS, ra
 
 	ia = ic.intensity_array  # fetch the intensitiess
 
-	# create an instance of the Random class
-	if rand_seed:
-		generator = random.Random(rand_seed)
-	else:
-		generator = random.Random()
-
 	window_pts = window_sele_points(ic, window)
+	positions = _window_positions(ia.size - window_pts, n_windows, rand_seed)
 
-	maxi = ia.size - window_pts
 	noise_level = math.fabs(ia.max() - ia.min())
-	# best_window_pos = None
-	seen_positions = []
 
-	cntr = 0
+	if positions.size:
+		noise_level = min(noise_level, _windows_mad(ia, positions, window_pts).min())
+
+	return float(noise_level)
+
+
+def noise_im(im, window=_DEFAULT_WINDOW, n_windows=_DEFAULT_N_WINDOWS, rand_seed=None):
+	"""
+	Estimates the noise level of each ion in an IntensityMatrix
+
+	Applies the same estimate as :func:`~pyms.Noise.Analysis.window_analyzer`
+	to the intensities of each ion, using the same randomly placed windows for every ion.
+
+	:param im: The input IntensityMatrix, with a dense intensity array
+	:type im: pyms.IntensityMatrix.IntensityMatrix
+	:param window: Window width selection
+	:type window: int or str, optional
+	:param n_windows: The number of windows to calculate
+	:type n_windows: int, optional
+	:param rand_seed: Seed for random number generator, or a
+		:class:`numpy.random.Generator` to pick the windows with.
+	:type rand_seed: str or int or float or numpy.random.Generator, optional
+
+	:return: The noise estimate for each ion, in the order of :attr:`~pyms.IntensityMatrix.IntensityMatrix.mass_list`
+	:rtype: numpy.ndarray
+	"""
+
+	if not isinstance(im, IntensityMatrix):
+		raise TypeError("'im' must be an IntensityMatrix object")
+
+	if isinstance(im, SparseIntensityMatrix):
+		raise TypeError("'im' must have a dense intensity array. Use 'SparseIntensityMatrix.todense()'")
+
+	if not isinstance(window, (int, str)):
+		raise TypeError("'window' must be a int or string")
+
+	if not isinstance(n_windows, int):
+		raise TypeError("'n_windows' must be an integer")
+
+	ia = im._intensity_array
+
+	window_pts = window_sele_points(im.get_ic_at_index(0), window)
+	positions = _window_positions(ia.shape[0] - window_pts, n_windows, rand_seed)
+
+	noise_levels = numpy.abs(ia.max(axis=0) - ia.min(axis=0)).astype(numpy.float64)
+
+	if positions.size:
+		numpy.minimum(noise_levels, _windows_mad(ia, positions, window_pts).min(axis=0), out=noise_levels)
+
+	# the intensities of masses nulled in a memory-mapped matrix read as zero
+	noise_levels[sorted(im._null_indices)] = 0
+
+	return noise_levels
+
+
+def _window_positions(maxi, n_windows, rand_seed=None):
+	"""
+	Returns the sorted, unique start positions of ``n_windows`` randomly placed windows.
+
+	:param maxi: The last possible start position
+	:type maxi: int
+	:param n_windows: The number of windows to place
+	:type n_windows: int
+	:param rand_seed: Seed for random number generator, or a
+		:class:`numpy.random.Generator` to pick the positions with.
+	:type rand_seed: str or int or float or numpy.random.Generator, optional
+
+	:rtype: numpy.ndarray
+	"""
+
+	if hasattr(numpy.random, "Generator") and isinstance(rand_seed, numpy.random.Generator):
+		if maxi < 0:
+			raise ValueError("window is larger than the data")
+
+		positions = rand_seed.integers(0, maxi + 1, size=max(n_windows, 0))
+
+	else:
+		# create an instance of the Random class
+		if rand_seed:
+			generator = random.Random(rand_seed)
+		else:
+			generator = random.Random()
 
-	while cntr < n_windows:
 		# generator.randrange(): last point not included in range
-		try_pos = generator.randrange(0, maxi + 1)
-		# only process the window if not analyzed previously
-		if try_pos not in seen_positions:
-			end_slice = try_pos + window_pts
-			crnt_mad = MAD(ia[try_pos:end_slice])
-			if crnt_mad < noise_level:
-				noise_level = crnt_mad
-				# best_window_pos = try_pos
-		cntr = cntr + 1
-		seen_positions.append(try_pos)
-
-	return noise_level
+		positions = [generator.randrange(0, maxi + 1) for _ in range(n_windows)]
+
+	return numpy.unique(numpy.asarray(positions, dtype=numpy.intp))
+
+
+def _windows_mad(ia, positions, window_pts):
+	"""
+	Calculates the median absolute deviation of the windows starting at each position.
+
+	The windows are taken from a strided view of the intensities,
+	``_MAX_BLOCK_SIZE`` intensities at a time.
+
+	:param ia: The intensities. If 2-D, the windows are along the first axis
+		and the median absolute deviation is calculated for each column.
+	:type ia: numpy.ndarray
+	:param positions: The start position of each window
+	:type positions: numpy.ndarray
+	:param window_pts: The number of points in each window
+	:type window_pts: int
+
+	:return: The median absolute deviation of each window, one window per row
+	:rtype: numpy.ndarray
+	"""
+
+	n_windows = ia.shape[0] - window_pts + 1
+	windows = as_strided(
+			ia,
+			shape=(n_windows, window_pts) + ia.shape[1:],
+			strides=(ia.strides[0], ) + ia.strides,
+			writeable=False,
+			)
+
+	block_size = max(_MAX_BLOCK_SIZE // max(windows[0].size, 1), 1)
+	mad = numpy.empty((positions.size, ) + ia.shape[1:])
+
+	for start in range(0, positions.size, block_size):
+		block = windows[positions[start:start + block_size]]
+		deviation = numpy.abs(block - numpy.median(block, axis=1, keepdims=True))
+		mad[start:start + block_size] = numpy.median(deviation, axis=1) / 0.6745
+
+	return mad
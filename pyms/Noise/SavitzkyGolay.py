@@ -25,13 +25,15 @@ Savitzky-Golay noise filter
 
 # stdlib
 import copy
+import functools
 
 # 3rd party
 import numpy
+from scipy import ndimage
 
 # this package
 from pyms.GCMS.Function import ic_window_points
-from pyms.IntensityMatrix import IntensityMatrix
+from pyms.IntensityMatrix import IntensityMatrix, _map_ions, _result_dtype
 from pyms.IonChromatogram import IonChromatogram
 
 __DEFAULT_WINDOW = 7
@@ -86,11 +88,19 @@ def savitzky_golay(ic, window=__DEFAULT_WINDOW, degree=__DEFAULT_POLYNOMIAL_DEGR
 	return ic_denoise
 
 
-def savitzky_golay_im(im, window=__DEFAULT_WINDOW, degree=__DEFAULT_POLYNOMIAL_DEGREE):
+def savitzky_golay_im(
+		im,
+		window=__DEFAULT_WINDOW,
+		degree=__DEFAULT_POLYNOMIAL_DEGREE,
+		n_workers=1,
+		executor=None,
+		dtype=None,
+		):
 	"""
 	Applies Savitzky-Golay filter on Intensity Matrix
 
-	Simply wraps around the Savitzky Golay function above
+	Applies the same filter as :func:`~pyms.Noise.SavitzkyGolay.savitzky_golay`
+	to the intensities of each ion.
 
 	:param im: The input IntensityMatrix
 	:type im: pyms.IntensityMatrix.IntensityMatrix
@@ -99,6 +109,18 @@ def savitzky_golay_im(im, window=__DEFAULT_WINDOW, degree=__DEFAULT_POLYNOMIAL_D
 	:param degree: degree of the fitting polynomial for the Savitzky-Golay
 		filter
 	:type degree: int, optional
+	:param n_workers: The number of worker processes to divide the ions
+		between. Default ``1``, which filters all ions in the current process.
+	:type n_workers: int, optional
+	:param executor: An existing :class:`concurrent.futures.Executor` to
+		filter the ions with, in ``n_workers`` blocks.
+	:type executor: concurrent.futures.Executor, optional
+	:param dtype: The floating point type of the smoothed intensities.
+		Default the type of the intensity array, or :class:`numpy.float64`
+		if it holds integers. The filter is applied in double precision,
+		so with :class:`numpy.float32` the results differ from those for
+		:class:`numpy.float64` by less than ``1e-6`` times the largest intensity of the ion.
+	:type dtype: numpy.dtype, optional
 
 	:return: Smoothed IntensityMatrix
 	:rtype: pyms.IntensityMatrix.IntensityMatrix
@@ -117,22 +139,46 @@ def savitzky_golay_im(im, window=__DEFAULT_WINDOW, degree=__DEFAULT_POLYNOMIAL_D
 	if not isinstance(degree, int):
 		raise TypeError("'degree' must be an integer")
 
-	n_scan, n_mz = im.size
+	wing_length = ic_window_points(im.get_ic_at_index(0), window, half_window=True)
+	coeff = __calc_coeff(wing_length, degree)
+
+	return _map_ions(im, _smooth_ions, (coeff, ), n_workers, executor, dtype=dtype)
+
+
+def _smooth_ions(intensity_array, coeff):
+	"""
+	Applies coefficients calculated by __calc_coeff() to the intensities of each ion
 
-	im_smooth = copy.deepcopy(im)
+	All ions are filtered in a single call along the time axis. As for
+	__smooth(), points beyond the ends of the array are taken to be zero.
 
-	for ii in range(n_mz):
-		ic = im_smooth.get_ic_at_index(ii)
-		ic_smooth = savitzky_golay(ic, window, degree)
-		im_smooth.set_ic_at_index(ii, ic_smooth)
+	:param intensity_array: The intensities of the ions, one ion per column
+	:type intensity_array: numpy.ndarray
+	:param coeff: Filter coefficients
+	:type coeff: numpy.ndarray
 
-	return im_smooth
+	:return: Smoothed intensities, of the same floating point type as ``intensity_array``
+	:rtype: numpy.ndarray
+	"""
+
+	return ndimage.convolve1d(
+			intensity_array,
+			coeff,
+			axis=0,
+			output=_result_dtype(intensity_array),
+			mode="constant",
+			cval=0.0,
+			)
 
 
+@functools.lru_cache()
 def __calc_coeff(num_points, pol_degree, diff_order=0):
 	"""
 	Calculates filter coefficients for symmetric savitzky-golay filter.
 
+	The coefficients are cached for each combination of arguments,
+	and the returned array is read-only.
+
 	See Section 14.8: Savitzky-Golay Smoothing Filters in
 		Numerical Recipes in C, Second Edition (1992)
 		by Press, W.H., Teukolsky, S.A., Vetterling, W.T., Flannery, B.P.
@@ -176,6 +222,8 @@ def __calc_coeff(num_points, pol_degree, diff_order=0):
 			x += wvec[m] * pow(n, m)
 		coeff[n + num_points] = x
 
+	coeff.flags.writeable = False
+
 	return coeff
 
 
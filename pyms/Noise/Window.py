@@ -25,19 +25,22 @@ Moving window noise filter
 
 # stdlib
 import copy
-from statistics import median
 
 # 3rd party
 import numpy
+from scipy import ndimage
 
 # this package
 from pyms.GCMS.Function import ic_window_points
-from pyms.IntensityMatrix import IntensityMatrix
+from pyms.IntensityMatrix import IntensityMatrix, _map_ions, _result_dtype
 from pyms.IonChromatogram import IonChromatogram
 
 
 __DEFAULT_WINDOW = 3
 
+# The number of intensities whose window means are calculated at a time
+__BLOCK_SIZE = 2 ** 22
+
 
 def window_smooth(ic, window=__DEFAULT_WINDOW, use_median=False):
     """
@@ -85,11 +88,19 @@ def window_smooth(ic, window=__DEFAULT_WINDOW, use_median=False):
     return ic_denoise
 
 
-def window_smooth_im(im, window=__DEFAULT_WINDOW, use_median=False):
+def window_smooth_im(
+        im,
+        window=__DEFAULT_WINDOW,
+        use_median=False,
+        n_workers=1,
+        executor=None,
+        dtype=None,
+        ):
     """
     Applies window smoothing on Intensity Matrix
 
-              Simply wraps around the window smooth function above
+    Applies the same smoothing as :func:`~pyms.Noise.Window.window_smooth`
+    to the intensities of each ion.
 
     :param im: The input Intensity Matrix
     :type im: pyms.IntensityMatrix.IntensityMatrix
@@ -98,6 +109,18 @@ def window_smooth_im(im, window=__DEFAULT_WINDOW, use_median=False):
     :param use_median: An indicator whether the mean or median window smoothing
         to be used
     :type use_median: bool, optional
+    :param n_workers: The number of worker processes to divide the ions
+        between. Default ``1``, which smooths all ions in the current process.
+    :type n_workers: int, optional
+    :param executor: An existing :class:`concurrent.futures.Executor` to
+        smooth the ions with, in ``n_workers`` blocks.
+    :type executor: concurrent.futures.Executor, optional
+    :param dtype: The floating point type of the smoothed intensities.
+        Default the type of the intensity array, or :class:`numpy.float64`
+        if it holds integers. Window sums are accumulated in double
+        precision, so with :class:`numpy.float32` the results differ from those
+        for :class:`numpy.float64` by less than ``1e-6`` times the largest intensity of the ion.
+    :type dtype: numpy.dtype, optional
 
     :return: Smoothed Intensity Matrix
     :rtype: pyms.IntensityMatrix.IntensityMatrix
@@ -109,77 +132,149 @@ def window_smooth_im(im, window=__DEFAULT_WINDOW, use_median=False):
     if not isinstance(im, IntensityMatrix):
         raise TypeError("'im' must be an IntensityMatrix object")
 
-    n_scan, n_mz = im.size
+    if not isinstance(window, (int, str)):
+        raise TypeError("'window' must be a int or string")
+
+    if not isinstance(use_median, bool):
+        raise TypeError("'median' must be a Boolean")
+
+    wing_length = ic_window_points(im.get_ic_at_index(0), window, half_window=True)
+
+    return _map_ions(im, _window_smooth_ions, (wing_length, use_median), n_workers, executor, dtype=dtype)
+
+
+def _window_smooth_ions(intensity_array, wing_length, use_median):
+    """
+    Applies window smoothing to the intensities of each ion.
 
-    im_smooth = copy.deepcopy(im)
+    :param intensity_array: The intensities of the ions, one ion per column
+    :type intensity_array: numpy.ndarray
+    :param wing_length: An integer value representing the number of
+        points on either side of a point in the ion chromatogram
+    :type wing_length: int
+    :param use_median: An indicator whether the mean or median window smoothing
+        to be used
+    :type use_median: bool
 
-    for ii in range(n_mz):
-        ic = im_smooth.get_ic_at_index(ii)
-        ic_smooth = window_smooth(ic, window, use_median)
-        im_smooth.set_ic_at_index(ii, ic_smooth)
+    :return: Smoothed intensities
+    :rtype: numpy.ndarray
+    """
 
-    return im_smooth
+    if use_median:
+        return __median_window(intensity_array, wing_length)
+    else:
+        return __mean_window(intensity_array, wing_length)
 
 
 def __mean_window(ia, wing_length):
     """
     Applies mean-window averaging on the array of intensities.
 
-    :param ia: Intensity array
+    The sum of each window is calculated from the cumulative sum of the
+    intensities, in double precision and a block of columns at a time.
+    At the ends of the array the window only includes the points that
+    are available.
+
+    :param ia: Intensity array. If 2-D, each column is smoothed separately
     :type ia: numpy.core.ndarray
     :param wing_length: An integer value representing the number of
         points on either side of a point in the ion chromatogram
     :type wing_length: int
 
-    :return: Smoothed intensity array
+    :return: Smoothed intensity array, of the same floating point type as ``ia``
     :rtype: numpy.core.ndarray
 
     :author: Vladimir Likic
     """
 
-    ia_denoise = numpy.repeat([0], ia.size)
+    left, right = __window_bounds(len(ia), wing_length)
+
+    n_points = (right - left).reshape((-1, ) + (1, ) * (ia.ndim - 1))
+
+    if ia.ndim == 1:
+        return __window_means(ia, left, right, n_points).astype(_result_dtype(ia), copy=False)
 
-    index = 0
-    end = ia.size - 1
+    ia_denoise = numpy.empty(ia.shape, dtype=_result_dtype(ia))
+    block_columns = max(1, __BLOCK_SIZE // max(1, len(ia)))
 
-    while index <= end:
-        left = index - wing_length
-        right = index + wing_length + 1
-        if left < 0:
-            left = 0
-        ia_denoise[index] = ia[left:right].mean()
-        index = index + 1
+    for start in range(0, ia.shape[1], block_columns):
+        columns = slice(start, start + block_columns)
+        ia_denoise[:, columns] = __window_means(ia[:, columns], left, right, n_points)
 
     return ia_denoise
 
 
+def __window_means(ia, left, right, n_points):
+    """
+    Returns the mean of each window of the intensity array, in double precision.
+
+    :param ia: Intensity array. If 2-D, each column is smoothed separately
+    :type ia: numpy.core.ndarray
+    :param left: The start of the window around each point
+    :type left: numpy.ndarray
+    :param right: The end (exclusive) of the window around each point
+    :type right: numpy.ndarray
+    :param n_points: The number of points in each window
+    :type n_points: numpy.ndarray
+
+    :rtype: numpy.core.ndarray
+    """
+
+    cumsum = numpy.zeros((len(ia) + 1, ) + ia.shape[1:])
+    numpy.cumsum(ia, axis=0, out=cumsum[1:])
+
+    return (cumsum[right] - cumsum[left]) / n_points
+
+
 def __median_window(ia, wing_length):
     """
     Applies median-window averaging on the array of intensities.
 
-    :param ia: Intensity array
+    Away from the ends of the array :func:`scipy.ndimage.median_filter` is
+    used. At the ends of the array the window only includes the points that
+    are available.
+
+    :param ia: Intensity array. If 2-D, each column is smoothed separately
     :type ia: numpy.core.ndarray
     :param wing_length: An integer value representing the number of
         points on either side of a point in the ion chromatogram
     :type wing_length: int
 
-    :return: Smoothed intensity array
+    :return: Smoothed intensity array, of the same floating point type as ``ia``
     :rtype: numpy.core.ndarray
 
     :author: Vladimir Likic
     """
 
-    ia_denoise = numpy.repeat([0], ia.size)
+    ia = ia.astype(_result_dtype(ia), copy=False)
 
-    index = 0
-    end = ia.size - 1
+    size = (2 * wing_length + 1, ) + (1, ) * (ia.ndim - 1)
+    ia_denoise = ndimage.median_filter(ia, size=size)
 
-    while index <= end:
-        left = index - wing_length
-        right = index + wing_length + 1
-        if left < 0:
-            left = 0
-        ia_denoise[index] = median(ia[left:right])
-        index = index + 1
+    # Windows which extend past the ends of the array
+    left, right = __window_bounds(len(ia), wing_length)
+    n_points = right - left
+    for index in numpy.flatnonzero(n_points < 2 * wing_length + 1):
+        ia_denoise[index] = numpy.median(ia[left[index]:right[index]], axis=0)
 
     return ia_denoise
+
+
+def __window_bounds(n_points, wing_length):
+    """
+    Returns the start and end (exclusive) of the window around each point.
+
+    :param n_points: The number of points in the array
+    :type n_points: int
+    :param wing_length: An integer value representing the number of
+        points on either side of a point in the ion chromatogram
+    :type wing_length: int
+
+    :rtype: tuple[numpy.ndarray, numpy.ndarray]
+    """
+
+    index = numpy.arange(n_points)
+    left = numpy.maximum(index - wing_length, 0)
+    right = numpy.minimum(index + wing_length + 1, n_points)
+
+    return left, right
@@ -31,6 +31,8 @@ from statistics import median
 
 # 3rd party
 import deprecation
+import numpy
+import scipy.sparse
 from numpy import percentile
 
 # this package
@@ -72,9 +74,6 @@ def peak_sum_area(im, peak, single_ion=False, max_bound=0):
 		raise TypeError("'max_bound' must be an integer")
 
 	sum_area = 0
-	# Use internal values (not copy)
-	# mat = im.matrix_list
-	mat = im.intensity_array
 	ms = peak.mass_spectrum
 	rt = peak.rt
 	apex = im.get_index_at_time(rt)
@@ -82,12 +81,11 @@ def peak_sum_area(im, peak, single_ion=False, max_bound=0):
 	# get peak masses with non-zero intensity
 	mass_ii = [ii for ii in range(len(ms.mass_list)) if ms.mass_spec[ii] > 0]
 
+	# Use internal values (not copy)
+	areas = ion_areas(im._intensities, apex, mass_ii, max_bound)[0]
+
 	area_dict = {}
-	# get stats on boundaries
-	for ii in mass_ii:
-		# get ion chromatogram as list
-		ia = [mat[scan][ii] for scan in range(len(mat))]
-		area, left, right, l_share, r_share = ion_area(ia, apex, max_bound)
+	for ii, area in zip(mass_ii, areas.tolist()):
 		# need actual mass for single ion areas
 		actual_mass = ms.mass_list[ii]
 		area_dict[actual_mass] = area
@@ -122,9 +120,6 @@ def peak_pt_bounds(im, peak):
 	if not isinstance(peak, Peak):
 		raise TypeError("'peak' must be a Peak object")
 
-	# Use internal values (not copy)
-	# mat = im.matrix_list
-	mat = im.intensity_array
 	ms = peak.mass_spectrum
 	rt = peak.rt
 	apex = im.get_index_at_time(rt)
@@ -132,19 +127,12 @@ def peak_pt_bounds(im, peak):
 	# get peak masses with non-zero intensity
 	mass_ii = [ii for ii in range(len(ms.mass_list)) if ms.mass_spec[ii] > 0]
 
-	left_list = []
-	right_list = []
-
 	# get stats on boundaries
-	for ii in mass_ii:
-		# get ion chromatogram as list
-		ia = [mat[scan][ii] for scan in range(len(mat))]
-		area, left, right, l_share, r_share = ion_area(ia, apex, 0)
-		left_list.append(left)
-		right_list.append(right)
+	# Use internal values (not copy)
+	area, left, right, l_share, r_share = ion_areas(im._intensities, apex, mass_ii, 0)
 
-	left_list.sort()
-	right_list.sort()
+	left_list = sorted(left.tolist())
+	right_list = sorted(right.tolist())
 
 	return int(ceil(percentile(left_list, 95))), int(ceil(percentile(right_list, 95)))
 
@@ -186,20 +174,37 @@ def peak_top_ion_areas(im, peak, n_top_ions=5, max_bound=0):
 	rt = peak.rt
 	apex = im.get_index_at_time(rt)
 
-	ion_areas = {}  # Dictionary to store ion:ion_area pairs
-
 	top_ions = peak.top_ions(n_top_ions)
 	# print(top_ions)
 
-	for ion in top_ions:
-		ion_chrom = im.get_ic_at_mass(ion)
-		# need ia as a list not numpy array so use .tolist()
-		ia = ion_chrom.intensity_array.tolist()
-		area, left, right, l_share, r_share = ion_area(ia, apex, max_bound)
-		# need actual mass for single ion areas
-		ion_areas[ion] = area
+	# Use internal values (not copy)
+	areas = ion_areas(im._intensities, apex, _mass_indices(im, top_ions), max_bound)[0]
+
+	# Dictionary to store ion:ion_area pairs
+	return dict(zip(top_ions, areas.tolist()))
+
 
-	return ion_areas
+def _mass_indices(im, masses):
+	"""
+	Returns the index of the nearest binned mass to each of the given masses,
+	as used by :meth:`IntensityMatrix.get_ic_at_mass() <pyms.IntensityMatrix.IntensityMatrix.get_ic_at_mass>`.
+
+	:param im: The IntensityMatrix object
+	:type im: pyms.IntensityMatrix.IntensityMatrix
+	:param masses: The masses to look up
+	:type masses: list
+
+	:rtype: list of int
+	"""
+
+	for mass in masses:
+		if not isinstance(mass, Number):
+			raise TypeError("'mass' must be a number")
+
+		if mass < im.min_mass or mass > im.max_mass:
+			raise IndexError("mass is out of range")
+
+	return im.get_indices_of_masses(masses).tolist()
 
 
 @deprecation.deprecated(deprecated_in="2.0.0", removed_in="2.2.0",
@@ -386,6 +391,179 @@ def half_area(ia, max_bound=0, tol=0.5):
 	return area, index, shared
 
 
+def ion_areas(intensity_array, apex, ion_indices=None, max_bound=0, tol=0.5):
+	"""
+	Find the bounds and areas of a peak for several ions at once.
+
+	Gives the same results as calling :func:`~pyms.Peak.Function.ion_area`
+	for the intensities of each ion, but the bounds of all ions are found
+	together using cumulative sums over the scans around the apex.
+
+	Only the scans around the apex are read, so ``intensity_array`` may also be the
+	:class:`scipy.sparse.csr_matrix` of a :class:`~pyms.IntensityMatrix.SparseIntensityMatrix`.
+
+	:param intensity_array: Intensity array, one row per scan and one column per ion
+	:type intensity_array: numpy.ndarray or scipy.sparse.csr_matrix
+	:param apex: Index of the peak apex.
+	:type apex: int
+	:param ion_indices: The indices of the columns of ``intensity_array`` to find the bounds of.
+		Default all columns.
+	:type ion_indices: list of int, optional
+	:param max_bound: Optional value to limit size of detected bound, default 0
+	:type max_bound: int, optional
+	:param tol: Percentage tolerance of added area to current area, default 0.5
+	:type tol: float, optional
+
+	:return: Arrays of the area, left and right boundary offset, shared left and shared right of each ion
+	:rtype: tuple of numpy.ndarray
+	"""
+
+	if scipy.sparse.issparse(intensity_array):
+		intensity_array = intensity_array.tocsr()
+	elif getattr(intensity_array, "ndim", None) != 2:
+		# Other 2-D arrays, such as the intensities of an IntensityMatrix with
+		# nulled masses, are read in blocks of scans in the same way
+		raise TypeError("'intensity_array' must be a 2-D numpy array or a sparse matrix")
+	if not isinstance(apex, int):
+		raise TypeError("'apex' must be an integer")
+	if not isinstance(max_bound, int):
+		raise TypeError("'max_bound' must be an integer")
+	if not isinstance(tol, float):
+		raise TypeError("'tol' must be a float")
+
+	if ion_indices is None:
+		ion_indices = numpy.arange(intensity_array.shape[1])
+	else:
+		ion_indices = numpy.asarray(ion_indices, dtype=int)
+
+	# Left area
+	# reverse, as search to right is bounds safe
+	l_area, left, l_share = _half_areas(intensity_array, apex, -1, ion_indices, max_bound, tol)
+
+	# Right area
+	r_area, right, r_share = _half_areas(intensity_array, apex, 1, ion_indices, max_bound, tol)
+	r_area -= _read_scans(intensity_array, apex, 1, 1, ion_indices)[0]  # counted apex twice for tollerence, now ignore
+
+	# Put it all together
+	return l_area + r_area, left, right, l_share, r_share
+
+
+def _half_areas(intensity_array, apex, direction, ion_indices, max_bound=0, tol=0.5):
+	"""
+	Find the bound of a peak for several ions at once, with the same rules as
+	:func:`~pyms.Peak.Function.half_area`.
+
+	The scans are examined in blocks of increasing size, so only the scans
+	near the apex are read for narrow peaks.
+
+	:param intensity_array: Intensity array, one row per scan
+	:type intensity_array: numpy.ndarray or scipy.sparse.csr_matrix
+	:param apex: Index of the peak apex
+	:type apex: int
+	:param direction: ``1`` to search after the apex, or ``-1`` to search before it
+	:type direction: int
+	:param ion_indices: The indices of the columns to find the bounds of
+	:type ion_indices: numpy.ndarray
+	:param max_bound: Optional value to limit size of detected bound, default 0
+	:type max_bound: int, optional
+	:param tol: Percentage tolerance of added area to current area, default 0.5
+	:type tol: float, optional
+
+	:return: Arrays of the half peak area, boundary offset and shared flag of each ion
+	:rtype: tuple of numpy.ndarray
+	"""
+
+	tol = tol / 200.0  # halve and convert from percent
+
+	# Default number of points to sum new area across, for smoothing
+	wide = 3
+
+	if direction > 0:
+		n_scans = intensity_array.shape[0] - apex
+	else:
+		n_scans = apex + 1
+	n_ions = len(ion_indices)
+
+	if max_bound < 1:
+		limit = n_scans
+	else:
+		limit = min(max_bound + 1, n_scans)
+
+	length = min(32, limit)
+
+	while True:
+		# the intensities of the first 'length' scans and the 'wide' - 1 after,
+		# with zeros past the end of the array
+		ia = numpy.zeros((length + wide - 1, n_ions))
+		block = _read_scans(intensity_array, apex, direction, length + wide - 1, ion_indices)
+		ia[:len(block)] = block
+
+		# area and edge after adding each scan
+		area = numpy.cumsum(ia[:length], axis=0)
+		edge = ia[:length].copy()
+		for offset in range(1, wide):
+			edge += ia[offset:offset + length]
+		edge /= wide
+
+		# edge before adding each scan
+		old_edge = numpy.empty_like(edge)
+		old_edge[0] = 2 * edge[0]  # bigger than expected edge
+		old_edge[1:] = edge[:-1]
+
+		# keep moving away from the apex until:
+		# i) tollerence reached
+		# ii) edge area starts increasing
+		# iii) bound reached
+		stop = ~((area * tol < edge) & (edge < old_edge))
+		if length == limit:
+			stop[-1] = True
+
+		if stop.any(axis=0).all():
+			break
+
+		length = min(length * 2, limit)
+
+	index = stop.argmax(axis=0)
+	columns = numpy.arange(n_ions)
+	shared = edge[index, columns] >= old_edge[index, columns]
+
+	return area[index, columns], index, shared
+
+
+def _read_scans(intensity_array, apex, direction, n_scans, ion_indices):
+	"""
+	Returns the intensities of the given ions in up to ``n_scans`` scans
+	starting at the apex, in order away from the apex.
+
+	:param intensity_array: Intensity array, one row per scan
+	:type intensity_array: numpy.ndarray or scipy.sparse.csr_matrix
+	:param apex: Index of the peak apex
+	:type apex: int
+	:param direction: ``1`` to read the scans after the apex, or ``-1`` to read the scans before it
+	:type direction: int
+	:param n_scans: The number of scans to read
+	:type n_scans: int
+	:param ion_indices: The indices of the columns to read
+	:type ion_indices: numpy.ndarray
+
+	:rtype: numpy.ndarray
+	"""
+
+	if direction > 0:
+		block = intensity_array[apex:apex + n_scans]
+	else:
+		block = intensity_array[max(apex - n_scans + 1, 0):apex + 1]
+
+	block = block[:, ion_indices]
+	if scipy.sparse.issparse(block):
+		block = block.toarray()
+
+	if direction > 0:
+		return block
+	else:
+		return block[::-1]
+
+
 def median_bounds(im, peak, shared=True):
 	"""
 	Calculates the median of the left and right bounds found for each apexing peak mass
@@ -410,7 +588,6 @@ def median_bounds(im, peak, shared=True):
 	if not isinstance(shared, bool):
 		raise TypeError("'shared' must be a boolean")
 
-	mat = im.intensity_array
 	ms = peak.mass_spectrum
 	rt = peak.rt
 	apex = im.get_index_at_time(rt)
@@ -423,16 +600,15 @@ def median_bounds(im, peak, shared=True):
 	mass_ii = [ii for ii in range(len(ms.mass_list)) if ms.mass_spec[ii] > 0]
 
 	# get stats on boundaries
-	left_list = []
-	right_list = []
-	for ii in mass_ii:
-		# get ion chromatogram as list
-		ia = [mat[scan][ii] for scan in range(len(mat))]
-		area, left, right, l_share, r_share = ion_area(ia, apex)
-		if shared or not l_share:
-			left_list.append(left)
-		if shared or not r_share:
-			right_list.append(right)
+	# Use internal values (not copy)
+	area, left, right, l_share, r_share = ion_areas(im._intensities, apex, mass_ii)
+
+	if shared:
+		left_list = left.tolist()
+		right_list = right.tolist()
+	else:
+		left_list = left[~l_share].tolist()
+		right_list = right[~r_share].tolist()
 
 	# return medians
 	# NB if shared=True, lists maybe empty
@@ -24,13 +24,23 @@ Functions related to Peak modification
 ################################################################################
 
 # stdlib
+import concurrent.futures
 import math
+from statistics import median
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python 3.6 and 3.7
+    shared_memory = None
 
 # 3rd party
 import numpy
+import scipy.sparse
 
 # this package
+from pyms.IntensityMatrix import _copy_scan_blocks, IntensityMatrix
 from pyms.Peak import Peak
+from pyms.Peak.Function import _mass_indices, ion_areas
 from pyms.Spectrum import MassSpectrum
 from pyms.Utils.Math import median_outliers
 from pyms.Utils.Time import time_str_secs
@@ -140,7 +150,9 @@ def fill_peaks(data, peak_list, D, minutes=False):
     # reweight so RT weight at nearest peak is _PEN
     _PEN = 0.5
 
-    datamat = data.intensity_array
+    # The scans in each search window are read and converted to double precision
+    # below, so the whole intensity array is neither copied nor converted.
+    datamat = data._intensities
     mass_list = data.mass_list
     datatimes = data.time_list
     minrt = min(datatimes)
@@ -181,6 +193,8 @@ def fill_peaks(data, peak_list, D, minutes=False):
 
         # Get sub matrix of scans in bounds
         submat = datamat[lowii:upii + 1]
+        if scipy.sparse.issparse(submat):
+            submat = submat.toarray()
         submat = numpy.array(submat, dtype='d')
         subrts = datatimes[lowii:upii + 1]
         subrts = numpy.array(subrts, dtype='d')
@@ -276,3 +290,282 @@ def sele_peaks_by_rt(peaks, rt_range):
     # print("%d peaks selected" % (len(peaks_sele)))
 
     return peaks_sele
+
+
+def peak_list_areas(im, peak_list, n_top_ions=5, max_bound=0, n_workers=1, executor=None):
+    """
+    Calculate the area, top ion areas and median bounds of every peak in a peak list.
+
+    For each peak this gives the same results as
+    :func:`~pyms.Peak.Function.peak_sum_area`,
+    :func:`~pyms.Peak.Function.peak_top_ion_areas` and
+    :func:`~pyms.Peak.Function.median_bounds`, but the apex of every peak is
+    found in one step, and ion areas are only calculated once when they
+    are needed for more than one of the results.
+
+    Work is only shared between the results for the same peak, not between
+    neighbouring peaks. The bound of each ion is found by searching outwards
+    from the apex of the peak until the intensity stops falling, so a search
+    from one apex gives neither the bounds nor the areas for another, even
+    where the windows of the two peaks overlap.
+
+    The areas can be stored on the peaks with:
+
+    .. code-block:: python
+
+        for peak, (area, areas_dict, bounds) in zip(peak_list, peak_list_areas(im, peak_list)):
+            peak.area = area
+            peak.ion_areas = areas_dict
+
+    :param im: The originating IntensityMatrix object
+    :type im: pyms.IntensityMatrix.IntensityMatrix
+    :param peak_list: A list of peak objects
+    :type peak_list: list of :class:`pyms.Peak.Class.Peak`
+    :param n_top_ions: Number of top ions to return areas for, default 5
+    :type n_top_ions: int, optional
+    :param max_bound: Optional value to limit size of detected bound, default 0
+    :type max_bound: int, optional
+    :param n_workers: The number of worker processes to divide the peaks
+        between. Default ``1``, which processes all peaks in the current process.
+    :type n_workers: int, optional
+    :param executor: An existing :class:`concurrent.futures.Executor` to
+        process the peaks with, in ``n_workers`` blocks.
+    :type executor: concurrent.futures.Executor, optional
+
+    :return: A list of ``(area, ion_areas, median_bounds)`` tuples, one for each peak
+    :rtype: list of tuple
+    """
+
+    if not isinstance(im, IntensityMatrix):
+        raise TypeError("'im' must be an IntensityMatrix object")
+
+    if not is_peak_list(peak_list):
+        raise TypeError("'peak_list' must be a list of Peak objects")
+
+    if not isinstance(n_top_ions, int):
+        raise TypeError("'n_top_ions' must be an integer")
+
+    if not isinstance(max_bound, int):
+        raise TypeError("'max_bound' must be an integer")
+
+    if not isinstance(n_workers, int) or isinstance(n_workers, bool):
+        raise TypeError("'n_workers' must be an int")
+
+    if n_workers < 1:
+        raise ValueError("'n_workers' must be at least 1")
+
+    if executor is not None and not isinstance(executor, concurrent.futures.Executor):
+        raise TypeError("'executor' must be a concurrent.futures.Executor")
+
+    apexes = im.get_indices_at_times([peak.rt for peak in peak_list]).tolist()
+
+    mass_indices = {}
+    top_ions_list = []
+    tasks = []
+
+    for peak, apex in zip(peak_list, apexes):
+        ms = peak.mass_spectrum
+
+        # get peak masses with non-zero intensity
+        mass_ii = numpy.flatnonzero(numpy.asarray(ms.mass_spec) > 0)
+
+        top_ions = peak.top_ions(n_top_ions)
+        top_ions_list.append(top_ions)
+        for ion in top_ions:
+            if ion not in mass_indices:
+                mass_indices[ion] = _mass_indices(im, [ion])[0]
+
+        # check if RT based index is similar to stored index
+        bounds_apex = apex
+        bounds = peak.bounds
+        if is_sequence(bounds) and apex - 1 < bounds[1] < apex + 1:
+            bounds_apex = bounds[1]
+
+        tasks.append((apex, mass_ii, [mass_indices[ion] for ion in top_ions], bounds_apex))
+
+    if n_workers == 1 and executor is None:
+        results = _integrate_peaks(im._intensities, tasks, max_bound)
+
+    else:
+        bounds = numpy.linspace(0, len(tasks), min(n_workers, max(len(tasks), 1)) + 1).astype(int)
+        blocks = [tasks[start:stop] for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist())]
+
+        if executor is None:
+            with concurrent.futures.ProcessPoolExecutor(n_workers) as executor:
+                results = _integrate_peak_blocks(im._intensities, blocks, max_bound, executor)
+        else:
+            results = _integrate_peak_blocks(im._intensities, blocks, max_bound, executor)
+
+    areas = []
+
+    for top_ions, (area, top_ion_areas, left_list, right_list) in zip(top_ions_list, results):
+        # NB lists may be empty
+        l_med = median(left_list) if left_list else 0
+        r_med = median(right_list) if right_list else 0
+
+        areas.append((area, dict(zip(top_ions, top_ion_areas)), (l_med, r_med)))
+
+    return areas
+
+
+def _integrate_peaks(intensity_array, tasks, max_bound):
+    """
+    Calculate the ion areas of a list of peaks.
+
+    :param intensity_array: The intensity array of the IntensityMatrix
+    :type intensity_array: numpy.ndarray
+    :param tasks: For each peak, the index of the apex, the indices of the ions with
+        non-zero intensity, the indices of the top ions, and the apex for the median bounds
+    :type tasks: list of tuple
+    :param max_bound: Optional value to limit size of detected bound
+    :type max_bound: int
+
+    :return: For each peak, the sum of the areas, the areas of the top ions,
+        and the left and right bounds for the median bounds
+    :rtype: list of tuple
+    """
+
+    results = []
+
+    for apex, mass_ii, top_ii, bounds_apex in tasks:
+        area, left, right, l_share, r_share = ion_areas(intensity_array, apex, mass_ii, max_bound)
+
+        # reuse the areas of the ions with non-zero intensity for the top ions
+        area_of_index = dict(zip(mass_ii.tolist(), area.tolist()))
+        missing = sorted({ii for ii in top_ii if ii not in area_of_index})
+        if missing:
+            area_of_index.update(zip(missing, ion_areas(intensity_array, apex, missing, max_bound)[0].tolist()))
+
+        if bounds_apex != apex or max_bound != 0:
+            _, left, right, l_share, r_share = ion_areas(intensity_array, bounds_apex, mass_ii)
+
+        results.append((
+                sum(area.tolist()),
+                [area_of_index[ii] for ii in top_ii],
+                left.tolist(),
+                right.tolist(),
+                ))
+
+    return results
+
+
+def _integrate_peak_blocks(intensity_array, blocks, max_bound, executor):
+    """
+    Calculate the ion areas of blocks of peaks using the given executor.
+
+    For a :class:`concurrent.futures.ProcessPoolExecutor` the intensity array
+    is placed in :mod:`multiprocessing.shared_memory` once, rather than being
+    sent to the worker with every block. Other executors, or process pools on
+    Python 3.6 and 3.7, are given the intensity array itself.
+
+    :param intensity_array: The intensity array of the IntensityMatrix
+    :type intensity_array: numpy.ndarray or scipy.sparse.csr_matrix
+    :param blocks: Blocks of tasks for :func:`~pyms.Peak.List.Function._integrate_peaks`
+    :type blocks: list of list
+    :param max_bound: Optional value to limit size of detected bound
+    :type max_bound: int
+    :param executor:
+    :type executor: concurrent.futures.Executor
+
+    :rtype: list of tuple
+    """
+
+    if shared_memory is None or not isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+        futures = [executor.submit(_integrate_peaks, intensity_array, block, max_bound) for block in blocks]
+        return _block_results(futures)
+
+    # A sparse matrix is shared as the three arrays it is made from
+    if scipy.sparse.issparse(intensity_array):
+        intensity_array = intensity_array.tocsr()
+        arrays = [intensity_array.data, intensity_array.indices, intensity_array.indptr]
+    else:
+        arrays = [intensity_array]
+
+    shms = []
+
+    try:
+        specs = []
+        for array in arrays:
+            nbytes = int(numpy.prod(array.shape)) * array.dtype.itemsize
+            shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+            shms.append(shm)
+
+            shared_array = numpy.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+            if array.ndim == 2:
+                # the intensity array may have nulled masses, so it is read as for exporting
+                _copy_scan_blocks(array, shared_array)
+            else:
+                shared_array[:] = array
+            del shared_array
+
+            specs.append((shm.name, array.shape, array.dtype.str))
+
+        futures = [
+                executor.submit(_integrate_shared_peaks, specs, intensity_array.shape, block, max_bound)
+                for block in blocks
+                ]
+
+        return _block_results(futures)
+
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+
+def _integrate_shared_peaks(specs, shape, tasks, max_bound):
+    """
+    Calculate the ion areas of a list of peaks, with the intensity array in shared memory.
+
+    :param specs: The name of the shared memory, and the shape and data type of
+        the array in it, for the intensity array or for the data, indices and
+        index pointer of a :class:`scipy.sparse.csr_matrix`
+    :type specs: list[tuple[str, tuple[int], str]]
+    :param shape: The shape of the intensity array
+    :type shape: tuple[int, int]
+    :param tasks: The tasks for :func:`~pyms.Peak.List.Function._integrate_peaks`
+    :type tasks: list of tuple
+    :param max_bound: Optional value to limit size of detected bound
+    :type max_bound: int
+
+    :rtype: list of tuple
+    """
+
+    shms = []
+
+    try:
+        arrays = []
+        for name, array_shape, dtype in specs:
+            shm = shared_memory.SharedMemory(name=name)
+            shms.append(shm)
+            arrays.append(numpy.ndarray(array_shape, dtype=dtype, buffer=shm.buf))
+
+        if len(arrays) == 1:
+            intensity_array = arrays[0]
+        else:
+            intensity_array = scipy.sparse.csr_matrix(tuple(arrays), shape=shape, copy=False)
+
+        results = _integrate_peaks(intensity_array, tasks, max_bound)
+        del intensity_array, arrays
+
+        return results
+
+    finally:
+        for shm in shms:
+            shm.close()
+
+
+def _block_results(futures):
+    """
+    Returns the results of the futures for blocks of peaks, in order.
+
+    :type futures: list[concurrent.futures.Future]
+
+    :rtype: list of tuple
+    """
+
+    results = []
+    for future in futures:
+        results.extend(future.result())
+
+    return results
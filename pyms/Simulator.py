@@ -30,7 +30,7 @@ import math
 import numpy
 
 # this package
-from pyms.IntensityMatrix import IntensityMatrix
+from pyms.IntensityMatrix import IntensityMatrix, _float_dtype
 
 
 def add_gaussc_noise(im, scale):
@@ -190,7 +190,7 @@ def gaussian(point, mean, sigma, scale):
     return scale * math.exp((-(point - mean) ** 2) / (2 * (sigma ** 2)))
 
 
-def gcms_sim(time_list, mass_list, peak_list):
+def gcms_sim(time_list, mass_list, peak_list, dtype=numpy.float64):
     """
     Simulator of GCMS data
 
@@ -200,6 +200,8 @@ def gcms_sim(time_list, mass_list, peak_list):
     :type mass_list: list
     :param peak_list: A list of peaks
     :type peak_list: :class:`list` of :class:`pyms.Peak.Class.Peak` objects
+    :param dtype: The floating point type of the intensity array. Default :class:`numpy.float64`
+    :type dtype: numpy.dtype, optional
 
     :return: A simulated Intensity Matrix object
     :rtype: pyms.IntensityMatrix.IntensityMatrix
@@ -207,6 +209,8 @@ def gcms_sim(time_list, mass_list, peak_list):
     :author: Sean O'Callaghan
     """
 
+    dtype = _float_dtype(dtype)
+
     n_mz = len(mass_list)
     n_scan = len(time_list)
 
@@ -214,7 +218,7 @@ def gcms_sim(time_list, mass_list, peak_list):
     period = time_list[1] - t1
 
     # initialise a 2D numpy array for intensity matrix
-    i_array = numpy.zeros((n_scan, n_mz), 'd')
+    i_array = numpy.zeros((n_scan, n_mz), dtype)
 
     for peak in peak_list:
         print("-", end='')
@@ -32,7 +32,7 @@ from scipy import ndimage
 
 # this package
 from pyms.GCMS.Function import ic_window_points
-from pyms.IntensityMatrix import IntensityMatrix
+from pyms.IntensityMatrix import IntensityMatrix, _map_ions
 from pyms.IonChromatogram import IonChromatogram
 
 
@@ -78,16 +78,36 @@ def tophat(ic, struct=None):
     return ic_bc
 
 
-def tophat_im(im, struct=None):
+def tophat_im(im, struct=None, n_workers=1, executor=None, inplace=False, dtype=None):
     """
     Top-hat baseline correction on Intensity Matrix
 
-    Wraps around the TopHat function above
+    Applies the same baseline correction as :func:`~pyms.TopHat.tophat`
+    to the intensities of each ion. The structural element is applied along
+    the time axis of the whole intensity array in a single call to
+    :func:`scipy.ndimage.grey_opening`.
 
     :param im: The input Intensity Matrix
     :type im: pyms.IntensityMatrix.IntensityMatrix
     :param struct: Top-hat structural element as time string
     :type struct: str
+    :param n_workers: The number of worker processes to divide the ions
+        between. Default ``1``, which corrects all ions in the current process.
+    :type n_workers: int, optional
+    :param executor: An existing :class:`concurrent.futures.Executor` to
+        correct the ions with, in ``n_workers`` blocks.
+    :type executor: concurrent.futures.Executor, optional
+    :param inplace: Whether to correct the intensities of ``im`` in place
+        rather than returning a new IntensityMatrix. Default :py:obj:`False`.
+    :type inplace: bool, optional
+    :param dtype: The floating point type of the corrected intensities, e.g.
+        :class:`numpy.float32` to halve the memory used.
+        Default is the data type of the intensities of ``im``, or
+        :class:`numpy.float64` if they are integers. The baseline is exact
+        in either type, so with :class:`numpy.float32` the corrected
+        intensities differ from those for :class:`numpy.float64` by at most
+        ``1.2e-7`` times the largest intensity of the ion.
+    :type dtype: numpy.dtype, optional
 
     :return: Top-hat corrected IntensityMatrix Matrix
     :rtype: pyms.IntensityMatrix.IntensityMatrix
@@ -100,11 +120,28 @@ def tophat_im(im, struct=None):
 
     n_scan, n_mz = im.size
 
-    im_smooth = copy.deepcopy(im)
+    if struct:
+        struct_pts = ic_window_points(im.get_ic_at_index(0), struct)
+    else:
+        struct_pts = int(round(n_scan * _STRUCT_ELM_FRAC))
+
+    return _map_ions(im, _tophat_ions, (struct_pts, ), n_workers, executor, inplace, dtype)
+
+
+def _tophat_ions(intensity_array, struct_pts):
+    """
+    Top-hat baseline correction of the intensities of each ion, in place.
+
+    :param intensity_array: The intensities of the ions, one ion per column
+    :type intensity_array: numpy.ndarray
+    :param struct_pts: The size of the structural element in points
+    :type struct_pts: int
+
+    :return: ``intensity_array``, with the baseline subtracted
+    :rtype: numpy.ndarray
+    """
 
-    for ii in range(n_mz):
-        ic = im_smooth.get_ic_at_index(ii)
-        ic_smooth = tophat(ic, struct)
-        im_smooth.set_ic_at_index(ii, ic_smooth)
+    baseline = ndimage.grey_opening(intensity_array, size=(struct_pts, 1))
+    numpy.subtract(intensity_array, baseline, out=intensity_array)
 
-    return im_smooth
+    return intensity_array
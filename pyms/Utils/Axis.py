@@ -0,0 +1,145 @@
+"""
+Provides a class for looking up the nearest index of a time or mass
+"""
+
+################################################################################
+#                                                                              #
+#    PyMassSpec software for processing of mass-spectrometry data              #
+#    Copyright (C) 2019-2020 Dominic Davis-Foster                              #
+#                                                                              #
+#    This program is free software; you can redistribute it and/or modify      #
+#    it under the terms of the GNU General Public License version 2 as         #
+#    published by the Free Software Foundation.                                #
+#                                                                              #
+#    This program is distributed in the hope that it will be useful,           #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#    GNU General Public License for more details.                              #
+#                                                                              #
+#    You should have received a copy of the GNU General Public License         #
+#    along with this program; if not, write to the Free Software               #
+#    Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.                 #
+#                                                                              #
+################################################################################
+
+# stdlib
+from numbers import Number
+
+# 3rd party
+import numpy
+
+# this package
+from pyms.Utils.Utils import is_sequence
+
+
+class SortedAxis:
+	"""
+	An axis of values, such as retention times or masses, which can be
+	searched for the index of the nearest value.
+
+	Whether the values are in ascending order is checked once, when the axis
+	is created. If they are, lookups use a binary search; otherwise every
+	value is compared. Where two values are equally near the one with the
+	lower index is returned.
+
+	:param values: The values of the axis
+	:type values: ~collections.abc.Sequence[float] or numpy.ndarray
+	"""
+
+	def __init__(self, values):
+		"""
+		Initialize the SortedAxis
+		"""
+
+		if not is_sequence(values):
+			raise TypeError("'values' must be a Sequence")
+
+		values = numpy.array(values, dtype=numpy.float64)
+
+		if values.ndim != 1:
+			raise ValueError("'values' must be one-dimensional")
+
+		values.flags.writeable = False
+
+		self._values = values
+		self._is_sorted = bool((values[1:] >= values[:-1]).all())
+
+	def __len__(self):
+		"""
+		Returns the number of values in the axis
+
+		:rtype: int
+		"""
+
+		return len(self._values)
+
+	@property
+	def values(self):
+		"""
+		Returns the values of the axis, as a read-only array
+
+		:rtype: numpy.ndarray
+		"""
+
+		return self._values
+
+	@property
+	def is_sorted(self):
+		"""
+		Returns whether the values are in ascending order
+
+		:rtype: bool
+		"""
+
+		return self._is_sorted
+
+	def nearest_index(self, value):
+		"""
+		Returns the index of the value nearest to the given value
+
+		:param value:
+		:type value: float
+
+		:rtype: int
+		"""
+
+		if not isinstance(value, Number):
+			raise TypeError("'value' must be a number")
+
+		return int(self.nearest_indices([value])[0])
+
+	def nearest_indices(self, values):
+		"""
+		Returns the index of the value nearest to each of the given values
+
+		:param values:
+		:type values: ~collections.abc.Sequence[float] or numpy.ndarray
+
+		:rtype: numpy.ndarray
+		"""
+
+		axis = self._values
+		values = numpy.asarray(values, dtype=numpy.float64)
+
+		if not len(axis):
+			raise IndexError("the axis is empty")
+
+		if not self._is_sorted:
+			indices = numpy.empty(values.shape, dtype=numpy.intp)
+			for index, value in numpy.ndenumerate(values):
+				indices[index] = numpy.abs(value - axis).argmin()
+			return indices
+
+		if len(axis) == 1:
+			return numpy.zeros(values.shape, dtype=numpy.intp)
+
+		# the values either side of each value
+		right = numpy.searchsorted(axis, values, side="left")
+		numpy.clip(right, 1, len(axis) - 1, out=right)
+		left = right - 1
+
+		use_left = numpy.abs(values - axis[left]) <= numpy.abs(values - axis[right])
+		indices = numpy.where(use_left, left, right)
+
+		# the first of any repeated values
+		return numpy.searchsorted(axis, axis[indices], side="left")
@@ -25,7 +25,9 @@ from copy import deepcopy
 
 # 3rd party
 import deprecation
+import numpy
 import pytest
+from scipy.io import netcdf_file
 
 # pyms
 from pyms.GCMS.Class import GCMS_data
@@ -143,6 +145,44 @@ def test_ANDI_reader(datadir):
 # todo
 
 
+def test_ANDI_reader_mmap(andi, datadir):
+	mapped = ANDI_reader(datadir / "gc01_0812_066.cdf", mmap=True)
+	assert mapped == andi
+	assert mapped.scan_list[0] == andi.scan_list[0]
+	assert list(mapped.tic.intensity_array) == list(andi.tic.intensity_array)
+
+
+@pytest.mark.parametrize("scale_factor", [None, 1.0, 2.0])
+def test_ANDI_reader_mmap_descending(tmp_path, scale_factor):
+	# The second scan has its masses in descending order
+	file_name = tmp_path / "descending.cdf"
+	rootgrp = netcdf_file(str(file_name), "w")
+	rootgrp.createDimension("point_number", 12)
+	rootgrp.createDimension("scan_number", 3)
+	mass_values = rootgrp.createVariable("mass_values", "f", ("point_number", ))
+	mass_values[:] = [50, 51, 52, 53, 63, 62, 61, 60, 70, 71, 72, 73]
+	intensity_values = rootgrp.createVariable("intensity_values", "f", ("point_number", ))
+	intensity_values[:] = numpy.arange(1, 13)
+	if scale_factor is not None:
+		intensity_values.scale_factor = scale_factor
+	rootgrp.createVariable("point_count", "i", ("scan_number", ))[:] = [4, 4, 4]
+	rootgrp.createVariable("scan_acquisition_time", "d", ("scan_number", ))[:] = [1.0, 2.0, 3.0]
+	rootgrp.close()
+
+	andi = ANDI_reader(file_name)
+	mapped = ANDI_reader(file_name, mmap=True)
+	assert mapped == andi
+	assert mapped.scan_list[1].mass_list == [60, 61, 62, 63]
+	assert mapped.scan_list[1].intensity_list == [value * (scale_factor or 1) for value in [8, 7, 6, 5]]
+
+	# The scans are reversed in copy-on-write mappings, unless the values had to be scaled
+	assert isinstance(mapped._mass_array, numpy.memmap)
+	assert isinstance(mapped._intensity_array, numpy.memmap) == (scale_factor in {None, 1.0})
+
+	# The file is unchanged
+	assert ANDI_reader(file_name, mmap=True) == andi
+
+
 def test_GCMS_data(andi):
 	assert isinstance(andi, GCMS_data)
 
@@ -27,9 +27,10 @@ import pytest
 
 # pyms
 from pyms.BillerBiemann import (
-	BillerBiemann, get_maxima_indices, get_maxima_list, get_maxima_list_reduced,
+	_iter_maxima_chunks, BillerBiemann, get_maxima_indices, get_maxima_list, get_maxima_list_reduced,
 	get_maxima_matrix, num_ions_threshold, rel_threshold, sum_maxima,
 	)
+from pyms.IntensityMatrix import build_intensity_matrix_i, IntensityMatrix, SparseIntensityMatrix
 from pyms.IonChromatogram import IonChromatogram
 from pyms.Noise.Analysis import window_analyzer
 from pyms.Noise.SavitzkyGolay import savitzky_golay
@@ -70,6 +71,35 @@ class TestBillerBiemann:
 
 		assert len(peak_list2) <= len(peak_list)
 
+	@pytest.mark.parametrize("points, scans", [(3, 1), (9, 2), (5, 3)])
+	@pytest.mark.parametrize("chunk_size", [1, 50, 1000, 5000])
+	def test_chunk_size(self, im_i, points, scans, chunk_size):
+		peak_list = BillerBiemann(im_i, points=points, scans=scans)
+		chunked_peak_list = BillerBiemann(im_i, points=points, scans=scans, chunk_size=chunk_size)
+
+		assert chunked_peak_list == peak_list
+		assert [peak.bounds for peak in chunked_peak_list] == [peak.bounds for peak in peak_list]
+
+	def test_chunk_size_memmap(self, im_i, outputdir):
+		intensity_array = numpy.lib.format.open_memmap(
+				outputdir / "intensity_array.npy", mode="w+", dtype=float, shape=im_i.size
+				)
+		intensity_array[:] = im_i.intensity_array
+		im = IntensityMatrix(im_i.time_list, im_i.mass_list, intensity_array)
+
+		assert BillerBiemann(im, points=9, scans=2, chunk_size=100) == BillerBiemann(im_i, points=9, scans=2)
+
+	@pytest.mark.parametrize("chunk_size", [None, 100])
+	def test_sparse(self, im_i, data, chunk_size):
+		im_sparse = build_intensity_matrix_i(data, sparse=True)
+		assert isinstance(im_sparse, SparseIntensityMatrix)
+
+		peak_list = BillerBiemann(im_i, points=9, scans=2)
+		sparse_peak_list = BillerBiemann(im_sparse, points=9, scans=2, chunk_size=chunk_size)
+
+		assert sparse_peak_list == peak_list
+		assert [peak.bounds for peak in sparse_peak_list] == [peak.bounds for peak in peak_list]
+
 	@pytest.mark.parametrize("obj", [test_string, *test_numbers, *test_sequences, test_dict])
 	def test_im_errors(self, obj):
 		with pytest.raises(TypeError):
@@ -85,6 +115,14 @@ class TestBillerBiemann:
 		with pytest.raises(TypeError):
 			BillerBiemann(im_i, points=obj)
 
+	@pytest.mark.parametrize("obj", [test_string, test_float, *test_sequences, test_dict])
+	def test_chunk_size_errors(self, obj, im_i):
+		with pytest.raises(TypeError):
+			BillerBiemann(im_i, chunk_size=obj)
+
+		with pytest.raises(ValueError):
+			BillerBiemann(im_i, chunk_size=0)
+
 
 class Test_rel_threshold:
 
@@ -190,10 +228,20 @@ class Test_sum_maxima:
 
 
 class Test_get_maxima_indices:
-	@pytest.mark.skip(reason="TODO")
 	def test_get_maxima_indices(self):
-		# TODO: main test
-		pass
+		intensities = [0, 1, 5, 1, 0, 2, 3, 3, 3, 1, 0, 4, 4, 2, 0, 1, 2]
+		assert get_maxima_indices(intensities) == [2, 7, 11]
+		assert get_maxima_indices(numpy.array(intensities)) == [2, 7, 11]
+		assert get_maxima_indices(intensities, points=5) == [2, 7, 11]
+		assert get_maxima_indices(intensities[:2]) == []
+
+	def test_get_maxima_indices_2d(self, im):
+		raw_im = im.intensity_array
+		scan_indices, ion_indices = get_maxima_indices(raw_im, points=5)
+
+		for ion_idx in range(raw_im.shape[1]):
+			maxima = get_maxima_indices(raw_im[:, ion_idx], points=5)
+			assert list(scan_indices[ion_indices == ion_idx]) == maxima
 
 	@pytest.mark.parametrize("obj", [test_string, *test_numbers, test_list_strs, test_dict])
 	def test_ion_intensities_errors(self, obj):
@@ -205,6 +253,10 @@ class Test_get_maxima_indices:
 		with pytest.raises(TypeError):
 			get_maxima_indices(test_list_ints, points=obj)
 
+	def test_points_value_errors(self):
+		with pytest.raises(ValueError):
+			get_maxima_indices(test_list_ints, points=1)
+
 
 class Test_get_maxima_list:
 	def test_get_maxima_list(self, tic):
@@ -265,6 +317,50 @@ class Test_get_maxima_matrix:
 		assert isinstance(maxima_matrix, numpy.ndarray)
 		# TODO: value check
 
+	def test_combine_scans(self):
+		intensity_array = numpy.zeros((7, 2))
+		intensity_array[1, 0] = 5
+		intensity_array[2, 1] = 4
+		im = IntensityMatrix(list(range(7)), [50, 51], intensity_array)
+
+		assert (get_maxima_matrix(im, scans=1) == intensity_array).all()
+
+		expected = numpy.zeros((7, 2))
+		expected[1] = [5, 4]
+		assert (get_maxima_matrix(im, scans=2) == expected).all()
+
+	def test_first_window(self):
+		# No scan in the window of the first scan has a positive TIC,
+		# so the maxima are moved to the first scan rather than the last.
+		intensity_array = numpy.full((7, 1), -5.0)
+		intensity_array[1, 0] = -1
+		im = IntensityMatrix(list(range(7)), [50], intensity_array)
+
+		expected = numpy.zeros((7, 1))
+		expected[0, 0] = -1
+		assert (get_maxima_matrix(im, scans=3) == expected).all()
+
+		for chunk_size in [1, 2, 3]:
+			chunks = [chunk.copy() for _, chunk in _iter_maxima_chunks(intensity_array, 3, 3, chunk_size)]
+			assert (numpy.concatenate(chunks) == expected).all()
+
+	@pytest.mark.parametrize("chunk_size", [1, 2, 5])
+	def test_chunked_plateau(self, chunk_size):
+		# A plateau which spans several chunks holds back the scans after its rising edge
+		intensity_array = numpy.zeros((30, 2))
+		intensity_array[5:17, 0] = 3
+		intensity_array[10, 1] = 2
+		intensity_array[24, 0] = 1
+		im = IntensityMatrix(list(range(30)), [50, 51], intensity_array)
+
+		expected = get_maxima_matrix(im, points=3, scans=2)
+		assert expected[10:12].sum() == 5
+
+		# The blocks are views of a buffer which is reused, so are copied as they are read
+		chunks = [(first_row, chunk.copy()) for first_row, chunk in _iter_maxima_chunks(intensity_array, 3, 2, chunk_size)]
+		assert [first_row for first_row, _ in chunks] == numpy.cumsum([0] + [len(chunk) for _, chunk in chunks[:-1]]).tolist()
+		assert (numpy.concatenate([chunk for _, chunk in chunks]) == expected).all()
+
 	@pytest.mark.parametrize("obj", [test_string, *test_numbers, *test_sequences, test_dict])
 	def test__errors(self, obj):
 		with pytest.raises(TypeError):
@@ -19,6 +19,7 @@
 #############################################################################
 
 # stdlib
+import concurrent.futures
 import csv
 import math
 import operator
@@ -31,7 +32,7 @@ import pytest
 # pyms
 from pyms.BillerBiemann import BillerBiemann, num_ions_threshold, rel_threshold
 from pyms.DPA.Alignment import Alignment, exprl2alignment
-from pyms.DPA.PairwiseAlignment import align_with_tree, PairwiseAlignment
+from pyms.DPA.PairwiseAlignment import align, align_with_tree, dp, PairwiseAlignment, position_similarity, score_matrix
 from pyms.Experiment import Experiment, load_expr
 from pyms.GCMS.IO.JCAMP import JCAMP_reader
 from pyms.IntensityMatrix import build_intensity_matrix_i
@@ -121,6 +122,16 @@ def F1(expr_list):
 	return F1
 
 
+def test_alignment_copy_peaks(expr_list):
+	copied = exprl2alignment(expr_list)
+	shared = exprl2alignment(expr_list, copy_peaks=False)
+
+	for expr, copied_algt, shared_algt in zip(expr_list, copied, shared):
+		assert all(peak is expr_peak for peak, expr_peak in zip(shared_algt.peakpos[0], expr.peak_list))
+		assert not any(peak is expr_peak for peak, expr_peak in zip(copied_algt.peakpos[0], expr.peak_list))
+		assert [peak.rt for peak in shared_algt.peakpos[0]] == [peak.rt for peak in copied_algt.peakpos[0]]
+
+
 @pytest.fixture(scope="module")
 def T1(F1):
 	T1 = PairwiseAlignment(F1, Dw, Gw)
@@ -129,6 +140,15 @@ def T1(F1):
 	return T1
 
 
+def test_pairwise_alignment_workers(F1, T1):
+	T2 = PairwiseAlignment(F1, Dw, Gw, n_workers=2)
+	assert (T2.sim_matrix == T1.sim_matrix).all()
+
+	with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+		T3 = PairwiseAlignment(F1, Dw, Gw, executor=executor)
+	assert (T3.sim_matrix == T1.sim_matrix).all()
+
+
 @pytest.fixture(scope="module")
 def A1(T1):
 	A1 = align_with_tree(T1, min_peaks=2)
@@ -142,6 +162,18 @@ def A1(T1):
 	return A1
 
 
+def test_align_with_tree_workers(T1):
+	def peak_rts(alignment):
+		return [[None if peak is None else peak.rt for peak in position] for position in alignment.peakpos]
+
+	serial = align_with_tree(T1, min_peaks=2)
+	parallel = align_with_tree(T1, min_peaks=2, n_workers=2)
+	assert len(parallel) == 232
+	assert parallel.expr_code == serial.expr_code
+	assert parallel.similarity == serial.similarity
+	assert peak_rts(parallel) == peak_rts(serial)
+
+
 class Test_alignment_Errors:
 
 	@pytest.mark.parametrize("obj", [test_string, test_int, *test_sequences, test_dict])
@@ -151,6 +183,26 @@ class Test_alignment_Errors:
 		with pytest.raises(TypeError):
 			PairwiseAlignment(F1, Dw, obj)
 
+	@pytest.mark.parametrize("obj", [test_float, test_string, *test_sequences, test_dict])
+	def test_workers_errors(self, F1, obj):
+		with pytest.raises(TypeError):
+			PairwiseAlignment(F1, Dw, Gw, n_workers=obj)
+		with pytest.raises(TypeError):
+			PairwiseAlignment(F1, Dw, Gw, executor=obj)
+
+	def test_workers_value_errors(self, F1, T1):
+		with pytest.raises(ValueError):
+			PairwiseAlignment(F1, Dw, Gw, n_workers=0)
+		with pytest.raises(ValueError):
+			align_with_tree(T1, n_workers=0)
+
+	@pytest.mark.parametrize("obj", [test_float, test_string, *test_sequences, test_dict])
+	def test_align_with_tree_workers_errors(self, T1, obj):
+		with pytest.raises(TypeError):
+			align_with_tree(T1, n_workers=obj)
+		with pytest.raises(TypeError):
+			align_with_tree(T1, executor=obj)
+
 	@pytest.mark.parametrize("obj", [*test_numbers, test_string, *test_sequences, test_dict])
 	def test_expr_errors(self, obj):
 		with pytest.raises(TypeError):
@@ -376,8 +428,42 @@ def test_align_2_alignments(A1, datadir, outputdir):
 	top_ion_list = A9.common_ion()
 	A9.write_common_ion_csv(outputdir / 'area.csv', top_ion_list)
 
+
+def test_score_matrix(F1):
+	# merged alignment, so that some positions contain gaps
+	a1 = align(F1[0], F1[1], Dw, Gw)
+	a2 = F1[2]
+
+	M = score_matrix(a1, a2, Dw)
+	assert M.shape == (len(a1), len(a2))
+
+	expected = numpy.zeros((len(a1), len(a2)))
+	for i, algt1pos in enumerate(a1.peakalgt):
+		for j, algt2pos in enumerate(a2.peakalgt):
+			expected[i, j] = position_similarity(algt1pos, algt2pos, Dw)
+
+	numpy.testing.assert_allclose(M, expected)
+	numpy.testing.assert_allclose(score_matrix(a2, a1, Dw), expected.T)
+
+
 # def test_alignment_compare():
 # todo
 
-# def test_dp()
-# todo
+def test_dp(F1):
+	S = numpy.array([[0.0, 1.0, 1.0], [1.0, 1.0, 0.0]])
+	for banded in (False, True):
+		result = dp(S, Gw, banded=banded)
+		assert result["p"] == [0, 0, 1]
+		assert result["q"] == [0, 1, 2]
+		assert result["trace"] == [0, 2, 0]
+		assert result["matches"] == [[0, 0], [1, 2]]
+		assert result["D"][-1, -1] == pytest.approx(Gw)
+		assert result["phi"].dtype == numpy.int8
+
+	with pytest.raises(IndexError):
+		dp(numpy.zeros((3, 0)), Gw)
+
+	M = score_matrix(F1[0], F1[1], Dw)
+	full = dp(M, Gw)
+	banded = dp(M, Gw, banded=True)
+	assert banded["D"][-1, -1] == pytest.approx(full["D"][-1, -1])
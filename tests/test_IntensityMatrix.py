@@ -26,20 +26,27 @@ import types
 # 3rd party
 import numpy
 import pytest
+import scipy.sparse
 import deprecation
 
 # pyms
 from pyms.IntensityMatrix import (
-	ASCII_CSV, build_intensity_matrix, build_intensity_matrix_i, import_leco_csv,
-	IntensityMatrix,
+	ASCII_CSV, ASCII_DAT, build_intensity_matrix, build_intensity_matrix_i, import_hdf5, import_leco_csv,
+	import_npy, IntensityMatrix, SparseIntensityMatrix,
 	)
 from pyms.IonChromatogram import IonChromatogram
 from pyms.Spectrum import MassSpectrum
+from pyms.Utils.IO import save_data
 
 # tests
 from .constants import *
 
 
+@pytest.fixture(scope="module")
+def im_sparse(data):
+	return build_intensity_matrix(data, sparse=True)
+
+
 @pytest.fixture(scope="module")
 def im_leco_filename(im, outputdir):
 	"""
@@ -83,6 +90,7 @@ class TestIntensityMatrix:
 	@pytest.mark.parametrize("obj, expects", [
 			*args,
 			([test_list_ints], ValueError),
+			([test_list_ints, test_list_ints[1:]], ValueError),
 			])
 	def test_intensity_array_errors(self, obj, im, expects):
 		with pytest.raises(expects):
@@ -214,6 +222,18 @@ class TestIntensityMatrix:
 		with pytest.raises(expects):
 			im.get_index_at_time(obj)
 
+	def test_get_indices_at_times(self, im):
+		indices = im.get_indices_at_times([test_int, test_float, test_int])
+		assert isinstance(indices, numpy.ndarray)
+		assert indices.tolist() == [1168, 11, 1168]
+
+		for obj in [test_string, test_dict, test_int]:
+			with pytest.raises(TypeError):
+				im.get_indices_at_times(obj)
+		for obj in [[-1], [test_int, 1000000]]:
+			with pytest.raises(IndexError):
+				im.get_indices_at_times(obj)
+
 	def test_get_time_at_index(self, im):
 		assert im.get_time_at_index(test_int) == 1304.15599823
 
@@ -299,6 +319,26 @@ class TestIntensityMatrix:
 		with pytest.raises(IndexError):
 			im.get_ic_at_index(test_int)
 
+	def test_get_ic_at_index_view(self, im):
+		im = copy.deepcopy(im)
+
+		ic = im.get_ic_at_index(123)
+		view = im.get_ic_at_index(123, view=True)
+		assert view == ic
+		assert view.time_list == im.time_list
+		assert view.time_step == ic.time_step
+
+		# changes to the view are seen in the intensity matrix, but not in the copy
+		view._intensity_array[0] += 1000
+		assert im.get_ic_at_index(123).get_intensity_at_index(0) == ic.get_intensity_at_index(0) + 1000
+
+		im.set_ic_at_index(123, ic)
+		assert view == ic
+
+		for obj in [test_dict, test_list_strs, test_string, test_int, test_float]:
+			with pytest.raises(TypeError):
+				im.get_ic_at_index(123, view=obj)
+
 	def test_get_ic_at_mass(self, im):
 		# TODO: im.get_ic_at_mass() # Broken
 		ic = im.get_ic_at_mass(123)
@@ -365,6 +405,8 @@ class TestIntensityMatrix:
 		assert isinstance(index, int)
 		assert index == 23
 
+		assert im.get_indices_of_masses([73.3, 0, 1000]).tolist() == [index, 0, len(im.mass_list) - 1]
+
 		# the nearest mass to 73.3m/z
 		assert isinstance(im.get_mass_at_index(index), float)
 		assert im.get_mass_at_index(index) == 73.2516
@@ -405,6 +447,38 @@ class TestIntensityMatrix:
 
 		im.crop_mass(101.5, 149.5)
 
+		# no masses in the range
+		mass = im.mass_list[10]
+		with pytest.raises(ValueError):
+			im.crop_mass(mass + 0.2, mass + 0.8)
+
+	def test_crop_time(self, im):
+		im = copy.deepcopy(im)
+		original = copy.deepcopy(im)
+
+		for obj in [test_dict, *test_lists, test_string]:
+			with pytest.raises(TypeError):
+				im.crop_time(obj, 1500)
+			with pytest.raises(TypeError):
+				im.crop_time(1000, obj)
+
+		with pytest.raises(ValueError):
+			im.crop_time(1500, 1000)
+		with pytest.raises(ValueError):
+			im.crop_time(0, 1)
+
+		im.crop_time(1000, 1500)
+
+		start = original.get_index_at_time(1000)
+		if original.time_list[start] < 1000:
+			start += 1
+
+		assert len(im) == len(im.intensity_array)
+		assert im.time_list == original.time_list[start:start + len(im)]
+		assert all(1000 <= rt <= 1500 for rt in im.time_list)
+		assert numpy.array_equal(im.intensity_array, original.intensity_array[start:start + len(im)])
+		assert im.get_ic_at_index(0).time_list == im.time_list
+
 	def test_null_mass(self, im):
 		im = copy.deepcopy(im)
 
@@ -419,8 +493,7 @@ class TestIntensityMatrix:
 
 		im.null_mass(120)
 
-		# TODO: Check that the nulling worked
-		print(sum(im.get_ic_at_mass(120).intensity_array))
+		assert not im.get_ic_at_mass(120).intensity_array.any()
 
 	def test_reduce_mass_spectra(self, im):
 		im = copy.deepcopy(im)
@@ -483,6 +556,244 @@ class Test_leco_csv:
 			im.export_leco_csv(obj)
 
 
+class Test_npy:
+	def test_export_import_npy(self, im, outputdir):
+		im.export_npy(outputdir / "im.npy")
+		assert (outputdir / "im.axes.npz").is_file()
+
+		imported_im = import_npy(outputdir / "im.npy")
+		assert isinstance(imported_im, IntensityMatrix)
+		assert isinstance(imported_im.intensity_array, numpy.ndarray)
+		assert isinstance(imported_im._intensity_array, numpy.memmap)
+		assert imported_im == im
+
+		imported_im = import_npy(outputdir / "im.npy", mmap_mode=None)
+		assert not isinstance(imported_im._intensity_array, numpy.memmap)
+		assert imported_im == im
+
+	def test_memmap(self, im, outputdir):
+		im.export_npy(outputdir / "im_memmap.npy")
+		imported_im = import_npy(outputdir / "im_memmap.npy")
+
+		expected = copy.deepcopy(im)
+		expected.crop_mass(60, 200)
+		expected.crop_time(1000, 1500)
+		expected.null_mass(73)
+
+		imported_im.crop_mass(60, 200)
+		imported_im.crop_time(1000, 1500)
+		imported_im.null_mass(73)
+
+		# the cropped array is still backed by the file
+		assert isinstance(imported_im._intensity_array, numpy.memmap)
+		assert imported_im == expected
+		assert imported_im.get_ic_at_mass(100) == expected.get_ic_at_mass(100)
+
+		# the file is not changed
+		assert import_npy(outputdir / "im_memmap.npy") == im
+
+		imported_im.export_npy(outputdir / "im_cropped.npy")
+		assert import_npy(outputdir / "im_cropped.npy") == expected
+
+	def test_null_mass_memmap(self, im, outputdir):
+		im.export_npy(outputdir / "im_null.npy")
+		imported_im = import_npy(outputdir / "im_null.npy")
+		intensity_array = imported_im._intensity_array
+
+		expected = copy.deepcopy(im)
+		expected.null_mass(73)
+		imported_im.null_mass(73)
+
+		# the intensities are read as zero, but the memmap is not written to
+		ii = im.get_index_of_mass(73)
+		assert imported_im._intensity_array is intensity_array
+		assert isinstance(imported_im._intensity_array, numpy.memmap)
+		assert (numpy.asarray(intensity_array[:, ii]) == im.intensity_array[:, ii]).all()
+		assert intensity_array[:, ii].any()
+
+		assert imported_im == expected
+		assert imported_im.get_ic_at_index(ii) == expected.get_ic_at_index(ii)
+		assert imported_im.get_ic_at_index(ii, view=True) == expected.get_ic_at_index(ii)
+		assert imported_im.get_ms_at_index(100) == expected.get_ms_at_index(100)
+		assert imported_im.get_scan_at_index(100) == expected.get_scan_at_index(100)
+
+		imported_im.export_npy(outputdir / "im_nulled.npy")
+		assert import_npy(outputdir / "im_nulled.npy") == expected
+		imported_im.export_leco_csv(outputdir / "im_nulled.csv")
+		expected.export_leco_csv(outputdir / "im_expected.csv")
+		assert (outputdir / "im_nulled.csv").read_text() == (outputdir / "im_expected.csv").read_text()
+
+		# the nulled masses move with the columns when cropping
+		imported_im.crop_mass(60, 200)
+		expected.crop_mass(60, 200)
+		assert imported_im == expected
+
+		# setting the ion chromatogram replaces the nulled intensities
+		ic = im.get_ic_at_mass(73)
+		imported_im.set_ic_at_index(expected.get_index_of_mass(73), ic)
+		expected.set_ic_at_index(expected.get_index_of_mass(73), ic)
+		assert imported_im == expected
+
+	@pytest.mark.parametrize("obj", [test_dict, *test_lists, *test_numbers])
+	def test_errors(self, im, obj):
+		with pytest.raises(TypeError):
+			im.export_npy(obj)
+		with pytest.raises(TypeError):
+			import_npy(obj)
+
+
+def test_export_import_hdf5(im, outputdir):
+	pytest.importorskip("h5py")
+
+	im.export_hdf5(outputdir / "im.h5")
+
+	imported_im = import_hdf5(outputdir / "im.h5")
+	assert isinstance(imported_im._intensity_array, numpy.memmap)
+	assert imported_im == im
+
+	imported_im = import_hdf5(outputdir / "im.h5", mmap_mode=None)
+	assert imported_im == im
+
+
+class TestSparseIntensityMatrix:
+	def test_creation(self, im, im_sparse):
+		assert isinstance(im_sparse, SparseIntensityMatrix)
+		assert isinstance(im_sparse._intensity_array, scipy.sparse.csr_matrix)
+		assert im_sparse._intensity_array.nnz < im.size[0] * im.size[1]
+
+		assert im_sparse.size == im.size
+		assert im_sparse.time_list == im.time_list
+		assert im_sparse.mass_list == im.mass_list
+		assert isinstance(im_sparse.intensity_array, numpy.ndarray)
+		assert (im_sparse.intensity_array == im.intensity_array).all()
+		assert im_sparse == im
+		assert im == im_sparse
+
+		assert SparseIntensityMatrix(im.time_list, im.mass_list, im.intensity_array) == im_sparse
+
+		for obj in [test_string, *test_numbers, test_dict, test_list_ints]:
+			with pytest.raises(TypeError):
+				SparseIntensityMatrix(im.time_list, im.mass_list, obj)
+
+		with pytest.raises(ValueError):
+			SparseIntensityMatrix(im.time_list[1:], im.mass_list, im_sparse.tocsr())
+
+	def test_conversion(self, im, im_sparse):
+		assert isinstance(im_sparse.tocsr(), scipy.sparse.csr_matrix)
+		assert isinstance(im_sparse.tocsc(), scipy.sparse.csc_matrix)
+		assert (im_sparse.tocsc().toarray() == im.intensity_array).all()
+
+		im_dense = im_sparse.todense()
+		assert type(im_dense) is IntensityMatrix
+		assert im_dense == im
+
+		with pytest.raises(TypeError):
+			build_intensity_matrix(im_sparse, sparse=test_string)
+
+	def test_intensity_matrix(self, im, im_sparse):
+		with pytest.warns(DeprecationWarning):
+			intensity_matrix = im_sparse.intensity_matrix
+
+		assert isinstance(intensity_matrix, numpy.ndarray)
+		assert (intensity_matrix == im.intensity_array).all()
+
+	def test_export_ascii(self, im, im_sparse, outputdir):
+		for fmt in [ASCII_DAT, ASCII_CSV]:
+			im.export_ascii(outputdir / "dense_ascii" / "im", fmt=fmt)
+			im_sparse.export_ascii(outputdir / "sparse_ascii" / "im", fmt=fmt)
+
+		dense_files = sorted((outputdir / "dense_ascii").iterdir())
+		assert dense_files
+		for dense_file in dense_files:
+			assert (outputdir / "sparse_ascii" / dense_file.name).read_text() == dense_file.read_text()
+
+		# The intensities are written as by save_data()
+		save_data(outputdir / "im_save_data.dat", im.intensity_array.tolist(), sep=" ")
+		assert (outputdir / "dense_ascii" / "im.im..dat").read_text() == (outputdir / "im_save_data.dat").read_text()
+
+	def test_export_leco_csv(self, im, im_sparse, outputdir):
+		im.export_leco_csv(outputdir / "im_dense_leco.csv")
+		im_sparse.export_leco_csv(outputdir / "im_sparse_leco.csv")
+
+		assert (outputdir / "im_sparse_leco.csv").read_text() == (outputdir / "im_dense_leco.csv").read_text()
+
+	def test_get_ic_at_index(self, im, im_sparse):
+		for ii in [0, 73, im.size[1] - 1]:
+			assert im_sparse.get_ic_at_index(ii) == im.get_ic_at_index(ii)
+
+		assert im_sparse.get_ic_at_mass(73) == im.get_ic_at_mass(73)
+
+		with pytest.raises(ValueError):
+			im_sparse.get_ic_at_index(0, view=True)
+		with pytest.raises(IndexError):
+			im_sparse.get_ic_at_index(im.size[1])
+
+	def test_get_ms_at_index(self, im, im_sparse):
+		for ii in [0, 1234, im.size[0] - 1]:
+			assert im_sparse.get_ms_at_index(ii) == im.get_ms_at_index(ii)
+
+		with pytest.raises(IndexError):
+			im_sparse.get_ms_at_index(im.size[0])
+
+	def test_set_ic_at_index(self, im, im_sparse):
+		im, im_sparse = copy.deepcopy(im), copy.deepcopy(im_sparse)
+
+		ic = im.get_ic_at_index(10)
+		ic.intensity_array = numpy.where(numpy.arange(len(ic)) % 3, ic.intensity_array, 0)
+
+		for ii in [20, 0, im.size[1] - 1]:
+			im.set_ic_at_index(ii, ic)
+			im_sparse.set_ic_at_index(ii, ic)
+
+			# the rows are only converted when they are next needed
+			assert im_sparse._rows is None
+			assert im_sparse.get_ic_at_index(ii) == im.get_ic_at_index(ii)
+
+		assert im_sparse == im
+		assert isinstance(im_sparse._intensity_array, scipy.sparse.csr_matrix)
+		assert im_sparse.get_ms_at_index(100) == im.get_ms_at_index(100)
+
+	def test_crop_null(self, im, im_sparse):
+		im, im_sparse = copy.deepcopy(im), copy.deepcopy(im_sparse)
+
+		for obj in [im, im_sparse]:
+			# the cached columns are replaced
+			obj.get_ic_at_index(0)
+			obj.crop_mass(60, 300)
+			obj.null_mass(73)
+			obj.crop_time(1000, 1500)
+
+		assert isinstance(im_sparse._intensity_array, scipy.sparse.csr_matrix)
+		assert im_sparse == im
+		assert im_sparse.get_ic_at_mass(73) == im.get_ic_at_mass(73)
+		assert not im_sparse.get_ic_at_mass(73).intensity_array.any()
+
+	def test_reduce_mass_spectra(self, im, im_sparse):
+		im, im_sparse = copy.deepcopy(im), copy.deepcopy(im_sparse)
+
+		im.reduce_mass_spectra(5)
+		im_sparse.reduce_mass_spectra(5)
+		assert im_sparse == im
+
+		# equal intensities, and negative intensities which rank below zero
+		intensity_array = numpy.array([[2.0, 0.0, -1.0, 2.0, 3.0], [-1.0, -2.0, -1.0, 0.0, 0.0]])
+		im = IntensityMatrix([1.0, 2.0], [50, 51, 52, 53, 54], intensity_array.copy())
+		im_sparse = SparseIntensityMatrix([1.0, 2.0], [50, 51, 52, 53, 54], intensity_array.copy())
+
+		for n_intensities in [4, 2]:
+			im.reduce_mass_spectra(n_intensities)
+			im_sparse.reduce_mass_spectra(n_intensities)
+			assert im_sparse == im
+
+		for obj in [test_string, *test_lists, test_dict]:
+			with pytest.raises(TypeError):
+				im_sparse.reduce_mass_spectra(obj)
+
+	def test_export_npy(self, im, im_sparse, outputdir):
+		im_sparse.export_npy(outputdir / "im_sparse.npy")
+		assert import_npy(outputdir / "im_sparse.npy") == im
+
+
 def test_IntensityMatrix_custom(data):
 	# IntensityMatrix
 	# must build intensity matrix before accessing any intensity matrix methods.
@@ -539,6 +850,46 @@ def test_build_intensity_matrix(data):
 			build_intensity_matrix(data, min_mass=obj)
 	with pytest.raises(ValueError):
 		build_intensity_matrix(data, bin_interval=0)
+	for sparse in [False, True]:
+		with pytest.raises(ValueError, match="outside the range of the bins"):
+			build_intensity_matrix(data, min_mass=data.min_mass + 10, sparse=sparse)
+
+
+@pytest.mark.parametrize("bin_interval, bin_left, bin_right", [(1, 0.5, 0.5), (0.5, 0.25, 0.25), (2, 0.75, 1.25)])
+def test_build_intensity_matrix_bins(data, bin_interval, bin_left, bin_right):
+	im = build_intensity_matrix(data, bin_interval, bin_left, bin_right)
+
+	# Bin each point of each scan in turn
+	expected = numpy.zeros(im.size)
+	for scan_idx, scan in enumerate(data.scan_list):
+		for mass, intensity in zip(scan.mass_list, scan.intensity_list):
+			mass_idx = int((mass + bin_left - data.min_mass) / bin_interval)
+			expected[scan_idx, mass_idx] += intensity
+
+	assert (im.intensity_array == expected).all()
+
+
+def test_build_intensity_matrix_dtype(data, im, im_i):
+	im_float32 = build_intensity_matrix(data, dtype=numpy.float32)
+	assert im_float32.intensity_array.dtype == numpy.float32
+	assert im_float32.mass_list == im.mass_list
+
+	# the double precision sums, rounded to single precision
+	assert (im_float32.intensity_array == im.intensity_array.astype(numpy.float32)).all()
+
+	im_i_float32 = build_intensity_matrix_i(data, dtype=numpy.float32)
+	assert im_i_float32.intensity_array.dtype == numpy.float32
+	assert (im_i_float32.intensity_array == im_i.intensity_array.astype(numpy.float32)).all()
+
+	# Test Errors
+	for dtype in [int, numpy.int32, bool]:
+		with pytest.raises(ValueError):
+			build_intensity_matrix(data, dtype=dtype)
+		with pytest.raises(ValueError):
+			build_intensity_matrix_i(data, dtype=dtype)
+
+	with pytest.raises(TypeError):
+		build_intensity_matrix(data, dtype=test_string)
 
 
 def test_build_intensity_matrix_i(data, im_i):
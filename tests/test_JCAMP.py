@@ -48,6 +48,34 @@ def test_JCAMP_reader(datadir):
 		JCAMP_reader(test_string)
 
 
+def test_JCAMP_reader_pages(outputdir):
+	jcamp_file = outputdir / "pages.JDX"
+	jcamp_file.write_text(
+			"##TITLE= \n##SCAN_NUMBER= 1\n##PAGE=   T=1.5\n##RETENTION_TIME= 1.5\n##XYDATA= (XY..XY)\n"
+			" 50.1, 100.0\n 51.2, 200.0\n\n"
+			"##SCAN_NUMBER= 2\n##PAGE=   T=2.5\n##RETENTION_TIME= 2.5\n##XYDATA= (XY..XY)\n"
+			" 52.3, 300.0, 53.4, 400.0,\n 54.5, 500.0\n"
+			"##SCAN_NUMBER= 3\n##PAGE=   T=3.5\n##XYDATA= (XY..XY)\n"
+			" 55.6, 600.0\n"
+			"##END= \n"
+			)
+
+	data = JCAMP_reader(jcamp_file)
+	assert data.time_list == [1.5, 2.5, 3.5]
+	assert data.scan_list[0] == Scan([50.1, 51.2], [100.0, 200.0])
+	assert data.scan_list[1] == Scan([52.3, 53.4, 54.5], [300.0, 400.0, 500.0])
+	assert data.scan_list[2] == Scan([55.6], [600.0])
+
+	# Errors
+	jcamp_file.write_text("##PAGE=   T=1.5\n##XYDATA= (XY..XY)\n 50.1, 100.0\n 51.2\n")
+	with pytest.raises(ValueError, match="data not in pair"):
+		JCAMP_reader(jcamp_file)
+
+	jcamp_file.write_text("##PAGE=   T=1.5\n##XYDATA= (XY..XY)\n 50.1, 100.0\n 51.2, abc\n")
+	with pytest.raises(ValueError):
+		JCAMP_reader(jcamp_file)
+
+
 # def test_JCAMP_OpenChrom_reader(datadir):
 	# todo
 
@@ -67,6 +95,46 @@ def test_GCMS_data(data):
 			GCMS_data(data.time_list, obj)
 
 
+def test_GCMS_data_from_arrays(data):
+	scans = data.scan_list
+	masses = numpy.concatenate([scan.mass_list for scan in scans])
+	intensities = numpy.concatenate([scan.intensity_list for scan in scans])
+	scan_index = numpy.cumsum([0] + [len(scan) for scan in scans[:-1]])
+
+	from_arrays = GCMS_data.from_arrays(data.time_list, masses, intensities, scan_index)
+	assert from_arrays == data
+	assert from_arrays.scan_list == scans
+	assert from_arrays.min_mass == data.min_mass
+	assert from_arrays.max_mass == data.max_mass
+	assert list(from_arrays.tic.intensity_array) == list(data.tic.intensity_array)
+
+	# Scans with the masses in descending order are reversed
+	descending = GCMS_data.from_arrays([1.0, 2.0, 3.0], [3, 2, 1, 1, 2, 3, 4, 5], [30, 20, 10, 1, 2, 3, 4, 5], [0, 3, 3])
+	assert descending.get_scan_at_index(0) == Scan([1, 2, 3], [10, 20, 30])
+	assert len(descending.get_scan_at_index(1)) == 0
+	assert descending.get_scan_at_index(2) == Scan([1, 2, 3, 4, 5], [1, 2, 3, 4, 5])
+	assert list(descending.tic.intensity_array) == [60, 0, 15]
+
+	# Errors
+	with pytest.raises(ValueError):
+		GCMS_data.from_arrays(data.time_list, masses, intensities[:-1], scan_index)
+	with pytest.raises(ValueError):
+		GCMS_data.from_arrays(data.time_list, masses, intensities, scan_index[:-1])
+	with pytest.raises(TypeError):
+		GCMS_data.from_arrays(test_string, masses, intensities, scan_index)
+
+
+def test_get_scan_at_index(data):
+	scan = data.get_scan_at_index(0)
+	assert isinstance(scan, Scan)
+	assert scan == data.scan_list[0]
+
+	with pytest.raises(TypeError):
+		data.get_scan_at_index(test_string)
+	with pytest.raises(IndexError):
+		data.get_scan_at_index(len(data))
+
+
 def test_len(data):
 	assert len(data) == 2103
 
@@ -0,0 +1,91 @@
+#############################################################################
+#                                                                           #
+#    PyMassSpec software for processing of mass-spectrometry data           #
+#    Copyright (C) 2019-2020 Dominic Davis-Foster                           #
+#                                                                           #
+#    This program is free software; you can redistribute it and/or modify   #
+#    it under the terms of the GNU General Public License version 2 as      #
+#    published by the Free Software Foundation.                             #
+#                                                                           #
+#    This program is distributed in the hope that it will be useful,        #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of         #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          #
+#    GNU General Public License for more details.                           #
+#                                                                           #
+#    You should have received a copy of the GNU General Public License      #
+#    along with this program; if not, write to the Free Software            #
+#    Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.              #
+#                                                                           #
+#############################################################################
+
+# 3rd party
+import pymzml
+import pytest
+
+# pyms
+from pyms.GCMS.Class import GCMS_data
+from pyms.GCMS.IO.MZML import _get_scan_time, iter_mzML_scans, mzML_reader
+from pyms.Spectrum import Scan
+
+# tests
+from .constants import *
+
+
+@pytest.fixture(scope="module")
+def mzml_file(datadir):
+	# Six spectra, with retention times of 1.5 seconds, 2500 milliseconds, 0.05 minutes,
+	# none, 0.001 hours, and 0.1 with no unit
+	return datadir / "sample.mzML"
+
+
+def test_mzML_reader(mzml_file):
+	data = mzML_reader(mzml_file)
+	assert isinstance(data, GCMS_data)
+
+	assert data.time_list == pytest.approx([1.5, 2.5, 3.0, 3.6, 6.0])
+	assert data.scan_list[0] == Scan([50.1, 51.2], [100.0, 200.0])
+	assert data.scan_list[1] == Scan([52.3, 53.4, 54.5], [300.0, 400.0, 500.0])
+	assert data.scan_list[4] == Scan([60.0], [1000.0])
+
+	# Errors
+	for obj in [*test_numbers, *test_sequences, test_dict]:
+		with pytest.raises(TypeError):
+			mzML_reader(obj)
+
+
+def test_iter_mzML_scans(mzml_file):
+	scans = iter_mzML_scans(mzml_file)
+
+	rt, mass_array, intensity_array = next(scans)
+	assert rt == 1.5
+	assert mass_array.tolist() == [50.1, 51.2]
+	assert intensity_array.tolist() == [100.0, 200.0]
+
+	# The spectrum without a retention time is skipped
+	remaining = list(scans)
+	assert [rt for rt, *_ in remaining] == pytest.approx([2.5, 3.0, 3.6, 6.0])
+	assert [mass_array.tolist() for _, mass_array, _ in remaining] == [[52.3, 53.4, 54.5], [55.6], [57.8, 58.9], [60.0]]
+
+	data = mzML_reader(mzml_file)
+	for (rt, mass_array, intensity_array), scan in zip(iter_mzML_scans(mzml_file), data.scan_list):
+		assert Scan(mass_array, intensity_array) == scan
+
+	# Errors
+	for obj in [*test_numbers, *test_sequences, test_dict]:
+		with pytest.raises(TypeError):
+			next(iter_mzML_scans(obj))
+
+
+@pytest.mark.parametrize("index, expected", [
+		(0, 1.5),  # second
+		(1, 2.5),  # millisecond
+		(2, 3.0),  # minute
+		(4, 3.6),  # hour
+		(5, 6.0),  # no unit, so minutes
+		])
+def test__get_scan_time(mzml_file, index, expected):
+	spectra = list(pymzml.run.Reader(str(mzml_file)))
+	assert _get_scan_time(spectra[index]) == pytest.approx(expected)
+
+	# no retention time
+	assert _get_scan_time(spectra[3]) is None
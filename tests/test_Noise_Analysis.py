@@ -19,10 +19,12 @@
 #############################################################################
 
 # 3rd party
+import numpy
 import pytest
 
 # pyms
-from pyms.Noise.Analysis import window_analyzer
+from pyms.IntensityMatrix import SparseIntensityMatrix
+from pyms.Noise.Analysis import noise_im, window_analyzer
 
 # tests
 from .constants import *
@@ -50,3 +52,30 @@ def test_window_anlyzer(tic):
 	for obj in [test_string, test_float, *test_lists, test_dict]:
 		with pytest.raises(TypeError):
 			window_analyzer(tic, n_windows=obj)
+
+
+def test_window_analyzer_generator(tic):
+	noise_estimate = window_analyzer(tic, rand_seed=numpy.random.default_rng(test_int))
+	assert isinstance(noise_estimate, float)
+	assert noise_estimate == window_analyzer(tic, rand_seed=numpy.random.default_rng(test_int))
+
+
+def test_noise_im(im):
+	noise_levels = noise_im(im, rand_seed=test_int)
+	assert isinstance(noise_levels, numpy.ndarray)
+	assert noise_levels.shape == (len(im.mass_list), )
+
+	for ii in [0, 73, im.size[1] - 1]:
+		assert noise_levels[ii] == window_analyzer(im.get_ic_at_index(ii), rand_seed=test_int)
+
+	for obj in [test_string, *test_numbers, *test_lists, test_dict]:
+		with pytest.raises(TypeError):
+			noise_im(obj)
+	with pytest.raises(TypeError, match="todense"):
+		noise_im(SparseIntensityMatrix(im.time_list, im.mass_list, im.intensity_array))
+	for obj in [test_float, *test_lists, test_dict]:
+		with pytest.raises(TypeError):
+			noise_im(im, window=obj)
+	for obj in [test_string, test_float, *test_lists, test_dict]:
+		with pytest.raises(TypeError):
+			noise_im(im, n_windows=obj)
@@ -18,7 +18,12 @@
 #                                                                           #
 #############################################################################
 
+# stdlib
+import concurrent.futures
+import copy
+
 # 3rd party
+import numpy
 import pytest
 
 # pyms
@@ -99,3 +104,43 @@ def test_savitzky_golay_intensity_matrix(im, tic):
 	for obj in [test_float, *test_lists, test_dict]:
 		with pytest.raises(TypeError):
 			savitzky_golay_im(im, window=obj)
+
+
+def test_savitzky_golay_im_workers(im):
+	im_smooth = savitzky_golay_im(im)
+
+	for ii in [0, 73, im.size[1] - 1]:
+		ic_smooth = savitzky_golay(im.get_ic_at_index(ii))
+		assert numpy.allclose(im_smooth.get_ic_at_index(ii).intensity_array, ic_smooth.intensity_array)
+
+	assert savitzky_golay_im(im, n_workers=2) == im_smooth
+
+	with concurrent.futures.ThreadPoolExecutor(2) as executor:
+		assert savitzky_golay_im(im, n_workers=2, executor=executor) == im_smooth
+
+	# Test Errors
+	for obj in [test_string, test_float, *test_lists, test_dict, True]:
+		with pytest.raises(TypeError):
+			savitzky_golay_im(im, n_workers=obj)
+
+	with pytest.raises(ValueError):
+		savitzky_golay_im(im, n_workers=0)
+
+	with pytest.raises(TypeError):
+		savitzky_golay_im(im, executor=test_string)
+
+
+def test_savitzky_golay_im_dtype(im):
+	im_smooth = savitzky_golay_im(im)
+	assert im_smooth.intensity_array.dtype == numpy.float64
+
+	im_float32 = copy.deepcopy(im)
+	im_float32._intensity_array = im_float32._intensity_array.astype(numpy.float32)
+
+	for im_smooth_float32 in [savitzky_golay_im(im, dtype=numpy.float32), savitzky_golay_im(im_float32)]:
+		assert im_smooth_float32.intensity_array.dtype == numpy.float32
+		tolerance = 1e-6 * numpy.abs(im.intensity_array).max(axis=0)
+		assert (numpy.abs(im_smooth_float32.intensity_array - im_smooth.intensity_array) <= tolerance).all()
+
+	with pytest.raises(ValueError):
+		savitzky_golay_im(im, dtype=int)
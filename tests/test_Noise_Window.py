@@ -19,6 +19,7 @@
 #############################################################################
 
 # 3rd party
+import numpy
 import pytest
 
 # pyms
@@ -87,6 +88,56 @@ def test_window_smooth_im(im):
 			window_smooth_im(im, use_median=obj)
 
 
+@pytest.mark.parametrize("use_median", [False, True])
+def test_window_smooth_im_workers(im, use_median):
+	im_smooth = window_smooth_im(im, window=5, use_median=use_median)
+
+	for ii in [0, 73, im.size[1] - 1]:
+		assert im_smooth.get_ic_at_index(ii) == window_smooth(im.get_ic_at_index(ii), 5, use_median)
+
+	assert window_smooth_im(im, window=5, use_median=use_median, n_workers=2) == im_smooth
+
+	# Test Errors
+	for obj in [test_string, test_float, *test_lists, test_dict, True]:
+		with pytest.raises(TypeError):
+			window_smooth_im(im, n_workers=obj)
+
+	with pytest.raises(ValueError):
+		window_smooth_im(im, n_workers=0)
+
+
+@pytest.mark.parametrize("use_median", [False, True])
+def test_window_smooth_im_dtype(im, use_median):
+	im_smooth = window_smooth_im(im, window=5, use_median=use_median)
+	assert im_smooth.intensity_array.dtype == numpy.float64
+
+	im_smooth_float32 = window_smooth_im(im, window=5, use_median=use_median, dtype=numpy.float32)
+	assert im_smooth_float32.intensity_array.dtype == numpy.float32
+
+	tolerance = 1e-6 * numpy.abs(im.intensity_array).max(axis=0)
+	assert (numpy.abs(im_smooth_float32.intensity_array - im_smooth.intensity_array) <= tolerance).all()
+
+	with pytest.raises(ValueError):
+		window_smooth_im(im, dtype=int)
+
+
+@pytest.mark.parametrize("use_median, expected", [
+		(False, [1.5, 2.0, 11 / 3, 13 / 3, 5.0]),
+		(True, [1.5, 2.0, 3.0, 4.0, 5.0]),
+		])
+def test_window_smooth_values(use_median, expected):
+	# the window is truncated at the ends of the array
+	ic = IonChromatogram(numpy.array([1, 2, 3, 6, 4]), [1.0, 2.0, 3.0, 4.0, 5.0])
+
+	ic_smooth = window_smooth(ic, window=3, use_median=use_median)
+	assert ic_smooth.intensity_array.tolist() == pytest.approx(expected)
+
+	im = IntensityMatrix([1.0, 2.0, 3.0, 4.0, 5.0], [50.0, 51.0], numpy.array([[1, 0], [2, 0], [3, 0], [6, 0], [4, 0]]))
+	im_smooth = window_smooth_im(im, window=3, use_median=use_median)
+	assert im_smooth.get_ic_at_index(0).intensity_array.tolist() == pytest.approx(expected)
+	assert not im_smooth.get_ic_at_index(1).intensity_array.any()
+
+
 def test_smooth_im(data):
 	# Build intensity matrix with defaults, float masses with interval
 	# (bin size) of one from min mass
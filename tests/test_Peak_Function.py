@@ -20,11 +20,13 @@
 
 # 3rd party
 import deprecation
+import numpy
 import pytest
+import scipy.sparse
 
 # pyms
 from pyms.Peak.Function import (
-	half_area, ion_area, median_bounds, peak_pt_bounds, peak_sum_area, peak_top_ion_areas,
+	half_area, ion_area, ion_areas, median_bounds, peak_pt_bounds, peak_sum_area, peak_top_ion_areas,
 	top_ions_v1, top_ions_v2,
 	)
 # tests
@@ -158,6 +160,55 @@ class Test_ion_area:
 			ion_area(list(range(100)), 20, tol=obj)
 
 
+class Test_ion_areas:
+
+	@pytest.mark.parametrize("max_bound", [0, 1, 5])
+	@pytest.mark.parametrize("apex", [0, 20, 99])
+	def test_main(self, apex, max_bound):
+		intensity_array = numpy.array([
+				list(range(100)),
+				list(range(100, 0, -1)),
+				[0] * 100,
+				[(x % 17) ** 2 for x in range(100)],
+				]).T
+
+		areas = ion_areas(intensity_array, apex, max_bound=max_bound)
+		assert isinstance(areas, tuple)
+		assert len(areas) == 5
+
+		for ii in range(intensity_array.shape[1]):
+			expected = ion_area(intensity_array[:, ii].tolist(), apex, max_bound)
+			assert tuple(value[ii] for value in areas) == expected
+
+		selected = ion_areas(intensity_array, apex, [3, 1], max_bound=max_bound)
+		for value, all_values in zip(selected, areas):
+			assert value.tolist() == all_values[[3, 1]].tolist()
+
+		sparse_areas = ion_areas(scipy.sparse.csr_matrix(intensity_array), apex, max_bound=max_bound)
+		for value, dense_value in zip(sparse_areas, areas):
+			assert value.tolist() == dense_value.tolist()
+
+	@pytest.mark.parametrize("obj", [test_string, *test_numbers, test_dict, *test_lists])
+	def test_intensity_array_errors(self, obj):
+		with pytest.raises(TypeError):
+			ion_areas(obj, 20)
+
+	@pytest.mark.parametrize("obj", [test_string, test_float, test_dict, *test_lists])
+	def test_apex_errors(self, obj):
+		with pytest.raises(TypeError):
+			ion_areas(numpy.ones((100, 2)), obj)
+
+	@pytest.mark.parametrize("obj", [test_string, test_float, test_dict, *test_lists])
+	def test_max_bound_errors(self, obj):
+		with pytest.raises(TypeError):
+			ion_areas(numpy.ones((100, 2)), 20, max_bound=obj)
+
+	@pytest.mark.parametrize("obj", [test_string, test_int, test_dict, *test_lists])
+	def test_tol_errors(self, obj):
+		with pytest.raises(TypeError):
+			ion_areas(numpy.ones((100, 2)), 20, tol=obj)
+
+
 class Test_half_area:
 
 	def test_main(self, peak, im_i):
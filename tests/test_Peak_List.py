@@ -18,12 +18,18 @@
 #                                                                           #
 #############################################################################
 
+# stdlib
+import concurrent.futures
+
 # 3rd party
 import pytest
 
 # pyms
+from pyms.BillerBiemann import BillerBiemann, num_ions_threshold
+from pyms.IntensityMatrix import build_intensity_matrix_i
 from pyms.Utils.Utils import _list_types, _path_types
-from pyms.Peak.List import composite_peak, fill_peaks, Peak, sele_peaks_by_rt
+from pyms.Peak.Function import median_bounds, peak_sum_area, peak_top_ion_areas
+from pyms.Peak.List import composite_peak, fill_peaks, Peak, peak_list_areas, sele_peaks_by_rt
 from pyms.Peak.List.IO import is_peak_list, load_peaks, store_peaks
 from pyms.Spectrum import MassSpectrum
 
@@ -108,6 +114,27 @@ def test_fill_peaks(im_i, peak_list):
 			fill_peaks(im_i, peak_list, obj)
 
 
+def test_sparse_peak_list_areas(im_i, data):
+	im_sparse = build_intensity_matrix_i(data, sparse=True)
+	peak_list = num_ions_threshold(BillerBiemann(im_sparse, points=9, scans=2), 3, 3000)
+	assert peak_list
+
+	areas = peak_list_areas(im_sparse, peak_list, max_bound=5)
+	assert areas == peak_list_areas(im_i, peak_list, max_bound=5)
+	assert areas == peak_list_areas(im_sparse, peak_list, max_bound=5, n_workers=2)
+
+	for peak, (area, ion_areas, bounds) in zip(peak_list, areas):
+		assert area == peak_sum_area(im_sparse, peak, max_bound=5)
+		assert ion_areas == peak_top_ion_areas(im_sparse, peak, max_bound=5)
+		assert bounds == median_bounds(im_sparse, peak)
+		assert median_bounds(im_sparse, peak) == median_bounds(im_i, peak)
+
+	filled = fill_peaks(im_sparse, peak_list, 10.0)
+	expected = fill_peaks(im_i, peak_list, 10.0)
+	for peak, expected_peak in zip(filled, expected):
+		assert peak.mass_spectrum == expected_peak.mass_spectrum
+
+
 def test_is_peak_list(peak_list, ms, im_i, data):
 	assert is_peak_list(peak_list)
 	assert not is_peak_list(test_int)
@@ -163,6 +190,43 @@ def test_sele_peaks_by_rt(filtered_peak_list):
 			sele_peaks_by_rt(filtered_peak_list, obj)
 
 
+def test_peak_list_areas(filtered_peak_list, im_i):
+	areas = peak_list_areas(im_i, filtered_peak_list)
+	assert isinstance(areas, list)
+	assert len(areas) == len(filtered_peak_list)
+
+	for peak, (area, ion_areas, bounds) in zip(filtered_peak_list, areas):
+		assert area == peak_sum_area(im_i, peak)
+		assert ion_areas == peak_top_ion_areas(im_i, peak)
+		assert bounds == median_bounds(im_i, peak)
+
+	areas = peak_list_areas(im_i, filtered_peak_list[:20], n_top_ions=3, max_bound=5)
+	assert peak_list_areas(im_i, filtered_peak_list[:20], n_top_ions=3, max_bound=5, n_workers=2) == areas
+	with concurrent.futures.ThreadPoolExecutor(2) as executor:
+		assert peak_list_areas(im_i, filtered_peak_list[:20], n_top_ions=3, max_bound=5, executor=executor) == areas
+
+	for peak, (area, ion_areas, bounds) in zip(filtered_peak_list, areas):
+		assert area == peak_sum_area(im_i, peak, max_bound=5)
+		assert ion_areas == peak_top_ion_areas(im_i, peak, n_top_ions=3, max_bound=5)
+
+	# Errors
+	for obj in [test_dict, *test_sequences, *test_numbers, test_string]:
+		with pytest.raises(TypeError):
+			peak_list_areas(obj, filtered_peak_list)
+	for obj in [test_dict, test_list_ints, test_list_strs, *test_numbers, test_string]:
+		with pytest.raises(TypeError):
+			peak_list_areas(im_i, obj)
+	for obj in [test_dict, *test_sequences, test_float, test_string]:
+		with pytest.raises(TypeError):
+			peak_list_areas(im_i, filtered_peak_list, n_top_ions=obj)
+		with pytest.raises(TypeError):
+			peak_list_areas(im_i, filtered_peak_list, max_bound=obj)
+		with pytest.raises(TypeError):
+			peak_list_areas(im_i, filtered_peak_list, n_workers=obj)
+	with pytest.raises(ValueError):
+		peak_list_areas(im_i, filtered_peak_list, n_workers=0)
+
+
 @pytest.fixture(scope="function")
 def peak_list_filename(im, filtered_peak_list, outputdir):
 	filename = outputdir / "filtered_peak_list.dat"
@@ -18,7 +18,11 @@
 #                                                                           #
 #############################################################################
 
+# stdlib
+import copy
+
 # 3rd party
+import numpy
 import pytest
 
 # pyms
@@ -58,6 +62,46 @@ def test_tophat_im(im):
 	assert isinstance(ic_base_corr, IonChromatogram)
 
 
+@pytest.mark.parametrize("struct", [None, "1.5m"])
+def test_tophat_im_workers(im, struct):
+	im_base_corr = tophat_im(im, struct=struct)
+
+	for ii in [0, 73, im.size[1] - 1]:
+		assert im_base_corr.get_ic_at_index(ii) == tophat(im.get_ic_at_index(ii), struct=struct)
+
+	assert tophat_im(im, struct=struct, n_workers=2) == im_base_corr
+
+	# Test Errors
+	for obj in [test_string, test_float, *test_lists, test_dict, True]:
+		with pytest.raises(TypeError):
+			tophat_im(im, n_workers=obj)
+
+	with pytest.raises(ValueError):
+		tophat_im(im, n_workers=0)
+
+
+def test_tophat_im_inplace(im):
+	im_base_corr = tophat_im(im, struct="1.5m")
+
+	im_copy = copy.deepcopy(im)
+	intensity_array = im_copy._intensity_array
+	assert tophat_im(im_copy, struct="1.5m", inplace=True) is im_copy
+	assert im_copy._intensity_array is intensity_array
+	assert im_copy == im_base_corr
+
+	im_float32 = tophat_im(im, struct="1.5m", dtype=numpy.float32)
+	assert im_float32.intensity_array.dtype == numpy.float32
+	assert numpy.allclose(im_float32.intensity_array, im_base_corr.intensity_array, rtol=1e-6)
+
+	with pytest.raises(ValueError):
+		tophat_im(im, struct="1.5m", dtype=int)
+
+	# Test Errors
+	for obj in [test_string, test_float, *test_numbers, *test_lists, test_dict]:
+		with pytest.raises(TypeError):
+			tophat_im(im, inplace=obj)
+
+
 class TestErrors:
 
 	@pytest.mark.parametrize("obj", [test_string, *test_numbers, *test_sequences])
@@ -0,0 +1,81 @@
+#############################################################################
+#                                                                           #
+#    PyMassSpec software for processing of mass-spectrometry data           #
+#    Copyright (C) 2019-2020 Dominic Davis-Foster                           s#
+#                                                                           #
+#    This program is free software; you can redistribute it and/or modify   #
+#    it under the terms of the GNU General Public License version 2 as      #
+#    published by the Free Software Foundation.                             #
+#                                                                           #
+#    This program is distributed in the hope that it will be useful,        #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of         #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          #
+#    GNU General Public License for more details.                           #
+#                                                                           #
+#    You should have received a copy of the GNU General Public License      #
+#    along with this program; if not, write to the Free Software            #
+#    Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.              #
+#                                                                           #
+#############################################################################
+
+# 3rd party
+import numpy
+import pytest
+
+# pyms
+from pyms.Utils.Axis import SortedAxis
+
+# tests
+from .constants import *
+
+
+def _nearest_index(values, value):
+	differences = [abs(value - x) for x in values]
+	return differences.index(min(differences))
+
+
+@pytest.mark.parametrize("values", [
+		[1.0, 2.0, 3.0, 4.0, 5.0],
+		[1.0, 2.0, 2.0, 2.0, 5.0],
+		[0.5, 0.25, 3.0, 1.5],
+		[7.0],
+		])
+def test_nearest_index(values):
+	axis = SortedAxis(values)
+	assert len(axis) == len(values)
+	assert axis.values.tolist() == values
+	assert axis.is_sorted == (sorted(values) == values)
+
+	queries = [-1.0, 0.0, 1.5, 2.0, 2.5, 3.5, 4.9, 10.0, *values]
+
+	for value in queries:
+		index = axis.nearest_index(value)
+		assert isinstance(index, int)
+		assert index == _nearest_index(values, value)
+
+	indices = axis.nearest_indices(queries)
+	assert isinstance(indices, numpy.ndarray)
+	assert indices.tolist() == [_nearest_index(values, value) for value in queries]
+
+
+def test_read_only():
+	axis = SortedAxis([1.0, 2.0, 3.0])
+
+	with pytest.raises(ValueError):
+		axis.values[0] = 5
+
+
+def test_errors():
+	for obj in [test_string, *test_numbers, test_dict]:
+		with pytest.raises(TypeError):
+			SortedAxis(obj)
+
+	with pytest.raises(ValueError):
+		SortedAxis([[1.0, 2.0], [3.0, 4.0]])
+
+	for obj in [test_string, *test_lists, test_dict]:
+		with pytest.raises(TypeError):
+			SortedAxis([1.0, 2.0]).nearest_index(obj)
+
+	with pytest.raises(IndexError):
+		SortedAxis([]).nearest_index(1.0)